@@ -1,8 +1,10 @@
 from .auto import AutoExplorer
 from .base import BaseExplorer
-from .spec import ModulePathsList, PackagesDict, EnvironmentSpec
-from .exceptions import BadPypiIndex
-from .pypi import PYPI_INDEX_URL_DEFAULT, validate_pypi_index_url
+from .spec import ModulePathsList, PackagesDict, EnvironmentSpec, EnvironmentCost
+from .exceptions import BadPypiIndex, TargetInterpreterNotFound
+from .manifest import Manifest, PackageManifest, ManifestEntry, ManifestRules, ExcludedPath
+from .packages import Target
+from .pypi import PYPI_INDEX_URL_DEFAULT, TARGET_PLATFORMS, TARGET_PLATFORMS_AARCH64, validate_pypi_index_url
 
 __all__ = [
     'AutoExplorer',
@@ -10,7 +12,17 @@ __all__ = [
     'ModulePathsList',
     'PackagesDict',
     'EnvironmentSpec',
+    'EnvironmentCost',
     'BadPypiIndex',
+    'TargetInterpreterNotFound',
+    'Manifest',
+    'PackageManifest',
+    'ManifestEntry',
+    'ManifestRules',
+    'ExcludedPath',
+    'Target',
     'PYPI_INDEX_URL_DEFAULT',
+    'TARGET_PLATFORMS',
+    'TARGET_PLATFORMS_AARCH64',
     'validate_pypi_index_url',
 ]
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import gzip
+import io
+import mmap
+import os
+import stat
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from tempfile import TemporaryDirectory
+from typing import IO, TYPE_CHECKING, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .bytecode import compile_files
+from .manifest import ManifestRules, get_local_files
+from .spec import EnvironmentSpec
+
+if TYPE_CHECKING:
+    from packaging.tags import PythonVersion
+
+ARCHIVE_FORMATS = ('tar', 'tar.gz', 'zip')
+
+# files up to this size are read by thread pool ahead of writing,
+# bigger ones are streamed (sendfile, mmap) at the moment of writing
+READ_AHEAD_MAX_FILE_SIZE = 1024 * 1024
+# number of files read ahead per worker, so memory is bounded
+# by workers * READ_AHEAD_FACTOR * READ_AHEAD_MAX_FILE_SIZE
+READ_AHEAD_FACTOR = 4
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# timestamps are fixed for output reproducibility; zip can't represent times before 1980
+TAR_MTIME = 0
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    # name inside of archive, same as ManifestEntry.path
+    name: str
+    path: str
+    size: int
+    # normalized to 0o755 or 0o644, so umask doesn't affect output
+    mode: int
+
+
+def get_archive_entries(
+    local_module_paths: Iterable[str],
+    console_scripts: Iterable[str],
+    rules: Optional[ManifestRules] = None,
+) -> List[ArchiveEntry]:
+    return make_archive_entries(get_local_files(local_module_paths, console_scripts, rules))
+
+
+def make_archive_entries(files: Dict[str, str]) -> List[ArchiveEntry]:
+    """
+    Make sorted entries from name inside of archive -> local file mapping.
+    """
+
+    entries = []
+    for name, path in sorted(files.items()):
+        stat_result = os.stat(path)
+        entries.append(ArchiveEntry(
+            name=name,
+            path=path,
+            size=stat_result.st_size,
+            mode=0o755 if stat_result.st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH) else 0o644,
+        ))
+
+    return entries
+
+
+def _read_small_file(entry: ArchiveEntry) -> Optional[bytes]:
+    if entry.size > READ_AHEAD_MAX_FILE_SIZE:
+        return None
+
+    with open(entry.path, 'rb') as f:
+        return f.read()
+
+
+def iter_read_ahead(
+    entries: List[ArchiveEntry],
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[ArchiveEntry, Optional[bytes]]]:
+    """
+    Yield entries in order with contents of small files, which are read by
+    thread pool while previous entries are compressed and written;
+    content is None for big files, they should be streamed by consumer.
+    """
+
+    # same default as ThreadPoolExecutor have
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    window = max_workers * READ_AHEAD_FACTOR
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: Deque[Tuple[ArchiveEntry, Future]] = deque()
+        entries_iter = iter(entries)
+
+        for entry in entries_iter:
+            pending.append((entry, executor.submit(_read_small_file, entry)))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            entry, future = pending.popleft()
+            next_entry = next(entries_iter, None)
+            if next_entry is not None:
+                pending.append((next_entry, executor.submit(_read_small_file, next_entry)))
+
+            yield entry, future.result()
+
+
+def _check_size(entry: ArchiveEntry, written: int) -> None:
+    if written != entry.size:
+        raise OSError(f'{entry.path} was changed while archiving: expected {entry.size} bytes, got {written}')
+
+
+def _get_fileno(fileobj: IO[bytes]) -> Optional[int]:
+    if not hasattr(os, 'sendfile'):
+        return None
+
+    try:
+        return fileobj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _sendfile(entry: ArchiveEntry, f: IO[bytes], out_fd: int) -> bool:
+    """
+    Send file to output fd, return False if output doesn't support sendfile at all
+    (file opened with O_APPEND at linux, anything but a socket at macOS).
+    """
+
+    offset = 0
+    while offset < entry.size:
+        try:
+            sent = os.sendfile(out_fd, f.fileno(), offset, entry.size - offset)
+        except OSError:
+            # nothing is sent yet, so it is safe to fall back to another method
+            if not offset:
+                return False
+            raise
+
+        if not sent:
+            break
+        offset += sent
+
+    _check_size(entry, offset)
+    return True
+
+
+def _copy_file(entry: ArchiveEntry, fileobj: IO[bytes], out_fd: Optional[int]) -> Optional[int]:
+    """
+    Return output fd if sendfile could be used for next files, None otherwise.
+    """
+
+    with open(entry.path, 'rb') as f:
+        if out_fd is not None:
+            # data goes from page cache to output without copying to userspace
+            fileobj.flush()
+            if _sendfile(entry, f, out_fd):
+                return out_fd
+            out_fd = None
+
+        _copy_mmap(entry, f, fileobj)
+
+    return out_fd
+
+
+def _copy_mmap(entry: ArchiveEntry, f: IO[bytes], fileobj: IO[bytes]) -> None:
+    written = 0
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # NB: all views must be released before mmap is closed
+        with memoryview(mapped) as view:
+            for start in range(0, min(len(mapped), entry.size), COPY_CHUNK_SIZE):
+                with view[start:min(start + COPY_CHUNK_SIZE, entry.size)] as chunk:
+                    fileobj.write(chunk)
+                    written += len(chunk)
+
+    _check_size(entry, written)
+
+
+def _make_tar_info(entry: ArchiveEntry, size: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(entry.name)
+    info.size = size
+    info.mode = entry.mode
+    info.mtime = TAR_MTIME
+    info.uid = info.gid = 0
+    info.uname = info.gname = ''
+    return info
+
+
+def write_tar(
+    entries: List[ArchiveEntry],
+    fileobj: IO[bytes],
+    *,
+    max_workers: Optional[int] = None,
+    use_sendfile: bool = True,
+) -> None:
+    """
+    Tar is written block by block here instead of tarfile.TarFile, so big files
+    could be sent with os.sendfile directly to output file or socket.
+    """
+
+    out_fd = _get_fileno(fileobj) if use_sendfile else None
+    offset = 0
+
+    for entry, data in iter_read_ahead(entries, max_workers):
+        size = len(data) if data is not None else entry.size
+        header = _make_tar_info(entry, size).tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+        fileobj.write(header)
+
+        if data is not None:
+            fileobj.write(data)
+        else:
+            out_fd = _copy_file(entry, fileobj, out_fd)
+
+        padding = -size % tarfile.BLOCKSIZE
+        fileobj.write(tarfile.NUL * padding)
+        offset += len(header) + size + padding
+
+    # end of archive marker is two empty blocks, archive is padded to the record size, as tarfile does
+    offset += 2 * tarfile.BLOCKSIZE
+    fileobj.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE + -offset % tarfile.RECORDSIZE))
+    fileobj.flush()
+
+
+def _make_zip_info(entry: ArchiveEntry, compress_type: int, compresslevel: Optional[int]) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(entry.name, date_time=ZIP_DATE_TIME)
+    info.external_attr = (stat.S_IFREG | entry.mode) << 16
+    info.create_system = 3  # unix, so mode is respected by unzip
+    info.compress_type = compress_type
+    # NB: ZipFile doesn't apply its compresslevel to given ZipInfo objects
+    # and there is no public attribute for it before python 3.13
+    setattr(info, '_compresslevel', compresslevel)
+    return info
+
+
+def write_zip(
+    entries: List[ArchiveEntry],
+    fileobj: IO[bytes],
+    *,
+    max_workers: Optional[int] = None,
+    compresslevel: Optional[int] = None,
+) -> None:
+    """
+    Zip entries are compressed by zlib, which releases GIL, while
+    thread pool is reading next files; output could be non-seekable.
+    """
+
+    compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(fileobj, 'w', compression=compress_type, compresslevel=compresslevel) as archive:
+        for entry, data in iter_read_ahead(entries, max_workers):
+            info = _make_zip_info(entry, compress_type, compresslevel)
+
+            if data is not None:
+                archive.writestr(info, data)
+                continue
+
+            info.file_size = entry.size
+            with archive.open(info, 'w', force_zip64=True) as dest, open(entry.path, 'rb') as f:
+                _copy_mmap(entry, f, dest)
+
+
+def write_archive(
+    spec: EnvironmentSpec,
+    fileobj: IO[bytes],
+    archive_format: str = 'tar',
+    *,
+    max_workers: Optional[int] = None,
+    compresslevel: Optional[int] = None,
+    rules: Optional[ManifestRules] = None,
+    target_python: Optional[PythonVersion] = None,
+) -> None:
+    """
+    Write local module paths and console scripts of environment spec into
+    archive of given format; files are placed as at ManifestEntry.path
+    and pruned by rules, if they are given.
+
+    With target_python local modules are compiled for it and bytecode is placed
+    next to sources (at __pycache__ dirs, or as legacy .pyc files for zip, as
+    zipimport expects them), so remote imports them without compilation.
+
+    Output is reproducible: entries are sorted, timestamps, owners and modes are normalized.
+    """
+
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f'unknown archive format {archive_format}, expected one of {ARCHIVE_FORMATS}')
+
+    files = get_local_files(spec.local_module_paths, spec.console_scripts, rules)
+
+    with TemporaryDirectory() as bytecode_dir:
+        if target_python is not None:
+            files.update(compile_files(
+                files,
+                bytecode_dir,
+                target_python,
+                legacy_layout=archive_format == 'zip',
+                max_workers=max_workers,
+            ))
+
+        _write_entries(
+            make_archive_entries(files),
+            fileobj,
+            archive_format,
+            max_workers=max_workers,
+            compresslevel=compresslevel,
+        )
+
+
+def _write_entries(
+    entries: List[ArchiveEntry],
+    fileobj: IO[bytes],
+    archive_format: str,
+    *,
+    max_workers: Optional[int],
+    compresslevel: Optional[int],
+) -> None:
+    if archive_format == 'zip':
+        write_zip(entries, fileobj, max_workers=max_workers, compresslevel=compresslevel)
+        return
+
+    if archive_format == 'tar':
+        write_tar(entries, fileobj, max_workers=max_workers)
+        return
+
+    # NB: tarfile's own w|gz mode puts current time into gzip header
+    with gzip.GzipFile(
+        filename='',
+        mode='wb',
+        fileobj=fileobj,
+        mtime=0,
+        compresslevel=9 if compresslevel is None else compresslevel,
+    ) as compressed:
+        write_tar(entries, compressed, max_workers=max_workers, use_sendfile=False)  # type: ignore[arg-type]
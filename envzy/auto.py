@@ -4,20 +4,34 @@ import sys
 from dataclasses import dataclass, field
 from operator import attrgetter
 from logging import getLogger
-from typing import List, Type, TypeVar, Tuple, Union, Sequence
+from types import ModuleType
+from typing import Dict, FrozenSet, Iterable, List, Optional, Type, TypeVar, Tuple, Union, Sequence
 
 from .base import BaseExplorer
 from .classify import ModuleClassifier
 from .search import VarsNamespace, get_transitive_namespace_dependencies
-from .spec import ModulePathsList, PackagesDict, EnvironmentSpec
+from .spec import ModulePathsList, PackagesDict, EnvironmentSpec, EnvironmentCost
 from .packages import (
     BrokenModules,
     LocalPackage,
     BasePackage,
+    DistributionFile,
     PypiDistribution,
-    LocalDistribution
+    LocalDistribution,
+    Target,
+)
+from .pypi import PYPI_INDEX_URL_DEFAULT, TARGET_PLATFORMS, get_best_wheel
+from .local_index import get_local_file_size
+from .manifest import Manifest, ManifestRules, build_manifest
+from .utils import check_url_is_local_file, get_paths_sizes
+from .lock import (
+    LockedRequirement,
+    format_requirements_lock,
+    get_marker_environment,
+    get_release_hashes,
+    get_requirements_closure,
+    get_unhashed_requirements,
 )
-from .pypi import PYPI_INDEX_URL_DEFAULT
 
 logger = getLogger(__name__)
 
@@ -33,12 +47,23 @@ class AutoExplorer(BaseExplorer):
     additional_pypi_packages: PackagesDict = field(default_factory=dict)
     target_python: PythonVersion = sys.version_info[:2]
     search_stop_list: Sequence[str] = ()
+    target_platforms: Sequence[str] = TARGET_PLATFORMS
+    resolve_wheels: bool = False
+    inspect_meta_packages: bool = False
+    estimate_cost: bool = False
+    build_manifest: bool = False
+    # files pruning rules of manifest, nothing is pruned by default
+    manifest_rules: Optional[ManifestRules] = None
 
     def get_local_module_paths(self, namespace: VarsNamespace) -> ModulePathsList:
         packages = self._get_packages(namespace)
         return self._get_local_module_paths(self._filter(packages, LocalPackage))
 
     def _get_local_module_paths(self, packages: List[LocalPackage]) -> ModulePathsList:
+        transferred = self._get_transferred_local_packages(packages)
+        return sorted(set().union(*(p.paths for p in transferred)))
+
+    def _get_transferred_local_packages(self, packages: List[LocalPackage]) -> List[LocalPackage]:
         filtered: List[LocalPackage] = []
         binary: List[LocalPackage] = []
         nonbinary: List[LocalPackage] = []
@@ -91,7 +116,7 @@ class AutoExplorer(BaseExplorer):
                 nonbinary
             )
 
-        return sorted(set().union(*(p.paths for p in nonbinary)))
+        return nonbinary
 
     def get_pypi_packages(self, namespace: VarsNamespace) -> PackagesDict:
         packages = self._get_packages(namespace)
@@ -130,27 +155,214 @@ class AutoExplorer(BaseExplorer):
                 self.target_python, bad_platform
             )
 
+        sdist_only = [p for p in good if p.sdist_only]
+        if sdist_only:
+            logger.warning(
+                "Next dependency packages have no wheels for Lzy server platform and requested "
+                "python version %s and will be built from source at the server, which is slow "
+                "and may fail: %s; consider to pin versions which have wheels: %s",
+                self.target_python,
+                sdist_only,
+                [f'{p.name}=={p.nearest_wheel_version}' for p in sdist_only if p.nearest_wheel_version],
+            )
+
         return {
             **{p.name: p.version for p in good},
             **self.additional_pypi_packages
         }
 
-    def get_environment_spec(self, namespace: VarsNamespace) -> EnvironmentSpec:
+    def get_pypi_wheels(self, namespace: VarsNamespace) -> Dict[str, DistributionFile]:
+        """
+        Return best matching wheels of supported pypi packages, so they could be downloaded
+        at the remote side directly, without a resolver and index requests.
+        Packages without wheels (sdist-only, for example) are omitted.
+        """
+
+        packages = self._get_packages(namespace, resolve_wheels=True)
+
+        return {
+            p.name: p.wheel
+            for p in self._filter(packages, PypiDistribution)
+            if p.wheel and p.have_server_supported_tags and p.name not in self.additional_pypi_packages
+        }
+
+    def get_locked_requirements(self, namespace: VarsNamespace) -> str:
+        """
+        Return fully pinned requirements file with hashes for pypi packages and all
+        of their (locally installed) dependencies, which are required at target platform,
+        so remote could do `pip install --no-deps --require-hashes` without a resolver.
+        If hashes of some requirements are unknown, file is written without hashes at all.
+        """
+
         packages = self._get_packages(namespace)
+        pypi_packages = self._get_pypi_packages(self._filter(packages, PypiDistribution))
+        classifier = self._get_classifier()
+
+        environment = get_marker_environment(tuple(self.target_python), tuple(self.target_platforms))
+        closure, missing = get_requirements_closure(pypi_packages, environment)
+
+        locked: Dict[str, LockedRequirement] = {}
+        skipped: List[BasePackage] = []
+
+        for distribution in closure:
+            if distribution.name in self.additional_pypi_packages:
+                continue
+
+            package = classifier.classify_distribution(distribution)
+            if not isinstance(package, PypiDistribution) or not package.have_server_supported_tags:
+                skipped.append(package)
+                continue
+
+            locked[package.name] = LockedRequirement(
+                name=package.name,
+                version=package.version,
+                pypi_index_url=package.pypi_index_url,
+                hashes=get_release_hashes(
+                    pypi_index_url=package.pypi_index_url,
+                    name=package.name,
+                    version=package.version,
+                ),
+            )
+
+        for name, version in self.additional_pypi_packages.items():
+            pypi_index_url = classifier.find_distribution_at_pypi(name=name, version=version)
+            if not pypi_index_url:
+                missing.append(name)
+                continue
+
+            locked[name] = LockedRequirement(
+                name=name,
+                version=version,
+                pypi_index_url=pypi_index_url,
+                hashes=get_release_hashes(pypi_index_url=pypi_index_url, name=name, version=version),
+            )
+
+        if missing or skipped:
+            logger.warning(
+                "Some requirements of pypi packages are absent in local environment, are absent at pypi "
+                "or doesn't support target platform, so they are omitted from locked requirements "
+                "and --no-deps installation may be broken: %s",
+                missing + [p.name for p in skipped],
+            )
+
+        unhashed = get_unhashed_requirements(locked.values())
+        if unhashed:
+            logger.warning(
+                "Hashes of some requirements are unknown (index doesn't provide them), "
+                "so locked requirements are written without hashes and can't be installed "
+                "with --require-hashes: %s",
+                unhashed,
+            )
+
+        return format_requirements_lock(
+            locked.values(),
+            pypi_index_url=self.pypi_index_url,
+            extra_index_urls=self.extra_index_urls,
+        )
+
+    def get_pypi_distributions_matrix(
+        self,
+        namespace: VarsNamespace,
+        targets: Iterable[Target],
+    ) -> Dict[Target, List[PypiDistribution]]:
+        """
+        Explore namespace once and return pypi distributions with
+        platform support status for each of given targets.
+        """
+
+        modules = self._get_modules(namespace)
+        classifier = self._get_classifier()
+
+        return {
+            target: sorted(self._filter(list(packages), PypiDistribution), key=attrgetter('name'))
+            for target, packages in classifier.classify_targets(modules, targets).items()
+        }
+
+    def get_environment_spec(self, namespace: VarsNamespace) -> EnvironmentSpec:
+        packages = self._get_packages(namespace, resolve_wheels=self.estimate_cost)
 
         local_packages = self._filter(packages, LocalPackage)
-        local_module_paths = self._get_local_module_paths(local_packages)
+        transferred_local_packages = self._get_transferred_local_packages(local_packages)
+        local_module_paths = sorted(set().union(*(p.paths for p in transferred_local_packages)))
         console_scripts = self._get_console_scripts(local_packages)
 
-        pypi_packages = self._get_pypi_packages(self._filter(packages, PypiDistribution))
+        pypi_distributions = self._filter(packages, PypiDistribution)
+        pypi_packages = self._get_pypi_packages(pypi_distributions)
+
+        cost = self._get_environment_cost(
+            pypi_distributions,
+            pypi_packages,
+            local_module_paths,
+        ) if self.estimate_cost else None
+
+        manifest = self._get_manifest(transferred_local_packages) if self.build_manifest else None
 
         return EnvironmentSpec(
             packages=sorted(packages, key=attrgetter('name')),
             local_module_paths=sorted(local_module_paths),
             console_scripts=sorted(console_scripts),
-            pypi_packages=pypi_packages
+            pypi_packages=pypi_packages,
+            cost=cost,
+            manifest=manifest,
+        )
+
+    def _get_manifest(self, packages: List[LocalPackage]) -> Manifest:
+        manifest = build_manifest(packages, rules=self.manifest_rules)
+
+        if manifest.excluded:
+            logger.info(
+                "%d paths (%d bytes) of local packages were excluded from manifest, "
+                "%d bytes are left to be transferred to a remote host",
+                len(manifest.excluded),
+                manifest.excluded_bytes,
+                manifest.total_bytes,
+            )
+            logger.debug("Excluded paths: %s", manifest.excluded)
+
+        return manifest
+
+    def _get_environment_cost(
+        self,
+        pypi_distributions: List[PypiDistribution],
+        pypi_packages: PackagesDict,
+        local_module_paths: ModulePathsList,
+    ) -> EnvironmentCost:
+        """
+        Estimate environment weight: wheel sizes are taken from index (PEP 700 or JSON API)
+        and local sizes are measured by walking local module paths.
+        """
+
+        wheels: Dict[str, Optional[DistributionFile]] = {
+            p.name: p.wheel for p in pypi_distributions if p.name in pypi_packages
+        }
+
+        classifier = self._get_classifier()
+        for name, version in self.additional_pypi_packages.items():
+            pypi_index_url = classifier.find_distribution_at_pypi(name=name, version=version)
+            wheels[name] = get_best_wheel(
+                pypi_index_url=pypi_index_url,
+                name=name,
+                version=version,
+                target_python=self.target_python,
+                target_platforms=tuple(self.target_platforms),
+            ) if pypi_index_url else None
+
+        return EnvironmentCost(
+            download_bytes={name: self._get_wheel_size(wheel) for name, wheel in wheels.items()},
+            local_bytes=get_paths_sizes(local_module_paths),
         )
 
+    @staticmethod
+    def _get_wheel_size(wheel: Optional[DistributionFile]) -> Optional[int]:
+        if not wheel:
+            return None
+
+        # local indexes doesn't provide sizes, but we can look at the files itself
+        if wheel.size is None and check_url_is_local_file(wheel.url):
+            return get_local_file_size(wheel.url)
+
+        return wheel.size
+
     def _get_console_scripts(self, packages: List[LocalPackage]) -> List[str]:
         return list(
             frozenset().union(*(p.console_scripts for p in packages))
@@ -162,15 +374,11 @@ class AutoExplorer(BaseExplorer):
     def _get_packages(
         self,
         namespace: VarsNamespace,
+        *,
+        resolve_wheels: bool = False,
     ) -> List[BasePackage]:
-        stop_list = frozenset(self.search_stop_list)
-        modules = get_transitive_namespace_dependencies(namespace, stop_list=stop_list)
-
-        classifier = ModuleClassifier(
-            self.pypi_index_url,
-            extra_index_urls=tuple(self.extra_index_urls),
-            target_python=self.target_python
-        )
+        modules = self._get_modules(namespace)
+        classifier = self._get_classifier(resolve_wheels=resolve_wheels)
 
         packages = classifier.classify(modules)
         broken = [p for p in packages if isinstance(p, BrokenModules)]
@@ -181,3 +389,17 @@ class AutoExplorer(BaseExplorer):
             )
 
         return list(packages)
+
+    def _get_modules(self, namespace: VarsNamespace) -> FrozenSet[ModuleType]:
+        stop_list = frozenset(self.search_stop_list)
+        return get_transitive_namespace_dependencies(namespace, stop_list=stop_list)
+
+    def _get_classifier(self, *, resolve_wheels: bool = False) -> ModuleClassifier:
+        return ModuleClassifier(
+            self.pypi_index_url,
+            extra_index_urls=tuple(self.extra_index_urls),
+            target_python=self.target_python,
+            target_platforms=tuple(self.target_platforms),
+            resolve_wheels=resolve_wheels or self.resolve_wheels,
+            inspect_meta_packages=self.inspect_meta_packages,
+        )
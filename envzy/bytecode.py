@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from logging import getLogger
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .exceptions import TargetInterpreterNotFound
+from .manifest import SCRIPTS_DIRNAME, ManifestRules, get_local_files
+from .spec import EnvironmentSpec
+
+if TYPE_CHECKING:
+    from packaging.tags import PythonVersion
+
+logger = getLogger(__name__)
+
+# hash-based pycs (PEP 552) don't depend on source mtime, which is lost at archiving;
+# CHECKED_HASH pyc is validated against source hash at import, UNCHECKED_HASH is trusted as is
+INVALIDATION_MODES = ('CHECKED_HASH', 'UNCHECKED_HASH')
+
+# compilation is running in a separate process of target interpreter, so it could
+# be different from the current one; only stdlib of python >= 3.7 is used
+_COMPILE_SCRIPT = '''
+import json, py_compile, sys
+mode = py_compile.PycInvalidationMode[sys.argv[1]]
+failed = []
+for source, cfile, dfile in json.load(sys.stdin):
+    try:
+        py_compile.compile(source, cfile, dfile, doraise=True, invalidation_mode=mode)
+    except py_compile.PyCompileError:
+        failed.append(source)
+json.dump(failed, sys.stdout)
+'''
+
+
+@lru_cache(maxsize=None)
+def get_target_interpreter(target_python: PythonVersion) -> str:
+    """
+    Return executable of target python version: the current one if it matches
+    or pythonX.Y from PATH; result is cached for the process lifetime.
+    """
+
+    major, minor = target_python[:2]
+    if (major, minor) == sys.version_info[:2]:
+        return sys.executable
+
+    executable = shutil.which(f'python{major}.{minor}')
+    if executable is None:
+        raise TargetInterpreterNotFound(
+            f'python{major}.{minor} is not found at PATH, it is needed for bytecode compilation '
+            f'for target python {major}.{minor}'
+        )
+
+    return executable
+
+
+def get_cache_tag(target_python: PythonVersion) -> str:
+    if tuple(target_python[:2]) == sys.version_info[:2]:
+        return sys.implementation.cache_tag
+
+    # pythonX.Y from PATH is assumed to be CPython
+    return f'cpython-{target_python[0]}{target_python[1]}'
+
+
+def get_bytecode_name(name: str, cache_tag: str, legacy_layout: bool = False) -> str:
+    """
+    'foo/bar.py' -> 'foo/__pycache__/bar.cpython-39.pyc', as importlib expects it
+    next to the source; with legacy_layout -> 'foo/bar.pyc', as zipimport expects it.
+    """
+
+    stem = name[:-len('.py')]
+    if legacy_layout:
+        return f'{stem}.pyc'
+
+    directory, _, module = stem.rpartition('/')
+    return f'{directory}/__pycache__/{module}.{cache_tag}.pyc'.lstrip('/')
+
+
+def _compile_chunk(interpreter: str, invalidation_mode: str, jobs: List[Tuple[str, str, str]]) -> List[str]:
+    result = subprocess.run(
+        # isolated mode, so user site and PYTHONPATH don't affect compilation
+        [interpreter, '-I', '-W', 'ignore', '-c', _COMPILE_SCRIPT, invalidation_mode],
+        input=json.dumps(jobs),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def compile_files(
+    files: Dict[str, str],
+    output_dir: str,
+    target_python: PythonVersion = sys.version_info[:2],
+    *,
+    legacy_layout: bool = False,
+    invalidation_mode: str = 'CHECKED_HASH',
+    max_workers: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Compile .py files of given relative path -> local file mapping for target python
+    into output_dir, in parallel by several processes of target interpreter.
+
+    Return relative path of bytecode -> compiled file; files with syntax errors
+    (for example, templates or files for another python) are skipped.
+    """
+
+    if invalidation_mode not in INVALIDATION_MODES:
+        raise ValueError(f'unknown invalidation mode {invalidation_mode}, expected one of {INVALIDATION_MODES}')
+
+    if tuple(target_python[:2]) < (3, 7):
+        raise ValueError('bytecode compilation is supported for target python >= 3.7')
+
+    cache_tag = get_cache_tag(target_python)
+    bytecode_names: List[str] = []
+    # (source, compiled file, name recorded at bytecode)
+    jobs: List[Tuple[str, str, str]] = []
+
+    for name, source in sorted(files.items()):
+        if not name.endswith('.py') or name.startswith(f'{SCRIPTS_DIRNAME}/'):
+            continue
+
+        bytecode_name = get_bytecode_name(name, cache_tag, legacy_layout)
+        bytecode_names.append(bytecode_name)
+        # NB: relative name is recorded as co_filename, so local paths don't leak into output
+        jobs.append((source, os.path.join(output_dir, *bytecode_name.split('/')), name))
+
+    if not jobs:
+        return {}
+
+    interpreter = get_target_interpreter(tuple(target_python[:2]))
+    # NB: startup of each process costs dozens of milliseconds, so jobs are sent in chunks
+    chunks_number = min(max_workers or os.cpu_count() or 1, len(jobs))
+    chunks = [jobs[i::chunks_number] for i in range(chunks_number)]
+
+    with ThreadPoolExecutor(max_workers=chunks_number) as executor:
+        failed = {
+            source
+            for chunk_failed in executor.map(partial(_compile_chunk, interpreter, invalidation_mode), chunks)
+            for source in chunk_failed
+        }
+
+    if failed:
+        logger.debug("Some local files weren't compiled due to syntax errors: %s", sorted(failed))
+
+    return {
+        bytecode_name: cfile
+        for bytecode_name, (source, cfile, _) in zip(bytecode_names, jobs)
+        if source not in failed
+    }
+
+
+def compile_bytecode(
+    spec: EnvironmentSpec,
+    output_dir: str,
+    target_python: PythonVersion = sys.version_info[:2],
+    *,
+    rules: Optional[ManifestRules] = None,
+    legacy_layout: bool = False,
+    invalidation_mode: str = 'CHECKED_HASH',
+    max_workers: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Compile local module paths of environment spec for target python into output_dir,
+    laid out as at the remote side, so it could be shipped alongside sources and
+    remote imports them without compilation.
+    """
+
+    return compile_files(
+        get_local_files(spec.local_module_paths, (), rules),
+        output_dir,
+        target_python,
+        legacy_layout=legacy_layout,
+        invalidation_mode=invalidation_mode,
+        max_workers=max_workers,
+    )
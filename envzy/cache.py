@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_DIR_ENV = 'ENVZY_CACHE_DIR'
+
+
+def get_cache_dir() -> Path:
+    """
+    Return root directory of envzy persistent cache.
+
+    It could be overrided with ENVZY_CACHE_DIR env variable,
+    otherwise XDG_CACHE_HOME (or ~/.cache) is used.
+    """
+
+    path = os.environ.get(CACHE_DIR_ENV)
+    if path:
+        return Path(path)
+
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(xdg_cache_home) / 'envzy'
+
+
+def get_cache_path(namespace: str, key: str) -> Path:
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return get_cache_dir() / namespace / digest
+
+
+def read_cache(namespace: str, key: str, *, ttl: Optional[float] = None) -> Optional[bytes]:
+    """
+    Return cached bytes or None if there is no entry or entry is older than ttl seconds.
+    """
+
+    path = get_cache_path(namespace, key)
+
+    try:
+        if ttl is not None and time.time() - path.stat().st_mtime > ttl:
+            return None
+
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def map_cache(namespace: str, key: str, *, ttl: Optional[float] = None) -> Optional[mmap.mmap]:
+    """
+    Same as read_cache, but cached data is memory-mapped read-only instead of reading,
+    so it is shared by all processes and pages are loaded only on access.
+    """
+
+    path = get_cache_path(namespace, key)
+
+    try:
+        with path.open('rb') as f:
+            if ttl is not None and time.time() - os.fstat(f.fileno()).st_mtime > ttl:
+                return None
+
+            # NB: mapping stays valid after file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # NB: empty files can't be mapped
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(namespace: str, key: str, data: bytes) -> None:
+    """
+    Atomically write data to the cache.
+
+    Cache is a best-effort thing, so any filesystem errors are ignored.
+    """
+
+    path = get_cache_path(namespace, key)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
@@ -1,24 +1,32 @@
 from __future__ import annotations
 
-import json
+import dataclasses
 import os
 import site
-import sys
 from functools import lru_cache
-from pathlib import Path
-from typing import FrozenSet, Set, Dict, cast, Iterable, Tuple, Union, List, Optional
+from logging import getLogger
+from typing import TYPE_CHECKING, FrozenSet, Set, Dict, cast, Iterable, Tuple, Union, List, Optional
 from types import ModuleType
 
 from importlib.machinery import ExtensionFileLoader
 
 from typing_extensions import assert_never
-from packaging.tags import PythonVersion
 
+from .env_index import get_environment_lookups
+from .lock import get_marker_environment, get_metadata_requirements
 from .pypi import (
     check_package_version_exists,
     check_package_version_exists_on_target_platform,
+    check_package_version_has_compatible_wheel,
+    find_package_nearest_version_with_compatible_wheel,
+    find_version_with_compatible_wheel,
+    get_best_wheel,
+    get_project_index,
+    get_wheel_metadata,
+    TARGET_PLATFORMS,
 )
 
+from .realpath import realpath
 from .search import ModulesSet
 from .packages import (
     LocalPackage,
@@ -26,23 +34,29 @@ from .packages import (
     PypiDistribution,
     BrokenModules,
     BasePackage,
+    DistributionFile,
+    Target,
 )
 from .utils import (
-    get_files_to_distributions,
-    get_names_to_distributions,
+    get_distribution_profile,
     get_stdlib_module_names,
     get_builtin_module_names,
-    get_requirements_to_meta_packages,
     get_name_from_requirement_string,
     check_distribution_is_meta_package,
-    check_url_is_local_file,
     is_wellknown_fake_module,
     Distribution,
+    DistributionProfile,
 )
 
+if TYPE_CHECKING:
+    from packaging.requirements import Requirement
+    from packaging.tags import PythonVersion
+
 
 DistributionSet = Set[Distribution]
 
+logger = getLogger(__name__)
+
 
 class ModuleClassifier:
     def __init__(
@@ -51,18 +65,25 @@ class ModuleClassifier:
         target_python: PythonVersion,
         *,
         extra_index_urls: Tuple[str, ...] = (),
+        target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+        resolve_wheels: bool = False,
+        inspect_meta_packages: bool = False,
     ):
         self.pypi_index_url = pypi_index_url
         self.extra_index_urls = extra_index_urls
         self.target_python = target_python
+        self.target_platforms = target_platforms
+        self.resolve_wheels = resolve_wheels
+        self.inspect_meta_packages = inspect_meta_packages
 
         self.stdlib_module_names = get_stdlib_module_names()
         self.builtin_module_names = get_builtin_module_names()
-        self.files_to_distributions = get_files_to_distributions()
-        self.names_to_distributions = get_names_to_distributions()
-        self.requirements_to_meta_packages = get_requirements_to_meta_packages()
 
-        self.scripts_directory = Path(sys.prefix).resolve() / 'bin'
+        lookups = get_environment_lookups()
+        self.files_to_distributions = lookups.files_to_distributions
+        self.distributions_profiles = lookups.distributions_profiles
+        self.names_to_distributions = lookups.names_to_distributions
+        self.requirements_to_meta_packages = lookups.requirements_to_meta_packages
 
         self.bad_prefixes = frozenset([
             site.getusersitepackages()
@@ -85,6 +106,79 @@ class ModuleClassifier:
 
         return frozenset(packages)
 
+    def classify_targets(
+        self,
+        modules: Iterable[ModuleType],
+        targets: Iterable[Target],
+    ) -> Dict[Target, FrozenSet[BasePackage]]:
+        """
+        Classify modules once and then check platform support of found pypi distributions
+        for each of targets; project pages are fetched only once per project
+        regardless of targets count.
+        """
+
+        packages = self.classify(modules)
+
+        return {
+            target: frozenset(self._retarget_package(package, target) for package in packages)
+            for target in targets
+        }
+
+    def _retarget_package(self, package: BasePackage, target: Target) -> BasePackage:
+        if not isinstance(package, PypiDistribution):
+            return package
+
+        target_python = cast('PythonVersion', target.python)
+        have_server_supported_tags = self._check_distribution_platform_at_pypi(
+            pypi_index_url=package.pypi_index_url,
+            name=package.name,
+            version=package.version,
+            target_python=target_python,
+            target_platforms=target.platforms,
+        )
+
+        wheel = self._get_distribution_wheel(
+            pypi_index_url=package.pypi_index_url,
+            name=package.name,
+            version=package.version,
+            target_python=target_python,
+            target_platforms=target.platforms,
+        ) if have_server_supported_tags else None
+
+        sdist_only, nearest_wheel_version = self._check_distribution_wheels_at_pypi(
+            pypi_index_url=package.pypi_index_url,
+            name=package.name,
+            version=package.version,
+            target_python=target_python,
+            target_platforms=target.platforms,
+            have_server_supported_tags=have_server_supported_tags,
+        )
+
+        package = dataclasses.replace(
+            package,
+            have_server_supported_tags=have_server_supported_tags,
+            wheel=wheel,
+            sdist_only=sdist_only,
+            nearest_wheel_version=nearest_wheel_version,
+        )
+
+        # target requirements of meta package depend on target python and platform too
+        if self.inspect_meta_packages and have_server_supported_tags and self._check_package_is_meta_package(package):
+            package = self._check_meta_package_target_requirements(package, target_python, target.platforms)
+
+        return package
+
+    def classify_distribution(self, distribution: Distribution) -> Union[PypiDistribution, LocalDistribution]:
+        """
+        Classify distribution which wasn't found through module exploring,
+        for example, some requirement of explored distribution.
+        """
+
+        return self._classify_distribution(distribution, set())
+
+    def find_distribution_at_pypi(self, name: str, version: str) -> Optional[str]:
+        return self._find_distribution_at_pypi(name=name, version=version)
+
     def _classify_modules(
         self,
         modules: Iterable[ModuleType],
@@ -110,7 +204,7 @@ class ModuleClassifier:
             if not filename:
                 continue
 
-            filename = str(Path(filename).resolve())
+            filename = realpath(filename)
 
             # We also not interested in standard modules
             if (
@@ -124,7 +218,7 @@ class ModuleClassifier:
                 continue
 
             distribution = self.files_to_distributions.get(filename)
-            if distribution and not self._check_distribution_is_editable(distribution):
+            if distribution and not self._get_distribution_profile(distribution).is_editable:
                 distributions.add(distribution)
 
                 if self._check_module_is_binary(module):
@@ -165,7 +259,25 @@ class ModuleClassifier:
                 pypi_index_url=pypi_index_url,
                 name=distribution.name,
                 version=distribution.version,
-                target_python=self.target_python
+                target_python=self.target_python,
+                target_platforms=self.target_platforms,
+            )
+
+            wheel = self._get_distribution_wheel(
+                pypi_index_url=pypi_index_url,
+                name=distribution.name,
+                version=distribution.version,
+                target_python=self.target_python,
+                target_platforms=self.target_platforms,
+            ) if have_server_supported_tags else None
+
+            sdist_only, nearest_wheel_version = self._check_distribution_wheels_at_pypi(
+                pypi_index_url=pypi_index_url,
+                name=distribution.name,
+                version=distribution.version,
+                target_python=self.target_python,
+                target_platforms=self.target_platforms,
+                have_server_supported_tags=have_server_supported_tags,
             )
 
             return PypiDistribution(
@@ -173,17 +285,20 @@ class ModuleClassifier:
                 version=distribution.version,
                 pypi_index_url=pypi_index_url,
                 have_server_supported_tags=have_server_supported_tags,
+                wheel=wheel,
+                sdist_only=sdist_only,
+                nearest_wheel_version=nearest_wheel_version,
             )
 
-        paths, console_scripts, bad_paths = self._get_distribution_paths(distribution)
-        is_binary = distribution in binary_distributions
+        profile = self._get_distribution_profile(distribution)
+        is_binary = distribution in binary_distributions or profile.has_extension_modules
         return LocalDistribution(
             name=distribution.name,
             version=distribution.version,
-            paths=paths,
+            paths=profile.paths,
             is_binary=is_binary,
-            bad_paths=bad_paths,
-            console_scripts=console_scripts,
+            bad_paths=profile.bad_paths,
+            console_scripts=profile.console_scripts,
         )
 
     def _classify_modules_without_distributions(
@@ -281,6 +396,11 @@ class ModuleClassifier:
             # step 3: if metapackage is found on pypi, just add it to result
             # as usual PypiPackage
             if isinstance(package, PypiDistribution):
+                if self.inspect_meta_packages and package.have_server_supported_tags:
+                    package = self._check_meta_package_target_requirements(
+                        package, self.target_python, self.target_platforms
+                    )
+
                 result.add(package)
                 continue
 
@@ -336,38 +456,74 @@ class ModuleClassifier:
 
         return result
 
-    def _check_distribution_is_editable(self, distribution: Distribution) -> bool:
-        """Here we checking if package installed as editable installation.
+    def _check_package_is_meta_package(self, package: PypiDistribution) -> bool:
+        distribution = self.names_to_distributions.get(package.name)
+        return distribution is not None and check_distribution_is_meta_package(distribution)
 
-        Relevant links:
-        https://github.com/python/importlib_metadata/issues/404 discussion
-        https://packaging.python.org/en/latest/specifications/direct-url/
-        https://github.com/conda/conda/issues/11580
+    def _check_meta_package_target_requirements(
+        self,
+        package: PypiDistribution,
+        target_python: PythonVersion,
+        target_platforms: Tuple[str, ...],
+    ) -> PypiDistribution:
+        """
+        Local Requires-Dist of meta package could differ from target one
+        (for example, "tensorflow" requires "tensorflow-intel" only on windows),
+        so here we are fetching core metadata of meta package's target wheel
+        and checking that all of its target requirements have compatible wheels.
         """
-        direct_url_str = distribution.read_text('direct_url.json')
-        if not direct_url_str:
-            # there is not direct_url.json
-            return False
-
-        direct_url_data = json.loads(direct_url_str)
-
-        url = direct_url_data.get('url')
-        if not url:
-            # just in case, because spec tells that url must be
-            # always present
-            return False
-
-        editable = direct_url_data.get('dir_info', {}).get('editable')
-
-        # The whole thing about direct_url.json is that
-        # it is a sign of editable installation from the one hand,
-        # but from the other hand, conda left this file at it's
-        # distributions as a artifact of repack process
-        # (see https://github.com/conda/conda/issues/11580).
-        # In case of conda, there will be some strange path like
-        # file:///work/ci_py311/idna_1676822698822/work
-        # which is probably will not exists at user's system
-        return editable and check_url_is_local_file(url)
+
+        wheel = package.wheel or get_best_wheel(
+            pypi_index_url=package.pypi_index_url,
+            name=package.name,
+            version=package.version,
+            target_python=target_python,
+            target_platforms=target_platforms,
+        )
+        if not wheel:
+            return package
+
+        metadata = get_wheel_metadata(wheel)
+        if metadata is None:
+            return package
+
+        environment = get_marker_environment(tuple(target_python), target_platforms)
+        unsupported = [
+            str(requirement)
+            for requirement in get_metadata_requirements(metadata, environment)
+            if not self._find_requirement_with_compatible_wheel(requirement, target_python, target_platforms)
+        ]
+
+        if not unsupported:
+            return package
+
+        logger.debug(
+            'requirements of meta package %s==%s have no compatible wheels for target platform: %s',
+            package.name, package.version, unsupported,
+        )
+        return dataclasses.replace(package, have_server_supported_tags=False)
+
+    def _find_requirement_with_compatible_wheel(
+        self,
+        requirement: Requirement,
+        target_python: PythonVersion,
+        target_platforms: Tuple[str, ...],
+    ) -> Optional[str]:
+        for pypi_index_url in (self.pypi_index_url, ) + self.extra_index_urls:
+            project_index = get_project_index(pypi_index_url=pypi_index_url, name=requirement.name)
+            if not project_index:
+                continue
+
+            version = find_version_with_compatible_wheel(
+                project_index,
+                requirement.specifier,
+                target_python=target_python,
+                target_platforms=target_platforms,
+            )
+            if version:
+                return version
+
+        return None
 
     def _find_distribution_at_pypi(self, name: str, version: str) -> Optional[str]:
         """
@@ -391,46 +547,83 @@ class ModuleClassifier:
         pypi_index_url: str,
         name: str,
         version: str,
-        target_python: PythonVersion
+        target_python: PythonVersion,
+        target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
     ) -> bool:
         return check_package_version_exists_on_target_platform(
             pypi_index_url=pypi_index_url,
             name=name,
             version=version,
             target_python=target_python,
+            target_platforms=target_platforms,
         )
 
-    def _get_distribution_paths(
-        self, distribution: Distribution
-    ) -> Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str]]:
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _check_distribution_wheels_at_pypi(
+        *,
+        pypi_index_url: str,
+        name: str,
+        version: str,
+        target_python: PythonVersion,
+        target_platforms: Tuple[str, ...],
+        have_server_supported_tags: bool,
+    ) -> Tuple[bool, Optional[str]]:
         """
-        If Distribution files are foo/bar, foo/baz and foo1,
-        we want to return {<site-packages>/foo, <site-packages>/foo1}
+        Returns (sdist_only, nearest_wheel_version) pair.
+        Distribution is sdist-only if it is supported at target platform, but
+        the only way to install it is to build it from source, which is slow
+        and requires build toolchain at the remote side.
+        For sdist-only and unsupported distributions we are also looking for
+        the nearest version which have compatible wheel to suggest it as a pin.
         """
 
-        paths = set()
-        bad_paths = set()
-        console_scripts = set()
+        if have_server_supported_tags and check_package_version_has_compatible_wheel(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+            target_python=target_python,
+            target_platforms=target_platforms,
+        ):
+            return False, None
 
-        base_path = distribution.locate_file('').resolve()
+        nearest_wheel_version = find_package_nearest_version_with_compatible_wheel(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+            target_python=target_python,
+            target_platforms=target_platforms,
+        )
 
-        for path in distribution.files or ():
-            abs_path = distribution.locate_file(path).resolve()
+        return have_server_supported_tags, nearest_wheel_version
 
-            if self.scripts_directory in abs_path.parents:
-                console_scripts.add(str(abs_path))
-                continue
+    def _get_distribution_wheel(
+        self,
+        *,
+        pypi_index_url: str,
+        name: str,
+        version: str,
+        target_python: PythonVersion,
+        target_platforms: Tuple[str, ...],
+    ) -> Optional[DistributionFile]:
+        if not self.resolve_wheels:
+            return None
 
-            if base_path not in abs_path.parents:
-                bad_paths.add(str(abs_path))
-                continue
+        return get_best_wheel(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+            target_python=target_python,
+            target_platforms=target_platforms,
+        )
 
-            rel_path = abs_path.relative_to(base_path)
-            first_part = rel_path.parts[0]
-            result_path = base_path / first_part
-            paths.add(str(result_path))
+    def _get_distribution_profile(self, distribution: Distribution) -> DistributionProfile:
+        profile = self.distributions_profiles.get(distribution)
+        if profile is None:
+            # distribution is not from the current environment index
+            profile = get_distribution_profile(distribution)
 
-        return frozenset(paths), frozenset(console_scripts), frozenset(bad_paths)
+        return profile
 
     def _check_module_is_binary(self, module: ModuleType) -> bool:
         loader = getattr(module, '__loader__', None)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dist_info import METADATA_DIR_SUFFIXES, RawDistribution, read_raw_distribution
+from .realpath import realpath
+
+CONDA_META_DIRNAME = 'conda-meta'
+
+
+@dataclass(frozen=True)
+class CondaPackage:
+    """
+    Installed conda package as it is recorded at <prefix>/conda-meta/<name>-<version>-<build>.json
+    """
+
+    path: str
+    name: str
+    version: str
+    # paths relative to environment prefix, always with forward slashes
+    files: Tuple[str, ...]
+
+
+def get_conda_meta_path(prefix: Optional[str] = None) -> str:
+    return os.path.join(sys.prefix if prefix is None else prefix, CONDA_META_DIRNAME)
+
+
+def read_conda_package(path: str) -> Optional[CondaPackage]:
+    try:
+        with open(path, 'rb') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    name = data.get('name')
+    version = data.get('version')
+    files = data.get('files')
+    if not isinstance(name, str) or not isinstance(version, str) or not isinstance(files, list):
+        return None
+
+    return CondaPackage(
+        path=path,
+        name=name,
+        version=version,
+        files=tuple(file for file in files if isinstance(file, str)),
+    )
+
+
+def read_conda_packages(prefix: Optional[str] = None, max_workers: Optional[int] = None) -> List[CondaPackage]:
+    """
+    Read all packages of conda environment (sys.prefix by default);
+    returns empty list if it is not a conda environment.
+    """
+
+    try:
+        with os.scandir(get_conda_meta_path(prefix)) as children:
+            paths = sorted(
+                child.path for child in children
+                if child.name.endswith('.json') and child.is_file()
+            )
+    except OSError:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [package for package in executor.map(read_conda_package, paths) if package]
+
+
+def get_package_metadata_path(package: CondaPackage) -> Optional[str]:
+    """
+    Return path (relative to prefix) of the only .dist-info/.egg-info dir
+    or .egg-info file of package; None for non-python packages and for
+    packages which are containing several distributions.
+    """
+
+    metadata_paths = set()
+
+    for file in package.files:
+        parts = file.split('/')
+        for i, part in enumerate(parts):
+            if part.lower().endswith(METADATA_DIR_SUFFIXES):
+                metadata_paths.add('/'.join(parts[:i + 1]))
+                break
+
+    if len(metadata_paths) != 1:
+        return None
+
+    return metadata_paths.pop()
+
+
+def get_package_record(package: CondaPackage, metadata_path: str) -> Tuple[str, ...]:
+    """
+    Return package files relative to parent of metadata dir, as in RECORD.
+    """
+
+    base = metadata_path.rpartition('/')[0]
+    base_prefix = f'{base}/' if base else ''
+
+    return tuple(
+        file[len(base_prefix):] if file.startswith(base_prefix) else os.path.relpath(file, base or os.curdir)
+        for file in package.files
+    )
+
+
+def _normalize_name(name: str) -> str:
+    # same as utils.canonize_name, but case-insensitive
+    return name.lower().replace('_', '-')
+
+
+def merge_conda_packages(
+    distributions: Iterable[RawDistribution],
+    packages: Iterable[CondaPackage],
+    prefix: Optional[str] = None,
+) -> List[RawDistribution]:
+    """
+    Complete files lists of distributions with files lists of conda packages
+    which are containing them and add distributions which were missed
+    by dist-info reader (metadata outside of sys.path).
+
+    Conda packages without python metadata are skipped: their names are
+    conda names, which are not always the same as PyPI ones.
+    """
+
+    prefix = sys.prefix if prefix is None else prefix
+
+    result = list(distributions)
+    positions: Dict[str, int] = {realpath(distribution.path): i for i, distribution in enumerate(result)}
+    # distribution found through sys.path always wins over the same one from another place
+    names = {_normalize_name(distribution.name) for distribution in result}
+
+    for package in packages:
+        metadata_path = get_package_metadata_path(package)
+        if metadata_path is None:
+            continue
+
+        record = get_package_record(package, metadata_path)
+        path = os.path.join(prefix, *metadata_path.split('/'))
+        real_path = realpath(path)
+        position = positions.get(real_path)
+
+        if position is None:
+            distribution = read_raw_distribution(path)
+            if distribution is None or _normalize_name(distribution.name) in names:
+                continue
+
+            positions[real_path] = len(result)
+            names.add(_normalize_name(distribution.name))
+            result.append(replace(distribution, record=record))
+            continue
+
+        distribution = result[position]
+        result[position] = replace(
+            distribution,
+            record=tuple(dict.fromkeys((distribution.record or ()) + record)),
+        )
+
+    return result
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+METADATA_DIR_SUFFIXES = ('.dist-info', '.egg-info')
+METADATA_FILENAMES = ('METADATA', 'PKG-INFO')
+
+
+@dataclass(frozen=True)
+class RawDistribution:
+    """
+    Minimal information about installed distribution, read directly
+    from its metadata dir without importlib_metadata machinery.
+    """
+
+    # path of .dist-info/.egg-info dir or .egg-info file
+    path: str
+    name: str
+    version: str
+    # paths from RECORD relative to metadata dir's parent, None if there is no RECORD
+    record: Optional[Tuple[str, ...]]
+
+
+def _is_metadata_entry(entry: os.DirEntry) -> bool:
+    name = entry.name.lower()
+    if name.endswith('.egg-info'):
+        # distutils and some system packages are installed with PKG-INFO
+        # as an .egg-info file; there is no files list, but they are distributions still
+        return True
+
+    return name.endswith(METADATA_DIR_SUFFIXES) and entry.is_dir()
+
+
+def iter_metadata_dirs(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Same discovery as importlib_metadata have, but only for directory entries of sys.path;
+    zip archives don't contain files lists anyway. Yields .egg-info files too.
+    """
+
+    for entry in paths:
+        try:
+            with os.scandir(entry or '.') as children:
+                names = sorted(child.name for child in children if _is_metadata_entry(child))
+        except OSError:
+            continue
+
+        for name in names:
+            yield os.path.join(entry, name)
+
+
+def read_metadata_headers(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Return (name, version) reading only headers part of METADATA/PKG-INFO;
+    path is a metadata dir or an .egg-info file, which is PKG-INFO itself.
+    """
+
+    if path.lower().endswith('.egg-info') and os.path.isfile(path):
+        filenames = [path]
+    else:
+        filenames = [os.path.join(path, filename) for filename in METADATA_FILENAMES]
+
+    for filename in filenames:
+        try:
+            with open(filename, encoding='utf-8') as f:
+                name = version = None
+
+                for line in f:
+                    if not line.strip():
+                        break
+
+                    key, _, value = line.partition(':')
+                    if key == 'Name' and name is None:
+                        name = value.strip()
+                    elif key == 'Version' and version is None:
+                        version = value.strip()
+
+                if name is None or version is None:
+                    return None
+
+                return name, version
+        except (OSError, UnicodeDecodeError):
+            continue
+
+    return None
+
+
+def read_record(path: str) -> Optional[Tuple[str, ...]]:
+    try:
+        with open(os.path.join(path, 'RECORD'), encoding='utf-8', newline='') as f:
+            return tuple(row[0] for row in csv.reader(f) if row)
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return None
+
+
+def read_raw_distribution(path: str) -> Optional[RawDistribution]:
+    headers = read_metadata_headers(path)
+    if not headers:
+        return None
+
+    name, version = headers
+    return RawDistribution(
+        path=path,
+        name=name,
+        version=version,
+        record=read_record(path),
+    )
+
+
+def read_raw_distributions(
+    paths: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None,
+) -> List[RawDistribution]:
+    """
+    Read all distributions found at paths (sys.path by default) in discovery order.
+    Reading is mostly IO-bound, so it is spread across thread pool.
+    """
+
+    metadata_dirs = list(iter_metadata_dirs(sys.path if paths is None else paths))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [
+            distribution
+            for distribution in executor.map(read_raw_distribution, metadata_dirs)
+            if distribution
+        ]
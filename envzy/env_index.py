@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Iterator, List, Mapping, NamedTuple, Optional, Tuple, TypeVar
+
+from . import utils
+from .cache import get_cache_path, write_cache
+from .conda_meta import get_conda_meta_path
+from .dist_info import RawDistribution
+from .path_index import IntTable, PathIndex, StringTable, pack_strings
+from .utils import (
+    Distribution,
+    DistributionProfile,
+    get_distributions_index,
+    get_names_to_distributions,
+    get_requirements_to_meta_packages,
+)
+
+# Classifier could work with an on-disk environment index, which is built
+# once per environment and then memory-mapped read-only by every process,
+# so all processes at the host are sharing one physical copy of it and
+# don't need to walk through installed distributions at startup.
+USE_ENVIRONMENT_INDEX = False
+
+ENVIRONMENT_INDEX_NAMESPACE = 'environment-index'
+INDEX_MAGIC = b'ENVZYIX2'
+HEADER = struct.Struct('<8sI')
+SECTION = struct.Struct('<QQ')
+ALIGNMENT = 8
+
+SECTIONS = (
+    # files-to-distributions path index, see PathTables
+    'directories', 'directory_offsets', 'directory_parents', 'directory_children', 'directory_starts',
+    'names', 'name_offsets', 'entry_names', 'entry_values',
+    # distributions sorted by name and their versions and metadata dirs
+    'distributions', 'distribution_offsets',
+    'versions', 'version_offsets',
+    'metadata_paths', 'metadata_path_offsets',
+    # profiles: flags, and [paths, console_scripts, bad_paths] ranges of profile strings
+    'profile_flags', 'profile_strings', 'profile_string_offsets', 'profile_starts',
+    # requirements-to-meta-packages: sorted requirement names and ranges of distributions ids
+    'requirements', 'requirement_offsets', 'requirement_starts', 'requirement_values',
+)
+PROFILE_KINDS = 3
+FLAG_EDITABLE = 1
+FLAG_EXTENSION_MODULES = 2
+
+V = TypeVar('V')
+
+
+class EnvironmentLookups(NamedTuple):
+    files_to_distributions: Mapping[str, Distribution]
+    names_to_distributions: Mapping[str, Distribution]
+    distributions_profiles: Mapping[Distribution, DistributionProfile]
+    requirements_to_meta_packages: Mapping[str, List[Distribution]]
+
+
+def get_environment_lookups() -> EnvironmentLookups:
+    if USE_ENVIRONMENT_INDEX:
+        return get_environment_index().get_lookups()
+
+    files_to_distributions, profiles = get_distributions_index()
+    return EnvironmentLookups(
+        files_to_distributions=files_to_distributions,
+        names_to_distributions=get_names_to_distributions(),
+        distributions_profiles=profiles,
+        # meta packages are needed only if some distributions were found,
+        # so reverse index is built on first use
+        requirements_to_meta_packages=_LazyMapping(get_requirements_to_meta_packages),
+    )
+
+
+def get_environment_fingerprint() -> str:
+    """
+    Environment index is valid until interpreter or sys.path is changed;
+    installation or removal of distribution changes mtime of its site dir.
+    """
+
+    parts = ['1', sys.executable, sys.version, sys.prefix]
+    for entry in sys.path:
+        # NB: '' is a cwd, but we are exploring environment from the tmp dir
+        if not entry:
+            continue
+
+        try:
+            mtime: Optional[int] = os.stat(entry).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        parts.append(f'{entry}:{mtime}')
+
+    if utils.USE_CONDA_META:
+        # conda doesn't touch site dir in case of non-python packages
+        # or packages which are installed outside of it
+        try:
+            conda_meta_mtime: Optional[int] = os.stat(get_conda_meta_path()).st_mtime_ns
+        except OSError:
+            conda_meta_mtime = None
+
+        parts.append(f'conda-meta:{conda_meta_mtime}')
+
+    return '\n'.join(parts)
+
+
+def _encode(string: str) -> bytes:
+    return os.fsencode(string)
+
+
+def build_environment_index() -> bytes:
+    files_to_distributions, profiles = get_distributions_index()
+    names_to_distributions = get_names_to_distributions()
+
+    # NB: tables are searched by encoded keys, so they are sorted by them
+    names = sorted(names_to_distributions, key=_encode)
+    distributions = [names_to_distributions[name] for name in names]
+    distribution_ids = {id(distribution): i for i, distribution in enumerate(distributions)}
+
+    entries: Dict[Tuple[bytes, bytes], int] = {}
+    for path, distribution in files_to_distributions.iter_items():
+        if id(distribution) in distribution_ids:
+            directory, basename = os.path.split(_encode(path))
+            entries[directory, basename] = distribution_ids[id(distribution)]
+
+    tables = PathIndex.build_tables(entries.items())
+
+    profile_flags = bytearray()
+    profile_strings: List[bytes] = []
+    profile_starts = array('I', [0])
+    for distribution in distributions:
+        profile = profiles[distribution]
+        profile_flags.append(
+            (FLAG_EDITABLE if profile.is_editable else 0) |
+            (FLAG_EXTENSION_MODULES if profile.has_extension_modules else 0)
+        )
+        for kind in (profile.paths, profile.console_scripts, profile.bad_paths):
+            profile_strings.extend(sorted(_encode(path) for path in kind))
+            profile_starts.append(len(profile_strings))
+
+    requirements_to_meta_packages = get_requirements_to_meta_packages()
+    requirements = sorted(requirements_to_meta_packages, key=_encode)
+    requirement_starts = array('I', [0])
+    requirement_values = array('I')
+    for requirement in requirements:
+        requirement_values.extend(
+            distribution_ids[id(d)] for d in requirements_to_meta_packages[requirement] if id(d) in distribution_ids
+        )
+        requirement_starts.append(len(requirement_values))
+
+    def get_metadata_path(distribution: Distribution) -> str:
+        raw = getattr(distribution, 'raw', None)
+        return raw.path if raw else str(getattr(distribution.base, '_path', ''))
+
+    sections: Dict[str, Any] = {}
+    for blob_name, offsets_name, strings in (
+        ('directories', 'directory_offsets', tables.directories),
+        ('names', 'name_offsets', tables.names),
+        ('distributions', 'distribution_offsets', [_encode(name) for name in names]),
+        ('versions', 'version_offsets', [_encode(d.version) for d in distributions]),
+        ('metadata_paths', 'metadata_path_offsets', [_encode(get_metadata_path(d)) for d in distributions]),
+        ('profile_strings', 'profile_string_offsets', profile_strings),
+        ('requirements', 'requirement_offsets', [_encode(name) for name in requirements]),
+    ):
+        sections[blob_name], sections[offsets_name] = pack_strings(strings)
+
+    sections['directory_parents'] = tables.directory_parents
+    sections['directory_children'] = tables.directory_children
+    sections['directory_starts'] = tables.directory_starts
+    sections['entry_names'] = tables.entry_names
+    sections['entry_values'] = tables.entry_values
+    sections['profile_flags'] = bytes(profile_flags)
+    sections['profile_starts'] = profile_starts
+    sections['requirement_starts'] = requirement_starts
+    sections['requirement_values'] = requirement_values
+
+    return _pack_sections([bytes(sections[name]) for name in SECTIONS])
+
+
+def _pack_sections(sections: List[bytes]) -> bytes:
+    header_size = HEADER.size + SECTION.size * len(sections)
+    header = [HEADER.pack(INDEX_MAGIC, len(sections))]
+    body = []
+
+    offset = header_size
+    for section in sections:
+        padding = -offset % ALIGNMENT
+        body.append(b'\0' * padding)
+        offset += padding
+
+        header.append(SECTION.pack(offset, len(section)))
+        body.append(section)
+        offset += len(section)
+
+    return b''.join(header + body)
+
+
+class _LazyMapping(Mapping[str, V]):
+    def __init__(self, factory: Callable[[], Mapping[str, V]]):
+        self._factory = factory
+        self._mapping: Optional[Mapping[str, V]] = None
+
+    def _get_mapping(self) -> Mapping[str, V]:
+        if self._mapping is None:
+            self._mapping = self._factory()
+
+        return self._mapping
+
+    def __getitem__(self, key: str) -> V:
+        return self._get_mapping()[key]
+
+    def __len__(self) -> int:
+        return len(self._get_mapping())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_mapping())
+
+
+class _LazySequence(Generic[V]):
+    def __init__(self, length: int, factory: Callable[[int], V]):
+        self._items: List[Optional[V]] = [None] * length
+        self._factory = factory
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, position: int) -> V:
+        item = self._items[position]
+        if item is None:
+            item = self._items[position] = self._factory(position)
+
+        return item
+
+
+class _TableMapping(Mapping[str, V]):
+    """
+    Mapping over sorted StringTable of fs-encoded keys.
+    """
+
+    def __init__(self, keys: StringTable, values: _LazySequence[V]):
+        self._keys = keys
+        self._values = values
+
+    def find(self, key: str) -> int:
+        return self._keys.find(_encode(key))
+
+    def __getitem__(self, key: str) -> V:
+        position = self.find(key) if isinstance(key, str) else -1
+        if position < 0:
+            raise KeyError(key)
+
+        return self._values[position]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(len(self._keys)):
+            yield os.fsdecode(self._keys[position])
+
+
+class _ProfilesMapping(Mapping[Distribution, DistributionProfile]):
+    def __init__(
+        self,
+        names_to_distributions: _TableMapping[Distribution],
+        profiles: _LazySequence[DistributionProfile],
+    ):
+        self._names_to_distributions = names_to_distributions
+        self._profiles = profiles
+
+    def __getitem__(self, distribution: Distribution) -> DistributionProfile:
+        position = self._names_to_distributions.find(distribution.name)
+        # profiles are known only for distributions which were created by index itself
+        if position < 0 or self._names_to_distributions[distribution.name] is not distribution:
+            raise KeyError(distribution)
+
+        return self._profiles[position]
+
+    def __len__(self) -> int:
+        return len(self._names_to_distributions)
+
+    def __iter__(self) -> Iterator[Distribution]:
+        return iter(self._names_to_distributions.values())
+
+
+class EnvironmentIndex:
+    """
+    Read-only view of environment index, built by `build_environment_index`;
+    buffer is usually a read-only mmap, so nothing is deserialized upfront
+    and distributions and profiles are materialized only on demand.
+    """
+
+    def __init__(self, buffer: Any):
+        magic, count = HEADER.unpack_from(buffer, 0)
+        if magic != INDEX_MAGIC or count != len(SECTIONS):
+            raise ValueError('bad environment index format')
+
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._sections: Dict[str, Tuple[int, int]] = {
+            name: SECTION.unpack_from(buffer, HEADER.size + SECTION.size * i)
+            for i, name in enumerate(SECTIONS)
+        }
+
+        self._distributions = self._strings('distributions', 'distribution_offsets')
+        self._versions = self._strings('versions', 'version_offsets')
+        self._metadata_paths = self._strings('metadata_paths', 'metadata_path_offsets')
+        self._profile_flags = self._bytes('profile_flags')
+        self._profile_strings = self._strings('profile_strings', 'profile_string_offsets')
+        self._profile_starts = self._ints('profile_starts')
+        self._requirement_starts = self._ints('requirement_starts')
+        self._requirement_values = self._ints('requirement_values')
+
+        self.distributions: _LazySequence[Distribution] = _LazySequence(
+            len(self._distributions), self._make_distribution
+        )
+        self.names_to_distributions = _TableMapping(self._distributions, self.distributions)
+        self.distributions_profiles = _ProfilesMapping(
+            self.names_to_distributions,
+            _LazySequence(len(self._distributions), self._make_profile),
+        )
+        self.files_to_distributions: PathIndex[Distribution] = PathIndex(
+            self._strings('directories', 'directory_offsets'),
+            self._ints('directory_parents'),
+            self._ints('directory_children'),
+            self._ints('directory_starts'),
+            self._strings('names', 'name_offsets'),
+            self._ints('entry_names'),
+            self._ints('entry_values'),
+            self.distributions,  # type: ignore
+            binary=True,
+        )
+        requirements = self._strings('requirements', 'requirement_offsets')
+        self.requirements_to_meta_packages = _TableMapping(
+            requirements,
+            _LazySequence(len(requirements), self._make_requirement_distributions),
+        )
+
+    def get_lookups(self) -> EnvironmentLookups:
+        return EnvironmentLookups(
+            files_to_distributions=self.files_to_distributions,
+            names_to_distributions=self.names_to_distributions,
+            distributions_profiles=self.distributions_profiles,
+            requirements_to_meta_packages=self.requirements_to_meta_packages,
+        )
+
+    def _bytes(self, name: str) -> memoryview:
+        offset, length = self._sections[name]
+        return self._view[offset:offset + length]
+
+    def _ints(self, name: str) -> IntTable:
+        return self._bytes(name).cast('I')
+
+    def _strings(self, name: str, offsets_name: str) -> StringTable:
+        offset, _ = self._sections[name]
+        return StringTable(self._buffer, self._ints(offsets_name), offset)
+
+    def _make_distribution(self, position: int) -> Distribution:
+        import importlib_metadata
+
+        path = os.fsdecode(self._metadata_paths[position])
+        raw = RawDistribution(
+            path=path,
+            name=os.fsdecode(self._distributions[position]),
+            version=os.fsdecode(self._versions[position]),
+            record=None,
+        )
+        return Distribution(importlib_metadata.PathDistribution(Path(path)), raw)
+
+    def _make_profile(self, position: int) -> DistributionProfile:
+        def get_strings(kind: int) -> frozenset:
+            start = self._profile_starts[position * PROFILE_KINDS + kind]
+            end = self._profile_starts[position * PROFILE_KINDS + kind + 1]
+            return frozenset(os.fsdecode(self._profile_strings[i]) for i in range(start, end))
+
+        flags = self._profile_flags[position]
+        return DistributionProfile(
+            paths=get_strings(0),
+            console_scripts=get_strings(1),
+            bad_paths=get_strings(2),
+            is_editable=bool(flags & FLAG_EDITABLE),
+            has_extension_modules=bool(flags & FLAG_EXTENSION_MODULES),
+        )
+
+    def _make_requirement_distributions(self, position: int) -> List[Distribution]:
+        start = self._requirement_starts[position]
+        end = self._requirement_starts[position + 1]
+        return [self.distributions[self._requirement_values[i]] for i in range(start, end)]
+
+
+def open_environment_index(path: Path) -> Optional[EnvironmentIndex]:
+    try:
+        with path.open('rb') as f:
+            # NB: mapping stays valid after file is closed
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        return EnvironmentIndex(buffer)
+    except (ValueError, struct.error):
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_environment_index() -> EnvironmentIndex:
+    key = get_environment_fingerprint()
+
+    index = open_environment_index(get_cache_path(ENVIRONMENT_INDEX_NAMESPACE, key))
+    if index is None:
+        data = build_environment_index()
+        write_cache(ENVIRONMENT_INDEX_NAMESPACE, key, data)
+
+        index = open_environment_index(get_cache_path(ENVIRONMENT_INDEX_NAMESPACE, key))
+        if index is None:
+            # cache dir is not writable
+            index = EnvironmentIndex(data)
+
+    return index
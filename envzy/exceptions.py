@@ -7,3 +7,7 @@ class EnvzyError(Exception):
 
 class BadPypiIndex(EnvzyError):
     pass
+
+
+class TargetInterpreterNotFound(EnvzyError):
+    pass
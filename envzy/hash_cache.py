@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .cache import read_cache, write_cache
+
+HASH_CACHE_NAMESPACE = 'file-hashes'
+
+# Files which were modified within this window before cache saving could be
+# modified again within the same mtime tick without changing any stat field
+# (so called racy files in git terms), so they are not persisted and will be rehashed.
+# Two seconds covers the coarsest mtime granularity of widespread filesystems.
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+# [inode, size, mtime_ns, sha256]
+Entry = List[Any]
+
+
+def _check_entry(entry: Any) -> bool:
+    # NB: bool is int too, but it can't be a result of json.dumps of stat fields
+    return (
+        isinstance(entry, list) and
+        len(entry) == 4 and
+        all(type(field) is int for field in entry[:3]) and
+        isinstance(entry[3], str)
+    )
+
+
+class HashCache:
+    """
+    Persistent cache of files content hashes, keyed by file path and its
+    (inode, size, mtime_ns), so unchanged files are never reread.
+
+    One cache is kept per root (local module path, for example) and it is
+    pruned at save to files which were looked up, so it doesn't grow forever.
+    """
+
+    def __init__(self, root: str, entries: Optional[Dict[str, Entry]] = None):
+        self.root = root
+        self._entries: Dict[str, Entry] = entries or {}
+        self._used: Dict[str, Entry] = {}
+        self._changed = False
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, root: str) -> HashCache:
+        data = read_cache(HASH_CACHE_NAMESPACE, root)
+        if data is None:
+            return cls(root)
+
+        # NB: json is parsed in C, it is several times faster than parsing of any text format in python
+        try:
+            entries = json.loads(data)
+        except ValueError:
+            entries = None
+
+        if not isinstance(entries, dict):
+            # broken cache is the same as absent one
+            return cls(root)
+
+        return cls(root, {path: entry for path, entry in entries.items() if _check_entry(entry)})
+
+    def get(self, path: str, stat_result: os.stat_result) -> Optional[str]:
+        entry = self._entries.get(path)
+        if (
+            entry is None or
+            entry[0] != stat_result.st_ino or
+            entry[1] != stat_result.st_size or
+            entry[2] != stat_result.st_mtime_ns
+        ):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._used[path] = entry
+        return entry[3]
+
+    def put(self, path: str, stat_result: os.stat_result, sha256: str) -> None:
+        entry = [stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns, sha256]
+        self._entries[path] = self._used[path] = entry
+        self._changed = True
+
+    def save(self) -> None:
+        if not self._changed and len(self._used) == len(self._entries):
+            # all entries are still actual, there is nothing to rewrite
+            return
+
+        racy_threshold = time.time_ns() - RACY_WINDOW_NS
+
+        entries = {
+            path: entry
+            for path, entry in self._used.items()
+            if entry[2] < racy_threshold
+        }
+
+        write_cache(HASH_CACHE_NAMESPACE, self.root, json.dumps(entries).encode('utf-8'))
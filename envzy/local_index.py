@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import os
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from pypi_simple import ProjectPage
+
+LOCAL_INDEX_SCHEME = 'file'
+DISTRIBUTION_SUFFIXES = ('.whl', '.tar.gz', '.zip', '.tar.bz2')
+
+
+def get_local_index_path(pypi_index_url: str) -> Optional[Path]:
+    """
+    Return local path for file:// index urls and None for all others.
+    """
+
+    parts = urlsplit(pypi_index_url)
+    if parts.scheme != LOCAL_INDEX_SCHEME:
+        return None
+
+    # NB: urllib.request imports http.client and email, which is too much for import of envzy
+    from urllib.request import url2pathname
+
+    return Path(url2pathname(parts.path))
+
+
+@lru_cache(maxsize=None)
+def get_wheelhouse_index(path: Path) -> Dict[str, Tuple[Tuple[str, str, str], ...]]:
+    """
+    Scan directory of wheels/sdists once and return mapping of
+    normalized project name to (filename, version, package_type) triples.
+    """
+
+    from packaging.utils import canonicalize_name
+    from pypi_simple import UnparsableFilenameError, parse_filename
+
+    result: Dict[str, List[Tuple[str, str, str]]] = {}
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return {}
+
+    for entry in entries:
+        if not entry.name.endswith(DISTRIBUTION_SUFFIXES) or not entry.is_file():
+            continue
+
+        try:
+            project, version, package_type = parse_filename(entry.name)
+        except UnparsableFilenameError:
+            continue
+
+        result.setdefault(canonicalize_name(project), []).append((entry.name, version, package_type))
+
+    return {
+        name: tuple(sorted(files))
+        for name, files in result.items()
+    }
+
+
+@lru_cache(maxsize=None)
+def check_local_index_is_wheelhouse(pypi_index_url: str) -> bool:
+    """
+    Check if url is a local wheelhouse (flat directory of distributions) and not
+    a snapshot of simple index; pip could use wheelhouse only through --find-links.
+    """
+
+    path = get_local_index_path(pypi_index_url)
+    if path is None:
+        return False
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return False
+
+    return not any(
+        entry.is_dir() and any(os.path.isfile(os.path.join(entry.path, page)) for page in ('index.json', 'index.html'))
+        for entry in entries
+    )
+
+
+def _get_snapshot_project_page(path: Path, name: str) -> Optional[ProjectPage]:
+    """
+    Read saved simple index page from <path>/<normalized-name>/index.{json,html}.
+    """
+
+    from pypi_simple import ProjectPage
+
+    project_dir = path / name
+    base_url = project_dir.as_uri() + '/'
+
+    json_page = project_dir / 'index.json'
+    if json_page.is_file():
+        return ProjectPage.from_json_data(json.loads(json_page.read_bytes()), base_url=base_url)
+
+    html_page = project_dir / 'index.html'
+    if html_page.is_file():
+        return ProjectPage.from_html(name, html_page.read_bytes(), base_url=base_url)
+
+    return None
+
+
+def get_local_project_page(pypi_index_url: str, name: str) -> Optional[ProjectPage]:
+    """
+    Answer project page requests from a local wheelhouse or from a saved
+    snapshot of simple index pages, so classification could work without network.
+    """
+
+    from packaging.utils import canonicalize_name
+    from pypi_simple import DistributionPackage, ProjectPage
+
+    path = get_local_index_path(pypi_index_url)
+    if path is None:
+        raise ValueError(f'{pypi_index_url} is not a local index url')
+
+    name = canonicalize_name(name)
+
+    page = _get_snapshot_project_page(path, name)
+    if page is not None:
+        return page
+
+    files = get_wheelhouse_index(path).get(name)
+    if not files:
+        return None
+
+    return ProjectPage(
+        project=name,
+        packages=[
+            DistributionPackage(
+                filename=filename,
+                url=(path / filename).as_uri(),
+                project=name,
+                version=version,
+                package_type=package_type,
+                digests={},
+                requires_python=None,
+                has_sig=None,
+            )
+            for filename, version, package_type in files
+        ],
+        repository_version=None,
+        last_serial=None,
+    )
+
+
+def read_local_wheel_metadata(url: str) -> Optional[str]:
+    """
+    Read METADATA from a local wheel; it is the same as PEP 658 .metadata file.
+    """
+
+    path = get_local_index_path(url)
+    if path is None:
+        raise ValueError(f'{url} is not a local url')
+
+    try:
+        with zipfile.ZipFile(path) as wheel:
+            for name in wheel.namelist():
+                parts = name.split('/')
+                if len(parts) == 2 and parts[0].endswith('.dist-info') and parts[1] == 'METADATA':
+                    return wheel.read(name).decode('utf-8')
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+    return None
+
+
+def get_local_file_size(url: str) -> Optional[int]:
+    path = get_local_index_path(url)
+    if path is None:
+        raise ValueError(f'{url} is not a local url')
+
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set, Tuple, cast
+
+from .local_index import check_local_index_is_wheelhouse, get_local_index_path
+from .pypi import TARGET_PLATFORMS, get_release_files
+from .utils import Distribution, get_names_to_distributions
+
+if TYPE_CHECKING:
+    from packaging.requirements import Requirement
+
+MarkerEnvironment = Dict[str, str]
+
+
+@dataclass(frozen=True)
+class LockedRequirement:
+    name: str
+    version: str
+    pypi_index_url: str
+    hashes: Tuple[str, ...]
+
+
+def get_marker_environment(
+    target_python: Tuple[int, ...],
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> MarkerEnvironment:
+    """
+    Return PEP 508 marker environment of target (linux, CPython) platform.
+    """
+
+    from packaging.markers import default_environment
+
+    major, minor, *rest = target_python
+    micro = rest[0] if rest else 0
+
+    # all target platforms are linux_<arch> or manylinux*_<arch>
+    machine = 'x86_64'
+    for platform in target_platforms:
+        if platform.startswith('linux_'):
+            machine = platform[len('linux_'):]
+            break
+
+    environment = dict(cast(MarkerEnvironment, default_environment()))
+    environment.update({
+        'implementation_name': 'cpython',
+        'implementation_version': f'{major}.{minor}.{micro}',
+        'os_name': 'posix',
+        'platform_machine': machine,
+        'platform_python_implementation': 'CPython',
+        'platform_release': '',
+        'platform_system': 'Linux',
+        'platform_version': '',
+        'python_full_version': f'{major}.{minor}.{micro}',
+        'python_version': f'{major}.{minor}',
+        'sys_platform': 'linux',
+    })
+
+    return environment
+
+
+def filter_requirements(
+    requirement_strings: Iterable[str],
+    environment: MarkerEnvironment,
+    extras: Iterable[str] = (),
+) -> List[Requirement]:
+    """
+    Parse requirement strings and return only those which are required at target environment.
+    """
+
+    from packaging.requirements import Requirement, InvalidRequirement
+
+    result = []
+
+    for requirement_string in requirement_strings:
+        try:
+            requirement = Requirement(requirement_string)
+        except InvalidRequirement:
+            continue
+
+        if requirement.marker and not any(
+            requirement.marker.evaluate({**environment, 'extra': extra})
+            for extra in ('', *extras)
+        ):
+            continue
+
+        result.append(requirement)
+
+    return result
+
+
+def get_metadata_requirements(metadata: str, environment: MarkerEnvironment) -> List[Requirement]:
+    """
+    Return requirements from core metadata (METADATA, PKG-INFO or PEP 658 .metadata file)
+    which are required at target environment.
+    """
+
+    from email.parser import HeaderParser
+
+    message = HeaderParser().parsestr(metadata)
+    return filter_requirements(message.get_all('Requires-Dist') or (), environment)
+
+
+def get_requirements_closure(
+    names: Iterable[str],
+    environment: MarkerEnvironment,
+) -> Tuple[List[Distribution], List[str]]:
+    """
+    Walk through locally installed Requires-Dist graph starting from given
+    distribution names, evaluating markers for target environment.
+
+    Returns found distributions (including roots) and names of requirements
+    which are not installed locally.
+    """
+
+    from packaging.utils import canonicalize_name
+
+    distributions: Dict[str, Distribution] = {
+        canonicalize_name(distribution.name): distribution
+        for distribution in get_names_to_distributions().values()
+    }
+
+    seen_extras: Dict[str, Set[str]] = {}
+    missing: Set[str] = set()
+    stack: List[Tuple[str, Set[str]]] = [(canonicalize_name(name), set()) for name in names]
+
+    while stack:
+        name, extras = stack.pop()
+
+        distribution = distributions.get(name)
+        if not distribution:
+            missing.add(name)
+            continue
+
+        # we could see distribution earlier, but with another set of extras
+        if name in seen_extras and extras <= seen_extras[name]:
+            continue
+
+        seen_extras.setdefault(name, set()).update(extras)
+
+        requirements = filter_requirements(distribution.requires or (), environment, seen_extras[name])
+        for requirement in requirements:
+            stack.append((canonicalize_name(requirement.name), set(requirement.extras)))
+
+    result = sorted(
+        (distributions[name] for name in seen_extras),
+        key=lambda d: canonicalize_name(d.name),
+    )
+
+    return result, sorted(missing)
+
+
+def _hash_local_file(url: str) -> str:
+    path = get_local_index_path(url)
+    assert path is not None
+
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_release_hashes(*, pypi_index_url: str, name: str, version: str) -> Tuple[str, ...]:
+    """
+    Return sha256 hashes of all release files in pip's --hash format.
+    Files of local indexes which doesn't provide hashes are hashed in place;
+    if some other file has no known sha256, nothing is returned, as pip could
+    choose exactly this file and partial hashes would be rejected.
+    """
+
+    result = set()
+
+    for file in get_release_files(pypi_index_url=pypi_index_url, name=name, version=version) or ():
+        sha256 = dict(file.hashes).get('sha256')
+
+        if not sha256 and get_local_index_path(file.url) is not None:
+            sha256 = _hash_local_file(file.url)
+
+        if not sha256:
+            return ()
+
+        result.add(f'sha256:{sha256}')
+
+    return tuple(sorted(result))
+
+
+def get_unhashed_requirements(requirements: Iterable[LockedRequirement]) -> List[str]:
+    """
+    Return names of requirements without hashes if some of requirements have them.
+    """
+
+    requirements = list(requirements)
+    if not any(r.hashes for r in requirements):
+        return []
+
+    return [r.name for r in requirements if not r.hashes]
+
+
+def format_requirements_lock(
+    requirements: Iterable[LockedRequirement],
+    pypi_index_url: str,
+    extra_index_urls: Iterable[str] = (),
+) -> str:
+    """
+    Format requirements in pip requirements file format, suitable for
+    `pip install --no-deps --require-hashes -r <file>`. pip rejects hash-checking
+    file if some requirement has no hashes, so in this case hashes are omitted
+    for all of them, see get_unhashed_requirements.
+
+    Local wheelhouses are passed as --find-links, as pip doesn't find
+    anything at them through --index-url; --no-index is added if there
+    is no real index among used ones.
+    """
+
+    from packaging.utils import canonicalize_name
+
+    requirements = sorted(requirements, key=lambda r: canonicalize_name(r.name))
+    used_index_urls = {r.pypi_index_url for r in requirements}
+
+    index_urls = list(dict.fromkeys(
+        [pypi_index_url] + [url for url in extra_index_urls if url in used_index_urls]
+    ))
+    wheelhouses = [url for url in index_urls if check_local_index_is_wheelhouse(url)]
+    indexes = [url for url in index_urls if url not in wheelhouses]
+
+    if indexes:
+        lines = [f'--index-url {indexes[0]}']
+        lines.extend(f'--extra-index-url {url}' for url in indexes[1:])
+    else:
+        lines = ['--no-index']
+
+    lines.extend(f'--find-links {url}' for url in wheelhouses)
+
+    with_hashes = not get_unhashed_requirements(requirements)
+    for requirement in requirements:
+        line = f'{requirement.name}=={requirement.version}'
+        if with_hashes and requirement.hashes:
+            line += ' \\\n' + ' \\\n'.join(f'    --hash={h}' for h in requirement.hashes)
+
+        lines.append(line)
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+from .cache import read_cache, write_cache
+from .hash_cache import RACY_WINDOW_NS, HashCache
+from .packages import LocalPackage
+from .utils import get_path_size
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# console scripts are placed to bin/ at the remote side
+SCRIPTS_DIRNAME = 'bin'
+
+# If enabled, files hashes are persisted at envzy cache dir (one cache per local
+# module path) and reused while inode, size and mtime of file are not changed,
+# so only changed files are reread.
+USE_HASH_CACHE = False
+# merkle roots of paths along with digests of their files stats, see get_paths_fingerprints
+FINGERPRINTS_NAMESPACE = 'path-fingerprints'
+
+# files which are never needed at the remote side: bytecode is recompiled there
+# and VCS or tools metadata is never imported
+DEFAULT_EXCLUDE = (
+    '__pycache__',
+    '*.pyc',
+    '*.pyo',
+    '.git',
+    '.hg',
+    '.svn',
+    '.bzr',
+    '.tox',
+    '.nox',
+    '.mypy_cache',
+    '.pytest_cache',
+    '.ruff_cache',
+    '.ipynb_checkpoints',
+    '.DS_Store',
+)
+# not a part of DEFAULT_EXCLUDE, because some projects are importing helpers from their tests
+TESTS_EXCLUDE = ('tests', 'test', 'conftest.py')
+
+# reasons of ExcludedPath
+EXCLUDED_BY_RULE = 'rule'
+EXCLUDED_BY_SIZE = 'size'
+# same path with the same content is shipped with another package already
+# (top-level dir of a namespace package, for example)
+EXCLUDED_AS_DUPLICATE = 'duplicate'
+# same path with another content is shipped with another package, which shadows this one locally
+EXCLUDED_AS_CONFLICT = 'conflict'
+
+
+@lru_cache(maxsize=None)
+def _compile_patterns(patterns: Tuple[str, ...]) -> Tuple[Optional[Pattern], Optional[Pattern]]:
+    """
+    Join patterns into one regex for names and one for relative paths,
+    so each file is checked by two regex calls instead of fnmatch call per pattern.
+    """
+
+    names = [fnmatch.translate(pattern) for pattern in patterns if '/' not in pattern]
+    paths = [fnmatch.translate(pattern) for pattern in patterns if '/' in pattern]
+
+    return (
+        re.compile('|'.join(names)) if names else None,
+        re.compile('|'.join(paths)) if paths else None,
+    )
+
+
+def _match_patterns(patterns: Tuple[str, ...], name: str, relative_path: str) -> bool:
+    names_regex, paths_regex = _compile_patterns(tuple(patterns))
+    return (
+        names_regex is not None and names_regex.match(name) is not None or
+        paths_regex is not None and paths_regex.match(relative_path) is not None
+    )
+
+
+@dataclass(frozen=True)
+class ManifestRules:
+    """
+    Rules of pruning local module paths down to files which are worth shipping.
+
+    Patterns are case-sensitive fnmatch ones: pattern without a slash is matched
+    against a file or directory name at any depth, pattern with a slash is matched
+    against a whole path relative to sys.path entry (like 'foo/data/*.csv'), where
+    '*' matches slashes too. Include patterns take precedence over exclude patterns
+    and max_file_size, but, as in .gitignore, files of an excluded directory
+    can't be included back. Local module paths themselves are never excluded.
+    """
+
+    exclude: Tuple[str, ...] = DEFAULT_EXCLUDE
+    include: Tuple[str, ...] = ()
+    # bytes, bigger files are excluded
+    max_file_size: Optional[int] = None
+
+    def is_excluded(self, name: str, relative_path: str) -> bool:
+        return (
+            _match_patterns(self.exclude, name, relative_path) and
+            not _match_patterns(self.include, name, relative_path)
+        )
+
+    def is_oversized(self, name: str, relative_path: str, size: int) -> bool:
+        return (
+            self.max_file_size is not None and
+            size > self.max_file_size and
+            not _match_patterns(self.include, name, relative_path)
+        )
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    # path relative to the parent of a local module path (as it would be at the
+    # remote sys.path entry) or bin/<name> for console scripts, always with forward slashes
+    path: str
+    size: int
+    mode: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class PackageManifest:
+    name: str
+    # sorted by path
+    entries: Tuple[ManifestEntry, ...]
+    # merkle root over entries, so unchanged package could be skipped as a whole
+    root: str
+
+
+@dataclass(frozen=True)
+class ExcludedPath:
+    # local file or whole directory
+    path: str
+    # EXCLUDED_BY_RULE, EXCLUDED_BY_SIZE, EXCLUDED_AS_DUPLICATE or EXCLUDED_AS_CONFLICT
+    reason: str
+    size: int
+
+
+@dataclass(frozen=True)
+class Manifest:
+    packages: Tuple[PackageManifest, ...]
+    # content hash -> local file with this content, source of blobs for uploader
+    blobs: Dict[str, str]
+    # sorted by path
+    excluded: Tuple[ExcludedPath, ...] = ()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for package in self.packages for entry in package.entries)
+
+    @property
+    def excluded_bytes(self) -> int:
+        return sum(excluded.size for excluded in self.excluded)
+
+    def get_missing_blobs(self, known_hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Return blobs which are absent at content-addressed store.
+        """
+
+        known = frozenset(known_hashes)
+        return {sha256: path for sha256, path in self.blobs.items() if sha256 not in known}
+
+
+def iter_path_entries(
+    path: str,
+    relative_path: str,
+    rules: Optional[ManifestRules] = None,
+    excluded: Optional[List[ExcludedPath]] = None,
+) -> Iterator[Tuple[str, str, Optional[os.DirEntry]]]:
+    """
+    Yield (relative path, absolute path, dir entry) of all files of path in a sorted order;
+    symlinks to files are followed, symlinks to directories are not (same as get_path_size).
+    Dir entry is None for path itself; it caches stat, see get_entry_stat.
+
+    Files and directories pruned by rules are appended to excluded, if it is given;
+    excluded directories are not walked through except for their size.
+    """
+
+    if not os.path.isdir(path) or os.path.islink(path):
+        if os.path.isfile(path):
+            yield relative_path, path, None
+        return
+
+    try:
+        with os.scandir(path) as children:
+            entries = sorted(children, key=lambda entry: entry.name)
+    except OSError:
+        return
+
+    for entry in entries:
+        try:
+            is_directory = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+
+        child_relative_path = f'{relative_path}/{entry.name}'
+
+        if rules is not None and rules.is_excluded(entry.name, child_relative_path):
+            if excluded is not None:
+                excluded.append(ExcludedPath(entry.path, EXCLUDED_BY_RULE, get_path_size(entry.path)))
+            continue
+
+        if is_directory:
+            yield from iter_path_entries(entry.path, child_relative_path, rules, excluded)
+            continue
+
+        if not entry.is_file():
+            continue
+
+        if rules is not None and rules.max_file_size is not None:
+            size = entry.stat().st_size
+            if rules.is_oversized(entry.name, child_relative_path, size):
+                if excluded is not None:
+                    excluded.append(ExcludedPath(entry.path, EXCLUDED_BY_SIZE, size))
+                continue
+
+        yield child_relative_path, entry.path, entry
+
+
+def iter_path_files(
+    path: str,
+    relative_path: str,
+    rules: Optional[ManifestRules] = None,
+    excluded: Optional[List[ExcludedPath]] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Same as iter_path_entries, but yields only (relative path, absolute path) pairs.
+    """
+
+    for child_relative_path, child_path, _ in iter_path_entries(path, relative_path, rules, excluded):
+        yield child_relative_path, child_path
+
+
+def get_entry_stat(path: str, entry: Optional[os.DirEntry]) -> os.stat_result:
+    # NB: DirEntry caches stat, so file taken by size rule is not statted twice
+    return os.stat(path) if entry is None else entry.stat()
+
+
+def get_local_files(
+    local_module_paths: Iterable[str],
+    console_scripts: Iterable[str],
+    rules: Optional[ManifestRules] = None,
+) -> Dict[str, str]:
+    """
+    Return relative path (as ManifestEntry.path) -> local file for all files of
+    local module paths and console scripts, pruned by rules if they are given.
+    """
+
+    files: Dict[str, str] = {}
+    for path in local_module_paths:
+        files.update(iter_path_files(path, os.path.basename(path), rules))
+
+    for script in console_scripts:
+        files[f'{SCRIPTS_DIRNAME}/{os.path.basename(script)}'] = script
+
+    return files
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_files_hashes(paths: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, str]:
+    """
+    Hash given files in parallel: hashlib releases GIL for big buffers,
+    so threads are fine here.
+    """
+
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(hash_file, paths)))
+
+
+def get_roots_files_hashes(
+    roots_files: Dict[str, List[str]],
+    stats: Dict[str, os.stat_result],
+    max_workers: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Return hashes of files grouped by their roots (local module paths);
+    in case of USE_HASH_CACHE only files with changed stat are hashed.
+    """
+
+    if not USE_HASH_CACHE:
+        return get_files_hashes(
+            (path for files in roots_files.values() for path in files),
+            max_workers=max_workers,
+        )
+
+    caches = {root: HashCache.load(root) for root in roots_files}
+    result: Dict[str, str] = {}
+    # NB: file could be under several roots (overlapping paths or script inside of
+    # a module dir), it should be put into every cache which doesn't have it
+    missed: Dict[str, List[HashCache]] = {}
+
+    for root, files in roots_files.items():
+        cache = caches[root]
+        for path in files:
+            sha256 = cache.get(path, stats[path])
+            if sha256 is None:
+                missed.setdefault(path, []).append(cache)
+            else:
+                result[path] = sha256
+
+    result.update(get_files_hashes((path for path in missed if path not in result), max_workers=max_workers))
+
+    for path, path_caches in missed.items():
+        for cache in path_caches:
+            cache.put(path, stats[path], result[path])
+
+    for cache in caches.values():
+        cache.save()
+
+    return result
+
+
+def make_manifest_entry(relative_path: str, stat_result: os.stat_result, sha256: str) -> ManifestEntry:
+    return ManifestEntry(
+        path=relative_path,
+        size=stat_result.st_size,
+        mode=stat.S_IMODE(stat_result.st_mode),
+        sha256=sha256,
+    )
+
+
+def get_merkle_root(entries: Iterable[ManifestEntry]) -> str:
+    """
+    Binary merkle tree over sorted entries; leaves are covering path and mode too,
+    so renames and chmods are changing the root.
+    Leaves and nodes are prefixed differently to avoid second preimage attacks.
+    """
+
+    level = [
+        hashlib.sha256(f'\0{entry.path}\0{entry.mode:o}\0{entry.size}\0{entry.sha256}'.encode()).digest()
+        for entry in sorted(entries, key=attrgetter('path'))
+    ]
+
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+
+    while len(level) > 1:
+        next_level = [
+            hashlib.sha256(b'\1' + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            # odd node is promoted as is
+            next_level.append(level[-1])
+
+        level = next_level
+
+    return level[0].hex()
+
+
+def get_sys_path_priorities() -> Dict[str, int]:
+    """
+    sys.path entry -> its index, the first one wins, as it does at import.
+    """
+
+    priorities: Dict[str, int] = {}
+    for i, entry in enumerate(sys.path):
+        priorities.setdefault(os.path.abspath(entry or os.curdir), i)
+
+    return priorities
+
+
+def build_manifest(
+    packages: Iterable[LocalPackage],
+    max_workers: Optional[int] = None,
+    rules: Optional[ManifestRules] = None,
+) -> Manifest:
+    """
+    Files of local module paths are pruned by rules, if they are given. Relative path
+    which is shared by several packages (as top-level dir of a namespace package is)
+    is kept only once: the copy which is imported locally wins, that is the one
+    from the first sys.path entry, then the one of the first package by name.
+    Other copies are reported as duplicates if their content is the same,
+    and as conflicts otherwise, so nothing is shipped twice.
+    """
+
+    # relative path -> (priority, package name, local file) of each copy, the winner is the first one
+    candidates: Dict[str, List[Tuple[int, str, str]]] = {}
+    # local module path (or scripts dir) -> its files, roots are units of hash caching
+    roots_files: Dict[str, List[str]] = {}
+    walked_roots: Set[str] = set()
+    excluded: List[ExcludedPath] = []
+    priorities = get_sys_path_priorities()
+
+    # NB: files are statted (while walking) before hashing, so in case of concurrent
+    # modification cached hash is bound to the stale stat and will be recomputed next time
+    stats: Dict[str, os.stat_result] = {}
+
+    packages = sorted(packages, key=lambda p: p.name)
+    for package in packages:
+        package_files: List[Tuple[str, str, str, Optional[os.DirEntry]]] = []
+
+        for root in sorted(package.paths):
+            # NB: shared root is walked once per package, but its pruned files are reported once
+            root_excluded = excluded if root not in walked_roots else None
+            walked_roots.add(root)
+            package_files.extend(
+                (root, relative_path, path, entry)
+                for relative_path, path, entry in iter_path_entries(
+                    root, os.path.basename(root), rules, root_excluded
+                )
+            )
+
+        package_files.extend(
+            (os.path.dirname(script), f'{SCRIPTS_DIRNAME}/{os.path.basename(script)}', script, None)
+            for script in sorted(package.console_scripts)
+        )
+
+        seen: Set[str] = set()
+        for root, relative_path, path, entry in package_files:
+            if relative_path in seen:
+                # overlapping paths of the same package
+                continue
+            seen.add(relative_path)
+
+            if path not in stats:
+                stats[path] = get_entry_stat(path, entry)
+
+            priority = priorities.get(os.path.dirname(os.path.abspath(root)), len(priorities))
+            candidates.setdefault(relative_path, []).append((priority, package.name, path))
+            roots_files.setdefault(root, []).append(path)
+
+    # NB: all copies are hashed, because it is content which tells duplicate from conflict
+    hashes = get_roots_files_hashes(roots_files, stats, max_workers=max_workers)
+
+    # package name -> relative path -> local file
+    packages_files: Dict[str, Dict[str, str]] = {package.name: {} for package in packages}
+    for relative_path, copies in candidates.items():
+        (_, name, path), *others = sorted(copies)
+        packages_files[name][relative_path] = path
+
+        for _, _, other_path in others:
+            reason = EXCLUDED_AS_DUPLICATE if hashes[other_path] == hashes[path] else EXCLUDED_AS_CONFLICT
+            excluded.append(ExcludedPath(other_path, reason, stats[other_path].st_size))
+
+    result = []
+    blobs: Dict[str, str] = {}
+
+    for name, files in packages_files.items():
+        entries = []
+        for relative_path, path in sorted(files.items()):
+            entries.append(make_manifest_entry(relative_path, stats[path], hashes[path]))
+            blobs.setdefault(hashes[path], path)
+
+        result.append(PackageManifest(
+            name=name,
+            entries=tuple(entries),
+            root=get_merkle_root(entries),
+        ))
+
+    return Manifest(
+        packages=tuple(result),
+        blobs=blobs,
+        excluded=tuple(sorted(excluded, key=attrgetter('path'))),
+    )
+
+
+def get_stats_digest(files: Iterable[Tuple[str, os.stat_result]]) -> str:
+    """
+    Digest of (relative path, inode, size, mtime, mode) of each file: if it is the same,
+    files are the same as well (with the same reservations as HashCache has).
+    """
+
+    data = ''.join(
+        f'{relative_path}\0{st.st_ino}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode:o}\n'
+        for relative_path, st in files
+    )
+    return hashlib.sha256(data.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def _read_fingerprint(path: str, stats_digest: str) -> Optional[str]:
+    data = read_cache(FINGERPRINTS_NAMESPACE, path)
+    if data is None:
+        return None
+
+    try:
+        cached = json.loads(data)
+    except ValueError:
+        return None
+
+    if not isinstance(cached, dict) or cached.get('stats') != stats_digest or not isinstance(cached.get('root'), str):
+        return None
+
+    return cached['root']
+
+
+def get_paths_fingerprints(paths: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, str]:
+    """
+    Return merkle root of each path's files, same as PackageManifest.root of package with only
+    this path. With USE_HASH_CACHE it is cheap if nothing is changed: merkle root is persisted
+    along with digest of files stats, so only walk through path and stat of each file are needed.
+    """
+
+    result: Dict[str, str] = {}
+    # path -> (relative path, local file, stat) of its files
+    changed: Dict[str, List[Tuple[str, str, os.stat_result]]] = {}
+    stats_digests: Dict[str, str] = {}
+
+    for path in sorted(set(paths)):
+        files = [
+            (relative_path, file_path, get_entry_stat(file_path, entry))
+            for relative_path, file_path, entry in iter_path_entries(path, os.path.basename(path))
+        ]
+
+        if USE_HASH_CACHE:
+            stats_digests[path] = get_stats_digest((relative_path, st) for relative_path, _, st in files)
+            root = _read_fingerprint(path, stats_digests[path])
+            if root is not None:
+                result[path] = root
+                continue
+
+        changed[path] = files
+
+    if not changed:
+        return result
+
+    stats = {file_path: st for files in changed.values() for _, file_path, st in files}
+    hashes = get_roots_files_hashes(
+        {path: [file_path for _, file_path, _ in files] for path, files in changed.items()},
+        stats,
+        max_workers=max_workers,
+    )
+    racy_threshold = time.time_ns() - RACY_WINDOW_NS
+
+    for path, files in changed.items():
+        result[path] = get_merkle_root(
+            make_manifest_entry(relative_path, st, hashes[file_path]) for relative_path, file_path, st in files
+        )
+
+        # NB: just modified files could be modified again without stat change, see HashCache
+        if USE_HASH_CACHE and all(st.st_mtime_ns < racy_threshold for _, _, st in files):
+            data = json.dumps({'stats': stats_digests[path], 'root': result[path]})
+            write_cache(FINGERPRINTS_NAMESPACE, path, data.encode('utf-8'))
+
+    return result
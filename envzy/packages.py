@@ -1,7 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import FrozenSet, Tuple
+from typing import FrozenSet, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Target:
+    python: Tuple[int, ...]
+    platforms: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class DistributionFile:
+    filename: str
+    url: str
+    hashes: Tuple[Tuple[str, str], ...]
+    size: Optional[int]
+    # PEP 658 core metadata availability, None means "unknown"
+    has_metadata: Optional[bool] = None
 
 
 @dataclass(frozen=True)
@@ -27,6 +43,12 @@ class PypiDistribution(BasePackage):
     version: str
     pypi_index_url: str
     have_server_supported_tags: bool
+    # best matching wheel for target platform, it is resolved only on demand
+    wheel: Optional[DistributionFile] = None
+    # there is no compatible wheel, so package will be built from source at the remote
+    sdist_only: bool = False
+    # nearest version with compatible wheel for sdist-only or unsupported distributions
+    nearest_wheel_version: Optional[str] = None
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import os
+from array import array
+from bisect import bisect_left
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar('T')
+
+SEPARATOR = '\0'  # the only character which can't be a part of a filename besides os.sep
+
+# offsets and other integer tables are either arrays or memoryviews of mmap-ed index
+IntTable = Union['array[int]', memoryview]
+
+
+def pack_strings(strings: List[Any]) -> Tuple[Any, 'array[int]']:
+    """
+    Return blob of separated strings (str or bytes) and offsets of each string start
+    with an extra offset at the end.
+    """
+
+    separator: Any = SEPARATOR.encode() if strings and isinstance(strings[0], bytes) else SEPARATOR
+
+    offsets = array('I', [0])
+    length = 0
+    for string in strings:
+        length += len(string) + 1
+        offsets.append(length)
+
+    return separator.join(strings) + separator if strings else separator[:0], offsets
+
+
+class StringTable:
+    """
+    Sorted strings packed into one blob with an offsets array,
+    which is much more compact than a list of str objects.
+
+    Blob could be a str or a bytes-like object (for example, mmap),
+    in second case strings are bytes too.
+    """
+
+    def __init__(self, blob: Any, offsets: IntTable, base: int = 0):
+        self._blob = blob
+        self._offsets = offsets
+        # offset of the table within the blob
+        self._base = base
+
+    @classmethod
+    def from_strings(cls, strings: List[Any]) -> StringTable:
+        return cls(*pack_strings(strings))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position: int) -> Any:
+        return self._blob[self._base + self._offsets[position]:self._base + self._offsets[position + 1] - 1]
+
+    def find(self, string: Any, low: int = 0, high: int = -1) -> int:
+        """
+        Return position of string within [low, high) range or -1.
+        """
+
+        if high < 0:
+            high = len(self)
+        end = high
+
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle] < string:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < end and self[low] == string:
+            return low
+
+        return -1
+
+
+class PathTables(NamedTuple):
+    # directories tree: name of each directory and id of its parent, directories are
+    # numbered breadth-first and sorted by (parent, name), so children of each directory
+    # are a sorted range [directory_children[id], directory_children[id + 1]); 0 is the root
+    directories: List[Any]
+    directory_parents: 'array[int]'
+    directory_children: 'array[int]'
+    # entries of each directory are a range [directory_starts[id], directory_starts[id + 1])
+    directory_starts: 'array[int]'
+    # sorted unique basenames, entries are referencing them by id and are sorted by it
+    names: List[Any]
+    entry_names: 'array[int]'
+    entry_values: 'array[int]'
+
+
+def split_directory(directory: Any, separator: Any) -> List[Any]:
+    """
+    '/usr/lib' -> ['', 'usr', 'lib'], so paths are reversible by separator.join.
+    """
+
+    return directory.split(separator) if directory else []
+
+
+class PathIndex(Mapping[str, T], Generic[T]):
+    """
+    Read-only mapping of absolute paths to values, which takes an order
+    of magnitude less memory than a dict with full path keys.
+
+    Directories are stored as a tree of (parent, name) pairs, so each path component
+    is stored only once, and basenames are interned into one sorted table, so entries
+    are just pairs of basename id and value id. Lookup is a bisect over children for each
+    component of directory, then a bisect over basenames and a bisect over entries of directory.
+    Values are expected to be heavily repeated (like distributions of files),
+    so they are stored once and referenced by index.
+    """
+
+    def __init__(
+        self,
+        directories: StringTable,
+        directory_parents: IntTable,
+        directory_children: IntTable,
+        directory_starts: IntTable,
+        names: StringTable,
+        entry_names: IntTable,
+        entry_values: IntTable,
+        values: Sequence[T],
+        *,
+        binary: bool = False,
+    ):
+        self._directories = directories
+        self._directory_parents = directory_parents
+        self._directory_children = directory_children
+        self._directory_starts = directory_starts
+        self._names = names
+        self._entry_names = entry_names
+        self._entry_values = entry_values
+        self._values = values
+        # tables of binary (mmap-ed) index are containing fs-encoded bytes
+        self._binary = binary
+        self._separator: Any = os.sep.encode() if binary else os.sep
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[str, T]]) -> PathIndex[T]:
+        value_ids: Dict[int, int] = {}
+        values: List[T] = []
+        # last value wins, as in dict
+        entries: Dict[Tuple[str, str], int] = {}
+
+        for path, value in items:
+            value_id = value_ids.get(id(value))
+            if value_id is None:
+                value_id = value_ids[id(value)] = len(values)
+                values.append(value)
+
+            entries[os.path.split(path)] = value_id
+
+        tables = cls.build_tables(entries.items())
+
+        return cls(
+            StringTable.from_strings(tables.directories),
+            tables.directory_parents,
+            tables.directory_children,
+            tables.directory_starts,
+            StringTable.from_strings(tables.names),
+            tables.entry_names,
+            array('H' if len(values) <= 0xFFFF else 'I', tables.entry_values),
+            values,
+        )
+
+    @staticmethod
+    def build_tables(entries: Iterable[Tuple[Tuple[Any, Any], int]]) -> PathTables:
+        """
+        Build tables of (directory, basename) -> value id entries; paths could be str or bytes.
+        """
+
+        entries = list(entries)
+        separator: Any = os.sep.encode() if entries and isinstance(entries[0][0][1], bytes) else os.sep
+
+        # directory -> its components, all prefixes of components are directories of the tree
+        components = {directory: tuple(split_directory(directory, separator)) for (directory, _), _ in entries}
+        levels: List[Set[Tuple[Any, ...]]] = []
+        for directory_components in components.values():
+            for depth in range(1, len(directory_components) + 1):
+                if len(levels) < depth:
+                    levels.append(set())
+                levels[depth - 1].add(directory_components[:depth])
+
+        directory_ids: Dict[Tuple[Any, ...], int] = {(): 0}
+        directories: List[Any] = [separator[:0]]
+        directory_parents = array('I', [0])
+        children_numbers = [0]
+        for level in levels:
+            for prefix in sorted(level, key=lambda prefix: (directory_ids[prefix[:-1]], prefix[-1])):
+                parent = directory_ids[prefix[:-1]]
+                directory_ids[prefix] = len(directories)
+                directories.append(prefix[-1])
+                directory_parents.append(parent)
+                children_numbers[parent] += 1
+                children_numbers.append(0)
+
+        # children of the root are starting right after it
+        directory_children = array('I', [1])
+        for number in children_numbers:
+            directory_children.append(directory_children[-1] + number)
+
+        names = sorted({name for (_, name), _ in entries})
+        name_ids = {name: i for i, name in enumerate(names)}
+
+        directory_starts = array('I', [0] * (len(directories) + 1))
+        entry_names = array('I')
+        entry_values = array('I')
+        for directory_id, name_id, value_id in sorted(
+            (directory_ids[components[directory]], name_ids[name], value_id)
+            for (directory, name), value_id in entries
+        ):
+            directory_starts[directory_id + 1] += 1
+            entry_names.append(name_id)
+            entry_values.append(value_id)
+
+        for directory_id in range(len(directories)):
+            directory_starts[directory_id + 1] += directory_starts[directory_id]
+
+        return PathTables(
+            directories=directories,
+            directory_parents=directory_parents,
+            directory_children=directory_children,
+            directory_starts=directory_starts,
+            names=names,
+            entry_names=entry_names,
+            entry_values=entry_values,
+        )
+
+    def _find_directory(self, directory: Any) -> int:
+        directory_id = 0
+        for component in split_directory(directory, self._separator):
+            directory_id = self._directories.find(
+                component,
+                self._directory_children[directory_id],
+                self._directory_children[directory_id + 1],
+            )
+            if directory_id < 0:
+                return -1
+
+        return directory_id
+
+    def _find(self, path: str) -> int:
+        directory, name = os.path.split(os.fsencode(path) if self._binary else path)
+
+        directory_id = self._find_directory(directory)
+        if directory_id < 0:
+            return -1
+
+        name_id = self._names.find(name)
+        if name_id < 0:
+            return -1
+
+        start = self._directory_starts[directory_id]
+        end = self._directory_starts[directory_id + 1]
+        position = bisect_left(self._entry_names, name_id, start, end)
+        if position < end and self._entry_names[position] == name_id:
+            return position
+
+        return -1
+
+    def __getitem__(self, path: str) -> T:
+        position = self._find(path) if isinstance(path, str) else -1
+        if position < 0:
+            raise KeyError(path)
+
+        return self._values[self._entry_values[position]]
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str) and self._find(path) >= 0
+
+    def __len__(self) -> int:
+        return len(self._entry_names)
+
+    def __iter__(self) -> Iterator[str]:
+        for path, _ in self.iter_items():
+            yield path
+
+    def iter_items(self) -> Iterator[Tuple[str, T]]:
+        """
+        Same as items(), but without a lookup for each key.
+        """
+
+        # parents are always numbered before their children
+        directories: List[Any] = []
+        for directory_id in range(len(self._directories)):
+            parent = self._directory_parents[directory_id]
+            name = self._directories[directory_id]
+            directories.append(name if parent == 0 else directories[parent] + self._separator + name)
+
+            for position in range(self._directory_starts[directory_id], self._directory_starts[directory_id + 1]):
+                path = os.path.join(directories[directory_id], self._names[self._entry_names[position]])
+                value = self._values[self._entry_values[position]]
+                yield (os.fsdecode(path) if self._binary else path), value
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from pypi_simple import ProjectPage
+
+PIP_CACHE_SERIALIZATION_PREFIX = b'cc=4,'
+
+
+@lru_cache(maxsize=None)
+def get_pip_cache_dir() -> Path:
+    """
+    Same logic as pip have (through platformdirs.user_cache_dir('pip')).
+    """
+
+    path = os.environ.get('PIP_CACHE_DIR')
+    if path:
+        return Path(path).expanduser()
+
+    if sys.platform == 'win32':
+        local_app_data = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        return Path(local_app_data) / 'pip' / 'Cache'
+
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'pip'
+
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(xdg_cache_home) / 'pip'
+
+
+def get_pip_cache_key(url: str) -> str:
+    """
+    Normalize url in a same way as cachecontrol (used by pip) does.
+    """
+
+    parts = urlsplit(url)
+    request_uri = parts.path or '/'
+    if parts.query:
+        request_uri = f'{request_uri}?{parts.query}'
+
+    return f'{parts.scheme.lower()}://{parts.netloc.lower()}{request_uri}'
+
+
+def get_pip_cache_paths(url: str) -> Tuple[Path, Path]:
+    """
+    Return paths of cache entry for modern (pip>=23.3, http-v2, body stored separately)
+    and legacy (http, body is stored inside of serialized response) layouts.
+    """
+
+    hashed = hashlib.sha224(get_pip_cache_key(url).encode()).hexdigest()
+    parts = list(hashed[:5]) + [hashed]
+    cache_dir = get_pip_cache_dir()
+
+    return (
+        cache_dir.joinpath('http-v2', *parts),
+        cache_dir.joinpath('http', *parts),
+    )
+
+
+def _read_fresh(path: Path, ttl: float) -> Optional[bytes]:
+    try:
+        if time.time() - path.stat().st_mtime > ttl:
+            return None
+
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def _extract_legacy_body(data: bytes) -> Optional[bytes]:
+    if not data.startswith(PIP_CACHE_SERIALIZATION_PREFIX):
+        return None
+
+    try:
+        # NB: legacy entries are msgpack-serialized; msgpack is vendored by pip,
+        # so it is present at almost any environment, but we are not requiring it
+        from pip._vendor import msgpack  # type: ignore
+    except ImportError:
+        return None
+
+    try:
+        cached = msgpack.loads(data[len(PIP_CACHE_SERIALIZATION_PREFIX):], raw=False)
+        body = cached['response']['body']
+    except Exception:
+        return None
+
+    return body if isinstance(body, bytes) else None
+
+
+def _decompress(body: bytes) -> bytes:
+    # cachecontrol stores response body as it was transferred,
+    # so it could be compressed
+    if body[:2] == b'\x1f\x8b':
+        return gzip.decompress(body)
+
+    try:
+        return zlib.decompress(body)
+    except zlib.error:
+        return body
+
+
+def read_pip_cached_response(url: str, *, ttl: float) -> Optional[bytes]:
+    """
+    Return body of response cached by pip for url if it is not older than ttl seconds.
+    This function never writes anything into pip cache.
+    """
+
+    modern_path, legacy_path = get_pip_cache_paths(url)
+
+    body = _read_fresh(modern_path.with_name(modern_path.name + '.body'), ttl)
+    if body is None:
+        data = _read_fresh(legacy_path, ttl)
+        body = _extract_legacy_body(data) if data else None
+
+    if not body:
+        return None
+
+    try:
+        return _decompress(body)
+    except (OSError, EOFError):
+        return None
+
+
+def get_pip_cached_project_page(url: str, name: str, *, ttl: float) -> Optional[ProjectPage]:
+    from pypi_simple import ProjectPage
+
+    body = read_pip_cached_response(url, ttl=ttl)
+    if body is None:
+        return None
+
+    try:
+        if body.lstrip()[:1] == b'{':
+            return ProjectPage.from_json_data(json.loads(body), base_url=url)
+
+        return ProjectPage.from_html(name, body, base_url=url)
+    except Exception:
+        # cache is a best-effort thing, in case of any problems we will go to the network
+        return None
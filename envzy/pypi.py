@@ -1,63 +1,110 @@
 from __future__ import annotations
 
+import itertools
+import struct
+from array import array
 from functools import lru_cache
-from typing import Optional, Set, Tuple, FrozenSet
-
-from packaging.tags import (
-    compatible_tags,
-    cpython_tags,
-    PythonVersion,
-    Tag,
-)
-from packaging.utils import parse_wheel_filename
-
-import requests
-import requests.exceptions
-
-from pypi_simple import (
-    PyPISimple,
-    ProjectPage,
-    PYPI_SIMPLE_ENDPOINT,
-    ACCEPT_JSON_PREFERRED,
-    NoSuchProjectError
-)
+from dataclasses import dataclass
+from logging import getLogger
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Set, Tuple, FrozenSet, Iterable, cast
+from urllib.parse import urlsplit, urlunsplit
 
+from .cache import map_cache, read_cache, write_cache
 from .exceptions import BadPypiIndex
-from .version import __user_agent__
+from .local_index import get_local_index_path, get_local_project_page, read_local_wheel_metadata
+from .pip_cache import get_pip_cached_project_page
+from .packages import DistributionFile
+from .path_index import StringTable, pack_strings
+
+# NB: requests, pypi_simple and packaging are imported at functions which are using them,
+# so import of envzy itself doesn't cost hundreds of milliseconds
+if TYPE_CHECKING:
+    import requests
+    from packaging.specifiers import SpecifierSet
+    from packaging.tags import PythonVersion, Tag
+    from pypi_simple import PyPISimple, ProjectPage
+
+logger = getLogger(__name__)
 
 PIP_VERSION_REQ = "10.0.0"
-PYPI_INDEX_URL_DEFAULT = PYPI_SIMPLE_ENDPOINT
+# same as pypi_simple.PYPI_SIMPLE_ENDPOINT
+PYPI_INDEX_URL_DEFAULT = 'https://pypi.org/simple/'
+
+
+def get_linux_platforms(arch: str, glibc_minor: int = 31) -> Tuple[str, ...]:
+    # manylinux1 and manylinux2010 were defined only for x86 architectures
+    legacy = ('manylinux1', 'manylinux2010') if arch in ('x86_64', 'i686') else ()
+
+    return (
+        f'linux_{arch}',
+        *(f'{tag}_{arch}' for tag in legacy),
+        f'manylinux2014_{arch}',
+    ) + tuple(
+        f'manylinux_2_{i}_{arch}'
+        for i in range(5, glibc_minor + 1)
+    )
+
 
 # TODO: obtain this information from server
-TARGET_PLATFORMS: Tuple[str, ...] = (
-    'linux_x86_64',
-    'manylinux1_x86_64',
-    'manylinux2010_x86_64',
-    'manylinux2014_x86_64',
-) + tuple(
-    f'manylinux_2_{i}_x86_64'
-    for i in range(5, 32)  # 5..31; at the server ubuntu 20.04 which have glibc 2.31
-)
+# at the server ubuntu 20.04 which have glibc 2.31
+TARGET_PLATFORMS: Tuple[str, ...] = get_linux_platforms('x86_64')
+TARGET_PLATFORMS_AARCH64: Tuple[str, ...] = get_linux_platforms('aarch64')
 
 VALIDATE_PYPI_INDEX_URL = True
 
+# If enabled, root listing of index (/simple/) is downloaded once and
+# projects which are absent in it are considered as absent at index
+# without any additional requests.
+# NB: new projects could appear at index after listing was obtained,
+# so it is opt-in and persisted listing have a limited lifetime.
+USE_INDEX_ROOT_LISTING = False
+INDEX_ROOT_LISTING_TTL = 24 * 60 * 60  # PyPI itself caches its root listing for 24 hours
+INDEX_ROOT_LISTING_NAMESPACE = 'index-root-listing-v2'
+# names count, followed by offsets and blob of names, see pack_project_names
+INDEX_ROOT_LISTING_HEADER = struct.Struct('<I')
+
+# If enabled, version lookups are made through PyPI JSON API
+# (<root>/pypi/<name>/<version>/json) for indexes which are supporting it,
+# so we are downloading only info about one release instead of whole project page.
+USE_PYPI_JSON_API = False
+
+# If enabled, project pages are read from local pip HTTP cache (read-only)
+# before going to the network; entries older than PIP_CACHE_TTL seconds are
+# considered as stale.
+USE_PIP_CACHE = False
+PIP_CACHE_TTL = 24 * 60 * 60
+
 
 @lru_cache(maxsize=None)
-def get_pypi_client(url: str) -> PyPISimple:
+def get_session() -> requests.Session:
+    import requests
+
+    from .version import __user_agent__
+
     # NB: i think we don't need to close this session, it will
     # closed with exit
     session = requests.session()
     session.headers["User-Agent"] = __user_agent__
 
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_pypi_client(url: str) -> PyPISimple:
+    from pypi_simple import ACCEPT_JSON_PREFERRED, PyPISimple
+
     return PyPISimple(
         endpoint=url,
-        session=session,
+        session=get_session(),
         accept=ACCEPT_JSON_PREFERRED
     )
 
 
 @lru_cache(maxsize=None)
 def get_compatible_tags(target_python: PythonVersion, target_platforms: Tuple[str, ...]) -> FrozenSet[Tag]:
+    from packaging.tags import compatible_tags, cpython_tags
+
     result: Set[Tag] = set()
 
     result.update(
@@ -71,56 +118,309 @@ def get_compatible_tags(target_python: PythonVersion, target_platforms: Tuple[st
     return frozenset(result)
 
 
+@lru_cache(maxsize=None)
+def get_tags_priorities(target_python: PythonVersion, target_platforms: Tuple[str, ...]) -> Dict[Tag, int]:
+    """
+    Return compatible tags with their priorities (lesser is better) in a manner
+    of pip: more specific interpreter and newer platform tags are preferred.
+    """
+
+    from packaging.tags import compatible_tags, cpython_tags
+
+    # TARGET_PLATFORMS are sorted from oldest to newest ones
+    platforms = tuple(reversed(target_platforms))
+    tags = itertools.chain(
+        cpython_tags(python_version=target_python, platforms=platforms),
+        compatible_tags(python_version=target_python, platforms=platforms),
+    )
+
+    result: Dict[Tag, int] = {}
+    for i, tag in enumerate(tags):
+        result.setdefault(tag, i)
+
+    return result
+
+
+def find_best_wheel(
+    files: Iterable[DistributionFile],
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> Optional[DistributionFile]:
+    from packaging.utils import InvalidWheelFilename, parse_wheel_filename
+
+    priorities = get_tags_priorities(target_python, target_platforms)
+
+    best: Optional[DistributionFile] = None
+    best_priority = len(priorities)
+
+    for file in files:
+        if not file.filename.endswith('.whl'):
+            continue
+
+        try:
+            *_, tags = parse_wheel_filename(file.filename)
+        except InvalidWheelFilename:
+            continue
+
+        priority = min((priorities[tag] for tag in tags if tag in priorities), default=len(priorities))
+        if priority < best_priority:
+            best = file
+            best_priority = priority
+
+    return best
+
+
+_interned_tags: Dict[FrozenSet[Tag], FrozenSet[Tag]] = {}
+
+
+def intern_tags(tags: FrozenSet[Tag]) -> FrozenSet[Tag]:
+    """
+    Most of project releases have wheels with same tags,
+    so we are storing only one copy of each tags set.
+    """
+
+    return _interned_tags.setdefault(tags, tags)
+
+
+# (filename, url, sha256, size, has_metadata) of a release file, see DistributionFile;
+# tuples of strings are several times smaller than dataclass instances
+FileRecord = Tuple[str, str, Optional[str], Optional[int], Optional[bool]]
+
+
+def make_file_record(file: DistributionFile) -> FileRecord:
+    return file.filename, file.url, dict(file.hashes).get('sha256'), file.size, file.has_metadata
+
+
+def make_distribution_file(record: FileRecord) -> DistributionFile:
+    filename, url, sha256, size, has_metadata = record
+    return DistributionFile(
+        filename=filename,
+        url=url,
+        hashes=(('sha256', sha256),) if sha256 else (),
+        size=size,
+        has_metadata=has_metadata,
+    )
+
+
+# NB: fields are mappings, so it is compared and hashed by identity
+@dataclass(frozen=True, eq=False)
+class ProjectIndex:
+    """
+    Compact representation of a project page: we are keeping only versions,
+    tags of their wheels, versions which have sdist and records of release files
+    instead of thousands of DistributionPackage objects of huge projects.
+    """
+
+    versions: FrozenSet[str]
+    wheel_tags: Mapping[str, FrozenSet[Tag]]
+    sdist_versions: FrozenSet[str]
+    files: Mapping[str, Tuple[FileRecord, ...]]
+
+    @classmethod
+    def from_files(
+        cls,
+        files: Iterable[Tuple[str, DistributionFile]],
+        versions: Optional[Iterable[str]] = None,
+    ) -> ProjectIndex:
+        """
+        Files are pairs of (version, file).
+        """
+
+        from packaging.utils import InvalidWheelFilename, parse_wheel_filename
+
+        all_versions: Set[str] = set()
+        wheel_tags: Dict[str, Set[Tag]] = {}
+        sdist_versions: Set[str] = set()
+        records: Dict[str, List[FileRecord]] = {}
+
+        for version, file in files:
+            all_versions.add(version)
+            records.setdefault(version, []).append(make_file_record(file))
+            filename = file.filename
+
+            if filename.endswith('.whl'):
+                try:
+                    *_, tags = parse_wheel_filename(filename)
+                except InvalidWheelFilename:
+                    continue
+
+                wheel_tags.setdefault(version, set()).update(tags)
+
+            elif filename.endswith('.zip') or filename.endswith('.gz'):
+                # probably it is sdist, here may be problems
+                sdist_versions.add(version)
+
+            # else it is .exe, for example
+
+        return cls(
+            versions=frozenset(versions) if versions else frozenset(all_versions),
+            wheel_tags=MappingProxyType({
+                version: intern_tags(frozenset(tags))
+                for version, tags in wheel_tags.items()
+            }),
+            sdist_versions=frozenset(sdist_versions),
+            files=MappingProxyType({version: tuple(version_records) for version, version_records in records.items()}),
+        )
+
+    @classmethod
+    def from_page(cls, package: ProjectPage) -> ProjectIndex:
+        return cls.from_files(
+            (
+                (
+                    p.version,
+                    DistributionFile(
+                        filename=p.filename,
+                        url=p.url,
+                        hashes=tuple(sorted(p.digests.items())),
+                        size=getattr(p, 'size', None),  # pypi-simple<1.3 doesn't support PEP 700
+                        has_metadata=p.has_metadata,
+                    ),
+                )
+                for p in package.packages
+                if p.version
+            ),
+            versions=package.versions,
+        )
+
+    def get_files(self, version: str) -> Optional[Tuple[DistributionFile, ...]]:
+        """
+        Return files of release or None if there is no such release.
+        """
+
+        if version not in self.versions:
+            return None
+
+        return tuple(make_distribution_file(record) for record in self.files.get(version, ()))
+
+
 def check_version_exists(
-    package: ProjectPage,
+    package: ProjectIndex,
     version: str,
 ) -> bool:
-    versions: Set[str]
-    if package.versions:
-        versions = set(package.versions)
-    else:
-        versions = {p.version for p in package.packages if p.version}
-
-    return version in versions
+    return version in package.versions
 
 
 def check_version_exists_on_target_platform(
-    package: ProjectPage,
+    package: ProjectIndex,
     version: str,
     target_python: PythonVersion,
     target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
 ) -> bool:
-    for p in package.packages:
-        if p.version != version:
+    if version in package.sdist_versions:
+        return True
+
+    return check_version_has_compatible_wheel(package, version, target_python, target_platforms)
+
+
+def check_version_has_compatible_wheel(
+    package: ProjectIndex,
+    version: str,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> bool:
+    tags = package.wheel_tags.get(version, frozenset())
+    return not tags.isdisjoint(get_compatible_tags(target_python, target_platforms))
+
+
+def find_version_with_compatible_wheel(
+    package: ProjectIndex,
+    specifier: SpecifierSet,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> Optional[str]:
+    """
+    Return the newest version which satisfies specifier and have a compatible wheel.
+    """
+
+    from packaging.version import InvalidVersion, Version
+
+    versions = []
+    for version in specifier.filter(package.versions):
+        try:
+            versions.append((Version(version), version))
+        except InvalidVersion:
             continue
 
-        if p.filename.endswith('.whl'):
-            *_, tags = parse_wheel_filename(p.filename)
+    for _, version in sorted(versions, reverse=True):
+        if check_version_has_compatible_wheel(package, version, target_python, target_platforms):
+            return version
 
-            if tags & get_compatible_tags(target_python, target_platforms):
-                return True
+    return None
 
-        elif p.filename.endswith('.zip') or p.filename.endswith('.gz'):
-            # probably it is sdist, here may be problems
-            return True
-        else:
-            # .exe, for example
+
+def find_nearest_version_with_compatible_wheel(
+    package: ProjectIndex,
+    version: str,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> Optional[str]:
+    """
+    Return version with compatible wheel which is nearest to the given one
+    in terms of project releases order; newer versions are preferred in case of a tie.
+    Only versions of the same major release are considered, as others are unlikely
+    to be a drop-in replacement; pre-releases are considered only if given version
+    is a pre-release itself.
+    """
+
+    from packaging.version import InvalidVersion, Version
+
+    try:
+        current = Version(version)
+    except InvalidVersion:
+        return None
+
+    parsed: Dict[Version, str] = {}
+    for other in package.versions:
+        try:
+            other_version = Version(other)
+        except InvalidVersion:
+            continue
+
+        if other_version.major != current.major:
             continue
 
-    return False
+        if other_version.is_prerelease and not current.is_prerelease:
+            continue
+
+        parsed[other_version] = other
+
+    ordered = sorted(set(parsed) | {current})
+    current_position = ordered.index(current)
+
+    candidates = [
+        (abs(position - current_position), other_version < current, parsed[other_version])
+        for position, other_version in enumerate(ordered)
+        if other_version != current and
+        check_version_has_compatible_wheel(package, parsed[other_version], target_python, target_platforms)
+    ]
+
+    return min(candidates)[2] if candidates else None
 
 
 def validate_pypi_index_url(pypi_index_url: str) -> None:
     if not VALIDATE_PYPI_INDEX_URL:
         return
 
+    local_path = get_local_index_path(pypi_index_url)
+    if local_path is not None:
+        if local_path.is_dir():
+            return
+
+        raise BadPypiIndex(
+            f"pypi_index_url=={pypi_index_url} points to local index, "
+            f"but {local_path} is not a directory"
+        )
+
+    import requests
+    from pypi_simple import NoSuchProjectError
+
     exception: Optional[Exception] = None
     client = get_pypi_client(pypi_index_url)
 
     try:
         project_page = client.get_project_page('pip')
 
-        if check_version_exists(project_page, PIP_VERSION_REQ):
+        if check_version_exists(ProjectIndex.from_page(project_page), PIP_VERSION_REQ):
             return  # all good
 
     except requests.Timeout:
@@ -131,14 +431,116 @@ def validate_pypi_index_url(pypi_index_url: str) -> None:
     # raise from clause is ok with None value
     raise BadPypiIndex(
         f"failed to find pip=={PIP_VERSION_REQ} at pypi_index_url=={pypi_index_url}; "
-        f"check if it is correct simple pypi index url, for example - {PYPI_SIMPLE_ENDPOINT}"
+        f"check if it is correct simple pypi index url, for example - {PYPI_INDEX_URL_DEFAULT}"
     ) from exception
 
 
-@lru_cache(maxsize=16)  # cache will work well with consequetive requests
+def pack_project_names(names: List[bytes]) -> bytes:
+    """
+    Pack sorted names into count, offsets and blob of NUL-separated names, see StringTable.
+    """
+
+    blob, offsets = pack_strings(names)
+    return INDEX_ROOT_LISTING_HEADER.pack(len(names)) + offsets.tobytes() + blob
+
+
+def unpack_project_names(buffer: Any) -> Optional[StringTable]:
+    """
+    Return table of packed names right over buffer (without copying) or None if it is malformed.
+    """
+
+    try:
+        count, = INDEX_ROOT_LISTING_HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        return None
+
+    blob_start = INDEX_ROOT_LISTING_HEADER.size + array('I').itemsize * (count + 1)
+    if len(buffer) < blob_start:
+        return None
+
+    offsets = memoryview(buffer)[INDEX_ROOT_LISTING_HEADER.size:blob_start].cast('I')
+    if offsets[-1] != len(buffer) - blob_start:
+        return None
+
+    return StringTable(buffer, offsets, blob_start)
+
+
+@lru_cache(maxsize=None)
+def get_index_project_names(pypi_index_url: str) -> Optional[StringTable]:
+    """
+    Return sorted table of utf-8 encoded normalized project names from index root listing
+    or None if index failed to provide it.
+
+    Listing is persisted at envzy cache dir for INDEX_ROOT_LISTING_TTL seconds
+    and is memory-mapped from there, as PyPI listing is ~600k names.
+    """
+
+    import requests
+    from packaging.utils import canonicalize_name
+    from pypi_simple import UnsupportedRepoVersionError
+
+    cached = map_cache(INDEX_ROOT_LISTING_NAMESPACE, pypi_index_url, ttl=INDEX_ROOT_LISTING_TTL)
+    if cached is not None:
+        table = unpack_project_names(cached)
+        if table is not None:
+            return table
+
+    client = get_pypi_client(pypi_index_url)
+
+    try:
+        index_page = client.get_index_page()
+    # some private indexes doesn't support root listing at all,
+    # so in case of any error we just don't know anything about absent projects
+    except (ValueError, UnsupportedRepoVersionError, requests.exceptions.RequestException):
+        return None
+
+    names = sorted({canonicalize_name(project).encode('utf-8') for project in index_page.projects})
+    if not names:
+        return None
+
+    data = pack_project_names(names)
+    write_cache(INDEX_ROOT_LISTING_NAMESPACE, pypi_index_url, data)
+
+    return unpack_project_names(data)
+
+
+def check_project_may_exist(*, pypi_index_url: str, name: str) -> bool:
+    """
+    Return False only if project is definitely absent at index root listing.
+    """
+
+    from packaging.utils import canonicalize_name
+
+    names = get_index_project_names(pypi_index_url)
+    if names is None:
+        return True
+
+    return names.find(canonicalize_name(name).encode('utf-8')) >= 0
+
+
+# NB: only the last page is kept, it will work well with consequetive requests;
+# everything else (including release files) is taken from a compact get_project_index
+@lru_cache(maxsize=1)
 def get_project_page(*, pypi_index_url: str, name: str) -> Optional[ProjectPage]:
+    from pypi_simple import NoSuchProjectError
+
+    if get_local_index_path(pypi_index_url) is not None:
+        return get_local_project_page(pypi_index_url, name)
+
+    if USE_INDEX_ROOT_LISTING and not check_project_may_exist(pypi_index_url=pypi_index_url, name=name):
+        return None
+
     client = get_pypi_client(pypi_index_url)
 
+    if USE_PIP_CACHE:
+        project_page = get_pip_cached_project_page(
+            client.get_project_url(name),
+            name,
+            ttl=PIP_CACHE_TTL,
+        )
+        if project_page is not None:
+            return project_page
+
     try:
         return client.get_project_page(name)
     # we considering pypi_index_url as valid url so all other errors (net, for example) will raise
@@ -147,15 +549,115 @@ def get_project_page(*, pypi_index_url: str, name: str) -> Optional[ProjectPage]
 
 
 @lru_cache(maxsize=None)
-def check_package_version_exists(*, pypi_index_url: str, name: str, version: str) -> bool:
+def get_project_index(*, pypi_index_url: str, name: str) -> Optional[ProjectIndex]:
     project_page = get_project_page(
         pypi_index_url=pypi_index_url,
         name=name,
     )
     if not project_page:
+        return None
+
+    return ProjectIndex.from_page(project_page)
+
+
+def get_json_api_url(pypi_index_url: str) -> Optional[str]:
+    """
+    Guess JSON API root from simple index url in a Warehouse manner:
+    https://pypi.org/simple/ -> https://pypi.org/pypi
+    """
+
+    parts = urlsplit(pypi_index_url)
+    if parts.scheme not in ('http', 'https'):
+        return None
+
+    path = parts.path.rstrip('/')
+    if not path.endswith('/simple'):
+        return None
+
+    path = path[:-len('simple')] + 'pypi'
+    return urlunsplit(parts._replace(path=path, query='', fragment=''))
+
+
+def get_release_json(*, json_api_url: str, name: str, version: str) -> Optional[dict]:
+    from packaging.utils import canonicalize_name
+
+    url = f'{json_api_url}/{canonicalize_name(name)}/{version}/json'
+    response = get_session().get(url)
+
+    if response.status_code == 404:
+        return None
+
+    response.raise_for_status()
+    return response.json()
+
+
+@lru_cache(maxsize=None)
+def check_json_api_supported(pypi_index_url: str) -> bool:
+    import requests
+
+    json_api_url = get_json_api_url(pypi_index_url)
+    if not json_api_url:
         return False
 
-    return check_version_exists(project_page, version)
+    try:
+        data = get_release_json(json_api_url=json_api_url, name='pip', version=PIP_VERSION_REQ)
+    except (ValueError, requests.exceptions.RequestException):
+        return False
+
+    return bool(data and 'urls' in data)
+
+
+def _make_distribution_file(data: dict) -> DistributionFile:
+    return DistributionFile(
+        filename=data['filename'],
+        url=data['url'],
+        hashes=tuple(sorted(data.get('digests', {}).items())),
+        size=data.get('size'),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_release_files(*, pypi_index_url: str, name: str, version: str) -> Optional[Tuple[DistributionFile, ...]]:
+    """
+    Return files of exact release or None if there is no such release at index.
+
+    It asks index only about needed version in case of USE_PYPI_JSON_API
+    and index is supporting it; otherwise it falls back to the project page.
+    """
+
+    if USE_PYPI_JSON_API and check_json_api_supported(pypi_index_url):
+        data = get_release_json(
+            json_api_url=cast(str, get_json_api_url(pypi_index_url)),
+            name=name,
+            version=version,
+        )
+        if data is None:
+            return None
+
+        return tuple(_make_distribution_file(file_data) for file_data in data['urls'])
+
+    # NB: project page itself is not cached, but its index keeps records of all files
+    project_index = get_project_index(pypi_index_url=pypi_index_url, name=name)
+    if not project_index:
+        return None
+
+    return project_index.get_files(version)
+
+
+@lru_cache(maxsize=None)
+def check_package_version_exists(*, pypi_index_url: str, name: str, version: str) -> bool:
+    if USE_PYPI_JSON_API and check_json_api_supported(pypi_index_url):
+        return get_release_files(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+        ) is not None
+
+    project_index = get_project_index(pypi_index_url=pypi_index_url, name=name)
+    if not project_index:
+        return False
+
+    return check_version_exists(project_index, version)
 
 
 @lru_cache(maxsize=None)
@@ -167,16 +669,140 @@ def check_package_version_exists_on_target_platform(
     target_python: PythonVersion,
     target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
 ) -> bool:
-    project_page = get_project_page(
-        pypi_index_url=pypi_index_url,
-        name=name,
-    )
-    if not project_page:
+    if USE_PYPI_JSON_API and check_json_api_supported(pypi_index_url):
+        files = get_release_files(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+        )
+
+        if not files:
+            return False
+
+        return check_version_exists_on_target_platform(
+            ProjectIndex.from_files((version, f) for f in files),
+            version,
+            target_python=target_python,
+            target_platforms=target_platforms,
+        )
+
+    project_index = get_project_index(pypi_index_url=pypi_index_url, name=name)
+    if not project_index:
         return False
 
     return check_version_exists_on_target_platform(
-        project_page,
+        project_index,
         version,
         target_python=target_python,
         target_platforms=target_platforms,
     )
+
+
+@lru_cache(maxsize=None)
+def get_best_wheel(
+    *,
+    pypi_index_url: str,
+    name: str,
+    version: str,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> Optional[DistributionFile]:
+    """
+    Return wheel which pip would choose for target platform; in case of project pages
+    it doesn't require additional requests, files are taken from cached project index.
+    """
+
+    files = get_release_files(
+        pypi_index_url=pypi_index_url,
+        name=name,
+        version=version,
+    )
+
+    return find_best_wheel(files or (), target_python, target_platforms)
+
+
+def get_wheel_metadata(wheel: DistributionFile) -> Optional[str]:
+    """
+    Return core metadata of a wheel through PEP 658 .metadata file
+    (a few KB instead of whole wheel) or None if index doesn't provide it.
+
+    Wheels with known sha256 are immutable, so their metadata is persistently cached by it;
+    wheels of local indexes could be rebuilt under the same name, so they are read directly.
+    """
+
+    import requests
+
+    if not wheel.filename.endswith('.whl') or wheel.has_metadata is False:
+        return None
+
+    if get_local_index_path(wheel.url) is not None:
+        return read_local_wheel_metadata(wheel.url)
+
+    sha256 = dict(wheel.hashes).get('sha256')
+    if sha256 is not None:
+        cached = read_cache('wheel-metadata', sha256)
+        if cached is not None:
+            return cached.decode('utf-8')
+
+    # NB: metadata is optional, so any index failure means that it is just not available
+    try:
+        response = get_session().get(f'{wheel.url}.metadata')
+    except requests.RequestException as e:
+        logger.warning("Failed to fetch metadata of %s: %s", wheel.url, e)
+        return None
+
+    if response.status_code == 404:
+        return None
+
+    if not response.ok:
+        logger.warning("Failed to fetch metadata of %s: %s %s", wheel.url, response.status_code, response.reason)
+        return None
+
+    metadata = response.content.decode('utf-8')
+    if sha256 is not None:
+        write_cache('wheel-metadata', sha256, metadata.encode('utf-8'))
+
+    return metadata
+
+
+@lru_cache(maxsize=None)
+def check_package_version_has_compatible_wheel(
+    *,
+    pypi_index_url: str,
+    name: str,
+    version: str,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> bool:
+    project_index: Optional[ProjectIndex]
+
+    if USE_PYPI_JSON_API and check_json_api_supported(pypi_index_url):
+        files = get_release_files(
+            pypi_index_url=pypi_index_url,
+            name=name,
+            version=version,
+        )
+        project_index = ProjectIndex.from_files((version, f) for f in files or ())
+    else:
+        project_index = get_project_index(pypi_index_url=pypi_index_url, name=name)
+
+    if not project_index:
+        return False
+
+    return check_version_has_compatible_wheel(project_index, version, target_python, target_platforms)
+
+
+@lru_cache(maxsize=None)
+def find_package_nearest_version_with_compatible_wheel(
+    *,
+    pypi_index_url: str,
+    name: str,
+    version: str,
+    target_python: PythonVersion,
+    target_platforms: Tuple[str, ...] = TARGET_PLATFORMS,
+) -> Optional[str]:
+    project_index = get_project_index(pypi_index_url=pypi_index_url, name=name)
+    if not project_index:
+        return None
+
+    return find_nearest_version_with_compatible_wheel(project_index, version, target_python, target_platforms)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import stat
+from typing import Dict, Set, Union
+
+PathLike = Union[str, 'os.PathLike[str]']
+
+
+class RealpathResolver:
+    """
+    Same thing as os.path.realpath (and non-strict Path.resolve), but resolved
+    directories are memoized, so resolving of thousands of files within the
+    same directories costs about one lstat per file instead of one lstat per
+    path component.
+
+    Cache is never invalidated, it is fine for one exploration run, but
+    resolver should be cleared if filesystem layout is changed.
+    """
+
+    def __init__(self) -> None:
+        self._directories: Dict[str, str] = {}
+        self.lstat_calls = 0
+        self.saved_syscalls = 0
+
+    def clear(self) -> None:
+        self._directories.clear()
+        self.lstat_calls = 0
+        self.saved_syscalls = 0
+
+    def realpath(self, path: PathLike) -> str:
+        path = os.fspath(path)
+        if not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        return self._resolve(path, set(), is_directory=False)
+
+    def _resolve(self, path: str, seen_links: Set[str], *, is_directory: bool) -> str:
+        cached = self._directories.get(path)
+        if cached is not None:
+            # os.path.realpath would lstat each component of the path
+            self.saved_syscalls += path.count(os.sep)
+            return cached
+
+        parent, name = os.path.split(path)
+
+        if not name:
+            if parent == path:
+                # root
+                return path
+
+            # path with a trailing separator
+            return self._resolve(parent, seen_links, is_directory=is_directory)
+
+        resolved_parent = self._resolve(parent, seen_links, is_directory=True)
+
+        if name == os.curdir:
+            result = resolved_parent
+        elif name == os.pardir:
+            result = os.path.dirname(resolved_parent)
+        else:
+            result = self._resolve_link(os.path.join(resolved_parent, name), seen_links)
+
+        if is_directory:
+            self._directories[path] = result
+
+        return result
+
+    def _resolve_link(self, path: str, seen_links: Set[str]) -> str:
+        self.lstat_calls += 1
+        try:
+            is_link = stat.S_ISLNK(os.lstat(path).st_mode)
+        except OSError:
+            # same as non-strict realpath: non-existent part is kept as is
+            return path
+
+        if not is_link:
+            return path
+
+        if path in seen_links:
+            # symlinks loop, realpath returns path as is in that case
+            return path
+
+        try:
+            target = os.readlink(path)
+        except OSError:
+            return path
+
+        # NB: absolute target replaces link directory here; ".." parts of target
+        # are resolved physically by _resolve, as os.path.realpath does
+        target_path = os.path.join(os.path.dirname(path), target)
+        return self._resolve(target_path, seen_links | {path}, is_directory=False)
+
+
+resolver = RealpathResolver()
+
+
+def realpath(path: PathLike) -> str:
+    return resolver.realpath(path)
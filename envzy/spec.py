@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional
 from typing_extensions import TypeAlias
 
+from .manifest import Manifest
 from .packages import BasePackage
 
 ModulePathsList: TypeAlias = List[str]
@@ -11,9 +12,32 @@ PackagesDict: TypeAlias = Dict[str, str]
 PackagesList: TypeAlias = List[BasePackage]
 
 
+@dataclass
+class EnvironmentCost:
+    # wheel download size per pypi package, None if it is unknown
+    # (index doesn't provide sizes or there is no wheel for target platform)
+    download_bytes: Dict[str, Optional[int]]
+    local_bytes: Dict[str, int]
+
+    @property
+    def total_download_bytes(self) -> int:
+        return sum(size for size in self.download_bytes.values() if size)
+
+    @property
+    def total_local_bytes(self) -> int:
+        return sum(self.local_bytes.values())
+
+    @property
+    def unknown_download_packages(self) -> List[str]:
+        return sorted(name for name, size in self.download_bytes.items() if size is None)
+
+
 @dataclass
 class EnvironmentSpec:
     packages: PackagesList
     local_module_paths: ModulePathsList
     pypi_packages: PackagesDict
     console_scripts: ModulePathsList
+    cost: Optional[EnvironmentCost] = None
+    # file-level content-addressed manifest of local packages
+    manifest: Optional[Manifest] = None
@@ -1,20 +1,33 @@
 from __future__ import annotations
 
+import json
 import os
 import sys
 import traceback
 import types
 from contextlib import contextmanager
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
+from importlib.machinery import EXTENSION_SUFFIXES
 from inspect import isclass, getmro
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import List, Any, Tuple, Dict, FrozenSet, Optional, Iterator
+from typing import TYPE_CHECKING, List, Any, Tuple, Dict, FrozenSet, Optional, Iterator, Iterable, Mapping
 
-import importlib_metadata
-from importlib_metadata import Distribution as BaseDistribution
-from packaging.requirements import Requirement, InvalidRequirement
+from .conda_meta import merge_conda_packages, read_conda_packages
+from .dist_info import RawDistribution, read_raw_distributions
+from .path_index import PathIndex
+from .realpath import realpath
+
+if TYPE_CHECKING:
+    from importlib_metadata import Distribution as BaseDistribution
+
+# If enabled, files lists of conda packages are read from <sys.prefix>/conda-meta
+# and merged with dist-info ones: conda knows exact files of its packages,
+# even if they have no RECORD or have an .egg-info file instead of a dir.
+USE_CONDA_META = False
 
 
 @contextmanager
@@ -41,12 +54,19 @@ def canonize_name(name: str) -> str:
 
 
 class Distribution:
-    def __init__(self, base: BaseDistribution):
+    def __init__(self, base: BaseDistribution, raw: Optional[RawDistribution] = None):
         self.base = base
+        # precomputed by fast dist-info reader; base distribution metadata
+        # reading is quite slow because of full email message parsing
+        self.raw = raw
 
     @property
     def name(self) -> str:
-        return canonize_name(self.base.name)
+        return canonize_name(self.raw.name if self.raw else self.base.name)
+
+    @property
+    def version(self) -> str:
+        return self.raw.version if self.raw else self.base.version
 
     def __getattr__(self, name: str):
         return getattr(self.base, name)
@@ -137,8 +157,19 @@ def get_builtin_module_names() -> FrozenSet[str]:
     return frozenset(sys.builtin_module_names)
 
 
+def get_raw_distributions() -> List[RawDistribution]:
+    distributions = read_raw_distributions()
+
+    if USE_CONDA_META:
+        distributions = merge_conda_packages(distributions, read_conda_packages())
+
+    return distributions
+
+
 @lru_cache(maxsize=None)
 def get_names_to_distributions() -> Dict[str, Distribution]:
+    import importlib_metadata
+
     result: Dict[str, Distribution] = {}
     # NB: importlib_metadata.Distribution calls may return different
     # results in depends from cwd.
@@ -146,23 +177,156 @@ def get_names_to_distributions() -> Dict[str, Distribution]:
     # In case of PermissionError, location of tmp dir can be moved with
     # TMPDIR env variable.
     with tmp_cwd():
-        for base_distribution in importlib_metadata.distributions():
-            distribution = Distribution(base_distribution)
+        for raw in get_raw_distributions():
+            distribution = Distribution(importlib_metadata.PathDistribution(Path(raw.path)), raw)
             result[distribution.name] = distribution
 
     return result
 
 
-@lru_cache(maxsize=None)  # cache size is about few MB
-def get_files_to_distributions() -> Dict[str, Distribution]:
-    result = {}
+@dataclass(frozen=True)
+class DistributionProfile:
+    """
+    Everything classifier needs to know about installed distribution files,
+    computed once for all distributions while building files index.
+    """
+
+    # top-level paths of distribution at site-packages
+    paths: FrozenSet[str]
+    console_scripts: FrozenSet[str]
+    # paths outside of site-packages and bin dir
+    bad_paths: FrozenSet[str]
+    is_editable: bool
+    # RECORD contains extension modules or other shared libraries,
+    # regardless of whether they were imported or not
+    has_extension_modules: bool
+
+
+# NB: target platform suffixes may differ from local ones, so we are adding generic ones
+BINARY_SUFFIXES = tuple(EXTENSION_SUFFIXES) + ('.so', '.pyd', '.dylib')
+
+
+def get_scripts_directory() -> Path:
+    return Path(realpath(sys.prefix)) / 'bin'
+
+
+def check_distribution_is_editable(distribution: Distribution) -> bool:
+    """Here we checking if package installed as editable installation.
+
+    Relevant links:
+    https://github.com/python/importlib_metadata/issues/404 discussion
+    https://packaging.python.org/en/latest/specifications/direct-url/
+    https://github.com/conda/conda/issues/11580
+    """
+    direct_url_str = distribution.read_text('direct_url.json')
+    if not direct_url_str:
+        # there is not direct_url.json
+        return False
+
+    direct_url_data = json.loads(direct_url_str)
+
+    url = direct_url_data.get('url')
+    if not url:
+        # just in case, because spec tells that url must be
+        # always present
+        return False
+
+    editable = direct_url_data.get('dir_info', {}).get('editable')
+
+    # The whole thing about direct_url.json is that
+    # it is a sign of editable installation from the one hand,
+    # but from the other hand, conda left this file at it's
+    # distributions as a artifact of repack process
+    # (see https://github.com/conda/conda/issues/11580).
+    # In case of conda, there will be some strange path like
+    # file:///work/ci_py311/idna_1676822698822/work
+    # which is probably will not exists at user's system
+    return bool(editable) and check_url_is_local_file(url)
+
+
+def get_distribution_profile(
+    distribution: Distribution,
+    files: Optional[Tuple[Path, ...]] = None,
+    scripts_directory: Optional[Path] = None,
+) -> DistributionProfile:
+    """
+    If Distribution files are foo/bar, foo/baz and foo1,
+    we want {<site-packages>/foo, <site-packages>/foo1} as a paths.
+    """
+
+    if files is None:
+        files = get_distribution_files(distribution)
+
+    if scripts_directory is None:
+        scripts_directory = get_scripts_directory()
+
+    paths = set()
+    bad_paths = set()
+    console_scripts = set()
+    has_extension_modules = False
+
+    # NB: paths are already resolved, so string prefix checks are the same as
+    # `x in path.parents` checks, but much cheaper
+    base_path = realpath(distribution.locate_file(''))
+    base_prefix = os.path.join(base_path, '')
+    scripts_prefix = os.path.join(str(scripts_directory), '')
+
+    for abs_path in files:
+        str_path = str(abs_path)
+
+        if str_path.endswith(BINARY_SUFFIXES):
+            has_extension_modules = True
+
+        if str_path.startswith(scripts_prefix):
+            console_scripts.add(str_path)
+            continue
+
+        if not str_path.startswith(base_prefix):
+            bad_paths.add(str_path)
+            continue
+
+        first_part = str_path[len(base_prefix):].split(os.sep, 1)[0]
+        paths.add(os.path.join(base_path, first_part))
+
+    return DistributionProfile(
+        paths=frozenset(paths),
+        console_scripts=frozenset(console_scripts),
+        bad_paths=frozenset(bad_paths),
+        is_editable=check_distribution_is_editable(distribution),
+        has_extension_modules=has_extension_modules,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_distributions_index() -> Tuple[PathIndex[Distribution], Dict[Distribution, DistributionProfile]]:
+    """
+    Walk through files of all distributions once and build both
+    files-to-distribution index and distributions profiles.
+    """
+
+    files_to_distributions: List[Tuple[str, Distribution]] = []
+    profiles = {}
+    scripts_directory = get_scripts_directory()
 
     for distribution in get_names_to_distributions().values():
-        for path in get_distribution_files(distribution):
-            fullpath = distribution.locate_file(path)
-            result[str(fullpath)] = distribution
+        files = get_distribution_files(distribution)
+
+        # files are absolute, so there is no need in distribution.locate_file
+        files_to_distributions.extend((str(path), distribution) for path in files)
+
+        profiles[distribution] = get_distribution_profile(distribution, files, scripts_directory)
+
+    # NB: environment could contain hundreds of thousands files,
+    # so we are storing it in a compact way
+    return PathIndex.from_items(files_to_distributions), profiles
 
-    return result
+
+def get_files_to_distributions() -> Mapping[str, Distribution]:
+    return get_distributions_index()[0]
+
+
+def get_distributions_profiles() -> Dict[Distribution, DistributionProfile]:
+    return get_distributions_index()[1]
 
 
 def is_path_package_meta(path: Path) -> bool:
@@ -172,7 +336,19 @@ def is_path_package_meta(path: Path) -> bool:
     )
 
 
+def is_record_path_package_meta(path: str) -> bool:
+    return any(
+        part.endswith('.dist-info') or part.endswith('.egg-info')
+        for part in path.split('/')
+    )
+
+
 def check_distribution_is_meta_package(distribution: Distribution) -> bool:
+    raw = getattr(distribution, 'raw', None)
+    if raw and raw.record:
+        # cheap check right at RECORD entries, without resolving of whole files list
+        return all(is_record_path_package_meta(path) for path in raw.record)
+
     distribution_files = get_distribution_files(distribution)
     if not distribution_files:
         # NB: .egg-info packages and some apt-packages doesn't have
@@ -186,7 +362,10 @@ def check_distribution_is_meta_package(distribution: Distribution) -> bool:
     )
 
 
+@lru_cache(maxsize=None)  # same requirement strings are repeated across distributions
 def get_name_from_requirement_string(requirement_string: str) -> Optional[str]:
+    from packaging.requirements import Requirement, InvalidRequirement
+
     try:
         requirement = Requirement(requirement_string)
     except InvalidRequirement:
@@ -197,6 +376,11 @@ def get_name_from_requirement_string(requirement_string: str) -> Optional[str]:
 
 @lru_cache(maxsize=None)  # cache size is about few MB
 def get_requirements_to_meta_packages() -> Dict[str, List[Distribution]]:
+    """
+    Reverse index of meta packages requirements; Requires-Dist is read only
+    for meta packages, which are usually just a few.
+    """
+
     result: Dict[str, List[Distribution]] = defaultdict(list)
 
     with tmp_cwd():
@@ -231,6 +415,15 @@ def is_lazy_module(module: types.ModuleType) -> bool:
 
 
 def get_distribution_files(distribution: Distribution) -> Tuple[Path, ...]:
+    raw = getattr(distribution, 'raw', None)
+    if raw and raw.record:
+        # fast path, same as distribution.locate_file(path).resolve() for RECORD entries
+        base_path = os.path.dirname(raw.path)
+        return tuple(
+            Path(realpath(os.path.join(base_path, path)))
+            for path in raw.record
+        )
+
     try:
         # NB: TODO: distribution.files could be empty in case of
         # dist-packages & .egg-info.
@@ -243,7 +436,7 @@ def get_distribution_files(distribution: Distribution) -> Tuple[Path, ...]:
         files = distribution.files
         if files:
             return tuple(
-                distribution.locate_file(path).resolve()
+                Path(realpath(distribution.locate_file(path)))
                 for path in files
             )
     except ValueError:
@@ -266,8 +459,7 @@ def get_distribution_files(distribution: Distribution) -> Tuple[Path, ...]:
         return ()
 
     paths = tuple(
-        (subdir / name)
-        .resolve()
+        Path(realpath(subdir / name))
         for name in text.splitlines()
     )
 
@@ -282,3 +474,48 @@ def is_exception_in_file(raw_tb: Optional[types.TracebackType], filename: str) -
     last_frame = tb[-1]
     last_frame_path = Path(last_frame.filename)
     return last_frame_path.parts[-1] == filename
+
+
+def get_path_size(path: str) -> int:
+    """
+    Return on-disk size in bytes of file or directory tree, symlinks are not followed.
+    """
+
+    try:
+        if not os.path.isdir(path) or os.path.islink(path):
+            return os.lstat(path).st_size
+    except OSError:
+        return 0
+
+    total = 0
+    stack = [path]
+
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+    return total
+
+
+def get_paths_sizes(paths: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Walk given paths in parallel; walking is mostly syscall-bound, so threads are fine here.
+    """
+
+    paths = list(paths)
+    if not paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(get_path_size, paths)))
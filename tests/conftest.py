@@ -3,10 +3,12 @@ from __future__ import annotations
 import sys
 import pathlib
 
-from typing import List
+from typing import Callable, Dict, List, Optional, Sequence
 
 import pytest
 
+from envzy.spec import EnvironmentSpec
+
 
 def pytest_ignore_collect(path, config):
     root = pathlib.Path(__file__).parent
@@ -54,6 +56,51 @@ def get_test_data_path():
     return getter
 
 
+# files of local tree relative to tmp_path, see make_local_spec
+LOCAL_TREE_FILES: Dict[str, Optional[bytes]] = {
+    'site/foo/__init__.py': b'from foo.sub import data\n',
+    'site/foo/sub/__init__.py': b'data = 1\n',
+    'site/bar.py': b'bar = 1\n',
+    'bin/foo-cli': b'#!/bin/sh\n',
+}
+
+
+@pytest.fixture
+def make_local_spec(tmp_path: pathlib.Path) -> Callable[..., EnvironmentSpec]:
+    """
+    Factory of environment spec with local tree at tmp_path: foo package and bar.py
+    module at site/ and bin/foo-cli console script. Files are overridden or added
+    by files argument (None removes the file), module_paths are relative to site/.
+    """
+
+    def make(
+        files: Optional[Dict[str, Optional[bytes]]] = None,
+        module_paths: Sequence[str] = ('foo', 'bar.py'),
+        script_mode: int = 0o755,
+    ) -> EnvironmentSpec:
+        console_scripts = []
+        for name, data in {**LOCAL_TREE_FILES, **(files or {})}.items():
+            if data is None:
+                continue
+
+            path = tmp_path.joinpath(*name.split('/'))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+
+            if name.startswith('bin/'):
+                path.chmod(script_mode)
+                console_scripts.append(str(path))
+
+        return EnvironmentSpec(
+            packages=[],
+            local_module_paths=[str(tmp_path.joinpath('site', *path.split('/'))) for path in module_paths],
+            pypi_packages={},
+            console_scripts=console_scripts,
+        )
+
+    return make
+
+
 @pytest.fixture(scope='function')
 def with_test_modules(get_test_data_path, monkeypatch):
     with monkeypatch.context() as m:
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import errno
+import io
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+import envzy.archive
+from envzy.archive import write_archive
+from envzy.manifest import ManifestRules
+from envzy.spec import EnvironmentSpec
+
+
+@pytest.fixture
+def spec(make_local_spec: Callable[..., EnvironmentSpec]) -> EnvironmentSpec:
+    # mode of script is normalized at archive
+    return make_local_spec(files={'site/foo/sub/data.bin': os.urandom(3000)}, script_mode=0o700)
+
+
+EXPECTED_NAMES = ['bar.py', 'bin/foo-cli', 'foo/__init__.py', 'foo/sub/__init__.py', 'foo/sub/data.bin']
+
+
+def get_contents(spec: EnvironmentSpec) -> dict:
+    site = Path(spec.local_module_paths[0]).parent
+    return {
+        'bar.py': b'bar = 1\n',
+        'bin/foo-cli': b'#!/bin/sh\n',
+        'foo/__init__.py': (site / 'foo' / '__init__.py').read_bytes(),
+        'foo/sub/__init__.py': b'data = 1\n',
+        'foo/sub/data.bin': (site / 'foo' / 'sub' / 'data.bin').read_bytes(),
+    }
+
+
+def write_to_bytes(spec: EnvironmentSpec, archive_format: str) -> bytes:
+    output = io.BytesIO()
+    write_archive(spec, output, archive_format)
+    return output.getvalue()
+
+
+def write_to_file(spec: EnvironmentSpec, archive_format: str, path: Path) -> bytes:
+    with path.open('wb') as f:
+        write_archive(spec, f, archive_format, max_workers=2)
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize('read_ahead_max_file_size', [1024 * 1024, 100])
+@pytest.mark.parametrize('archive_format', ['tar', 'tar.gz'])
+def test_write_tar(
+    spec: EnvironmentSpec,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    archive_format: str,
+    read_ahead_max_file_size: int,
+) -> None:
+    # small limit makes big files to be streamed through sendfile or mmap
+    monkeypatch.setattr(envzy.archive, 'READ_AHEAD_MAX_FILE_SIZE', read_ahead_max_file_size)
+
+    data = write_to_bytes(spec, archive_format)
+    assert write_to_file(spec, archive_format, tmp_path / 'out') == data
+
+    # mtimes don't affect output
+    os.utime(spec.local_module_paths[1], (0, 12345))
+    assert write_to_bytes(spec, archive_format) == data
+
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        members = archive.getmembers()
+        assert [m.name for m in members] == EXPECTED_NAMES
+        assert {m.name: archive.extractfile(m).read() for m in members} == get_contents(spec)  # type: ignore
+        assert {m.mtime for m in members} == {0}
+        assert {m.name: m.mode for m in members}['bin/foo-cli'] == 0o755
+        assert {m.name: m.mode for m in members}['bar.py'] == 0o644
+
+    if archive_format == 'tar':
+        assert len(data) % tarfile.RECORDSIZE == 0
+
+        expected = io.BytesIO()
+        with tarfile.open(fileobj=expected, mode='w', format=tarfile.PAX_FORMAT) as archive:
+            for member in members:
+                archive.addfile(member, io.BytesIO(get_contents(spec)[member.name]))
+
+        assert expected.getvalue() == data
+
+
+@pytest.mark.parametrize('read_ahead_max_file_size', [1024 * 1024, 100])
+def test_write_zip(
+    spec: EnvironmentSpec,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    read_ahead_max_file_size: int,
+) -> None:
+    monkeypatch.setattr(envzy.archive, 'READ_AHEAD_MAX_FILE_SIZE', read_ahead_max_file_size)
+
+    data = write_to_bytes(spec, 'zip')
+    assert write_to_file(spec, 'zip', tmp_path / 'out.zip') == data
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == EXPECTED_NAMES
+        assert {name: archive.read(name) for name in archive.namelist()} == get_contents(spec)
+        assert {info.date_time for info in archive.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+        assert archive.getinfo('bin/foo-cli').external_attr >> 16 & 0o777 == 0o755
+
+
+def test_write_archive_rules(spec: EnvironmentSpec) -> None:
+    site = Path(spec.local_module_paths[0]).parent
+    (site / 'foo' / '__pycache__').mkdir()
+    (site / 'foo' / '__pycache__' / '__init__.cpython-38.pyc').write_bytes(b'')
+
+    output = io.BytesIO()
+    write_archive(spec, output, 'zip', rules=ManifestRules(max_file_size=1000))
+
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ['bar.py', 'bin/foo-cli', 'foo/__init__.py', 'foo/sub/__init__.py']
+
+
+def test_write_archive_unknown_format(spec: EnvironmentSpec) -> None:
+    with pytest.raises(ValueError):
+        write_archive(spec, io.BytesIO(), 'rar')
+
+
+def test_write_tar_append(spec: EnvironmentSpec, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # all files are streamed
+    monkeypatch.setattr(envzy.archive, 'READ_AHEAD_MAX_FILE_SIZE', 1)
+    data = write_to_bytes(spec, 'tar')
+
+    # sendfile doesn't support files opened with O_APPEND at linux
+    path = tmp_path / 'out.tar'
+    path.write_bytes(b'prefix')
+    with path.open('ab') as f:
+        write_archive(spec, f, 'tar')
+    assert path.read_bytes() == b'prefix' + data
+
+    sent: List[int] = []
+
+    def unsupported_sendfile(out_fd: int, in_fd: int, offset: int, count: int) -> int:
+        sent.append(in_fd)
+        raise OSError(errno.ENOTSOCK, os.strerror(errno.ENOTSOCK))
+
+    # as at macOS, where output must be a socket; sendfile isn't tried after the first failure
+    monkeypatch.setattr(os, 'sendfile', unsupported_sendfile, raising=False)
+    assert write_to_file(spec, 'tar', tmp_path / 'out2.tar') == data
+    assert len(sent) == 1
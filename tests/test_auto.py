@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import os
 import sys
+from pathlib import Path
+
 import pytest
-from envzy import AutoExplorer, EnvironmentSpec
+from envzy import AutoExplorer, EnvironmentSpec, EnvironmentCost, ManifestRules
 from envzy.packages import PypiDistribution, LocalDistribution
 
 
@@ -34,7 +37,7 @@ def test_get_environment_spec(pypi_index_url, site_packages, env_prefix):
                     f'{site_packages}/lzy_test_project',
                     f'{site_packages}/lzy_test_project-3.0.0.dist-info'
                 }),
-                is_binary=False,
+                is_binary=True,
                 version='3.0.0',
                 bad_paths=frozenset(),
                 console_scripts=frozenset({f'{env_prefix}/bin/lzy_test_project_bin'}),
@@ -47,10 +50,8 @@ def test_get_environment_spec(pypi_index_url, site_packages, env_prefix):
                 have_server_supported_tags=True
             ),
         ],
-        local_module_paths=[
-            f'{site_packages}/lzy_test_project',
-            f'{site_packages}/lzy_test_project-3.0.0.dist-info'
-        ],
+        # lzy-test-project contains extension module, so it is not transferred
+        local_module_paths=[],
         pypi_packages={
             'sampleproject': '3.0.0'
         },
@@ -59,10 +60,74 @@ def test_get_environment_spec(pypi_index_url, site_packages, env_prefix):
         ]
     )
 
-    assert explorer.get_local_module_paths({'foo': lzy_test_project}) == [
-        f'{site_packages}/lzy_test_project',
-        f'{site_packages}/lzy_test_project-3.0.0.dist-info'
-    ]
+    assert explorer.get_local_module_paths({'foo': lzy_test_project}) == []
     assert explorer.get_pypi_packages({'foo': lzy_test_project}) == {
         'sampleproject': '3.0.0'
     }
+
+
+def test_get_environment_spec_cost(tmp_path: Path, with_test_modules, get_test_data_path) -> None:
+    import sample
+    import modules_for_tests.level1.level1 as level1
+
+    wheel_path = tmp_path / 'sampleproject-3.0.0-py3-none-any.whl'
+    wheel_path.write_bytes(b'x' * 100)
+
+    explorer = AutoExplorer(pypi_index_url=tmp_path.as_uri(), estimate_cost=True)
+    namespace = {'sample': sample, 'level1': level1}
+    spec = explorer.get_environment_spec(namespace)
+
+    def get_size(path: str) -> int:
+        return sum(
+            os.lstat(os.path.join(root, name)).st_size
+            for root, dirs, files in os.walk(path)
+            for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]
+        )
+
+    assert spec.cost == EnvironmentCost(
+        download_bytes={'sampleproject': 100},
+        local_bytes={path: get_size(path) for path in spec.local_module_paths},
+    )
+    assert spec.cost.total_download_bytes == 100
+    assert spec.cost.total_local_bytes > 0
+    assert get_test_data_path('modules_for_tests').as_posix() in spec.cost.local_bytes
+    assert spec.cost.unknown_download_packages == []
+
+    # cost is not estimated by default
+    assert AutoExplorer(pypi_index_url=tmp_path.as_uri()).get_environment_spec(namespace).cost is None
+
+
+def test_get_environment_spec_manifest(tmp_path: Path, with_test_modules) -> None:
+    import modules_for_tests.level1.level1 as level1
+
+    namespace = {'level1': level1}
+    explorer = AutoExplorer(pypi_index_url=tmp_path.as_uri(), build_manifest=True)
+    spec = explorer.get_environment_spec(namespace)
+
+    assert spec.manifest is not None
+    manifest_paths = {entry.path for package in spec.manifest.packages for entry in package.entries}
+    expected_paths = {
+        os.path.relpath(os.path.join(root, name), os.path.dirname(path)).replace(os.sep, '/')
+        for path in spec.local_module_paths
+        for root, _, files in os.walk(path)
+        for name in files
+    }
+    assert manifest_paths == expected_paths
+    assert all(package.root for package in spec.manifest.packages)
+
+    explorer = AutoExplorer(
+        pypi_index_url=tmp_path.as_uri(),
+        build_manifest=True,
+        manifest_rules=ManifestRules(exclude=('*.py',)),
+    )
+    pruned_manifest = explorer.get_environment_spec(namespace).manifest
+    assert pruned_manifest is not None
+    assert pruned_manifest.total_bytes + pruned_manifest.excluded_bytes == spec.manifest.total_bytes
+    # only top-level modules are left, as local module paths themselves are never excluded
+    pruned_paths = {entry.path for package in pruned_manifest.packages for entry in package.entries}
+    assert {path for path in pruned_paths if path.endswith('.py')} == {
+        os.path.basename(path) for path in spec.local_module_paths if path.endswith('.py')
+    }
+
+    # manifest is not built by default
+    assert AutoExplorer(pypi_index_url=tmp_path.as_uri()).get_environment_spec(namespace).manifest is None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import importlib.util
+import io
+import shutil
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from envzy import TargetInterpreterNotFound
+from envzy.archive import write_archive
+from envzy.bytecode import compile_bytecode, compile_files, get_bytecode_name, get_target_interpreter
+from envzy.spec import EnvironmentSpec
+
+
+@pytest.fixture
+def spec(make_local_spec: Callable[..., EnvironmentSpec]) -> EnvironmentSpec:
+    return make_local_spec(files={'site/foo/template.py': b'{% if x %}\n'})
+
+
+def test_get_bytecode_name() -> None:
+    assert get_bytecode_name('foo/sub/bar.py', 'cpython-39') == 'foo/sub/__pycache__/bar.cpython-39.pyc'
+    assert get_bytecode_name('bar.py', 'cpython-39') == '__pycache__/bar.cpython-39.pyc'
+    assert get_bytecode_name('foo/sub/bar.py', 'cpython-39', legacy_layout=True) == 'foo/sub/bar.pyc'
+
+
+def test_compile_bytecode(spec: EnvironmentSpec, tmp_path: Path) -> None:
+    output_dir = tmp_path / 'bytecode'
+    compiled = compile_bytecode(spec, str(output_dir), invalidation_mode='UNCHECKED_HASH', max_workers=2)
+
+    tag = sys.implementation.cache_tag
+    # template is skipped due to syntax error
+    assert sorted(compiled) == [
+        f'__pycache__/bar.{tag}.pyc',
+        f'foo/__pycache__/__init__.{tag}.pyc',
+        f'foo/sub/__pycache__/__init__.{tag}.pyc',
+    ]
+    assert sorted(
+        path.relative_to(output_dir).as_posix() for path in output_dir.rglob('*') if path.is_file()
+    ) == sorted(compiled)
+
+    data = Path(compiled[f'__pycache__/bar.{tag}.pyc']).read_bytes()
+    assert data[:4] == importlib.util.MAGIC_NUMBER
+    # hash-based unchecked pyc
+    assert int.from_bytes(data[4:8], 'little') == 0b01
+
+    # remote imports compiled bytecode: changed source is not checked in unchecked mode
+    staged = tmp_path / 'staged'
+    shutil.copytree(Path(spec.local_module_paths[0]).parent, staged)
+    shutil.copytree(output_dir, staged, dirs_exist_ok=True)
+    (staged / 'foo' / 'sub' / '__init__.py').write_text('data = 2\n')
+
+    output = subprocess.check_output(
+        [sys.executable, '-B', '-c', 'import foo; print(foo.data)'],
+        cwd=str(staged),
+        universal_newlines=True,
+    )
+    assert output == '1\n'
+
+
+def test_compile_files_target_interpreter(spec: EnvironmentSpec, tmp_path: Path) -> None:
+    other_python = next(
+        (
+            version for version in ((3, 8), (3, 9), (3, 10), (3, 11), (3, 12))
+            if version != sys.version_info[:2] and shutil.which(f'python{version[0]}.{version[1]}')
+        ),
+        None,
+    )
+    if other_python is None:
+        pytest.skip('there is no other python interpreter at PATH')
+
+    try:
+        compiled = compile_files({'bar.py': spec.local_module_paths[1]}, str(tmp_path), other_python)
+    except subprocess.CalledProcessError:
+        pytest.skip(f'python{other_python[0]}.{other_python[1]} at PATH is broken')
+
+    [(name, path)] = compiled.items()
+    assert name == f'__pycache__/bar.cpython-{other_python[0]}{other_python[1]}.pyc'
+    assert Path(path).read_bytes()[:4] != importlib.util.MAGIC_NUMBER
+
+
+def test_target_interpreter_not_found(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(shutil, 'which', lambda name: None)
+
+    with pytest.raises(TargetInterpreterNotFound):
+        get_target_interpreter((3, 99))
+
+    assert get_target_interpreter(sys.version_info[:2]) == sys.executable
+
+
+def test_compile_files_bad_arguments(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        compile_files({}, str(tmp_path), (3, 6))
+
+    with pytest.raises(ValueError):
+        compile_files({}, str(tmp_path), invalidation_mode='TIMESTAMP')
+
+
+def test_write_archive_bytecode(spec: EnvironmentSpec, tmp_path: Path) -> None:
+    output = io.BytesIO()
+    write_archive(spec, output, 'zip', target_python=sys.version_info[:2])
+
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == [
+            'bar.py',
+            'bar.pyc',
+            'bin/foo-cli',
+            'foo/__init__.py',
+            'foo/__init__.pyc',
+            'foo/sub/__init__.py',
+            'foo/sub/__init__.pyc',
+            'foo/template.py',
+        ]
+
+    # source is changed, so data is 1 only if bytecode was imported
+    with zipfile.ZipFile(output) as archive, zipfile.ZipFile(tmp_path / 'local.zip', 'w') as changed:
+        for name in archive.namelist():
+            changed.writestr(name, b'data = 2\n' if name == 'foo/sub/__init__.py' else archive.read(name))
+
+    output_text = subprocess.check_output(
+        # NB: checked hash-based pycs are trusted as is with this option
+        [sys.executable, '--check-hash-based-pycs', 'never', '-c', 'import foo; print(foo.data)'],
+        env={'PYTHONPATH': str(tmp_path / 'local.zip')},
+        universal_newlines=True,
+    )
+    assert output_text == '1\n'
@@ -7,7 +7,8 @@ from typing import Set
 
 import pytest
 from envzy.classify import ModuleClassifier
-from envzy.packages import LocalPackage, PypiDistribution, LocalDistribution, BasePackage
+from envzy.packages import LocalPackage, PypiDistribution, LocalDistribution, BasePackage, Target
+from envzy.pypi import TARGET_PLATFORMS, TARGET_PLATFORMS_AARCH64
 from envzy.utils import Distribution
 
 
@@ -78,7 +79,8 @@ def test_classify_pypi_packages(
                 f'{site_packages}/lzy_test_project',
                 f'{site_packages}/lzy_test_project-3.0.0.dist-info'
             }),
-            is_binary=False,
+            # lzy_test_project.foo extension module is not imported, but it is present in RECORD
+            is_binary=True,
             version='3.0.0',
             bad_paths=frozenset(),
             console_scripts=frozenset({f'{env_prefix}/bin/lzy_test_project_bin'}),
@@ -132,7 +134,7 @@ def test_classify_local_distribution(
             f'{site_packages}/lzy_test_project',
             f'{site_packages}/lzy_test_project-3.0.0.dist-info'
         }),
-        is_binary=False,
+        is_binary=True,
         version='3.0.0',
         bad_paths=frozenset(),
         console_scripts=frozenset({f'{env_prefix}/bin/lzy_test_project_bin'}),
@@ -143,8 +145,9 @@ def test_classify_local_distribution(
 
         return {p for p in result if p.name != 'sampleproject'}
 
+    # distribution is binary regardless of whether its extension modules are imported or not
     assert classify(lzy_test_project) == frozenset({etalon})
-    assert classify(lzy_test_project.foo) == frozenset({dataclasses.replace(etalon, is_binary=True)})
+    assert classify(lzy_test_project.foo) == frozenset({etalon})
 
     old_classify_distribution = classifier._classify_distribution
     meta_etalon = PypiDistribution(
@@ -233,3 +236,43 @@ def test_classify_with_extra_index(pypi_index_url) -> None:
             have_server_supported_tags=True
         ),
     ])
+
+
+def test_classify_targets(tmp_path: Path, monkeypatch) -> None:
+    for filename in (
+        'foo-1.0-cp39-cp39-manylinux2014_x86_64.whl',
+        'foo-1.0-cp310-cp310-manylinux2014_x86_64.whl',
+        'foo-1.0-cp310-cp310-manylinux2014_aarch64.whl',
+    ):
+        (tmp_path / filename).touch()
+
+    url = tmp_path.as_uri()
+    classifier = ModuleClassifier(pypi_index_url=url, target_python=(3, 9))
+
+    package = PypiDistribution(
+        name='foo',
+        version='1.0',
+        pypi_index_url=url,
+        have_server_supported_tags=True,
+    )
+    local_package = LocalPackage(
+        name='bar',
+        paths=frozenset(),
+        is_binary=False,
+        console_scripts=frozenset(),
+    )
+    monkeypatch.setattr(classifier, 'classify', lambda modules: frozenset({package, local_package}))
+
+    targets = [
+        Target(python=(3, 9), platforms=TARGET_PLATFORMS),
+        Target(python=(3, 9), platforms=TARGET_PLATFORMS_AARCH64),
+        Target(python=(3, 10), platforms=TARGET_PLATFORMS_AARCH64),
+        Target(python=(3, 11), platforms=TARGET_PLATFORMS),
+    ]
+
+    assert classifier.classify_targets([], targets) == {
+        targets[0]: frozenset({package, local_package}),
+        targets[1]: frozenset({dataclasses.replace(package, have_server_supported_tags=False), local_package}),
+        targets[2]: frozenset({package, local_package}),
+        targets[3]: frozenset({dataclasses.replace(package, have_server_supported_tags=False), local_package}),
+    }
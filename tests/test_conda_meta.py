@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import envzy.utils
+from envzy.conda_meta import (
+    CondaPackage,
+    get_package_metadata_path,
+    merge_conda_packages,
+    read_conda_packages,
+)
+from envzy.dist_info import RawDistribution, read_raw_distributions
+from envzy.utils import Distribution, get_distribution_files, get_raw_distributions
+
+SITE_PACKAGES = 'lib/python3.8/site-packages'
+
+
+@pytest.fixture
+def conda_prefix(tmp_path: Path) -> Path:
+    conda_meta = tmp_path / 'conda-meta'
+    conda_meta.mkdir()
+    (tmp_path / 'bin').mkdir()
+
+    def add_package(name: str, version: str, files: dict) -> None:
+        for file, content in files.items():
+            path = tmp_path / file
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+
+        data = {'name': name, 'version': version, 'build': '0', 'files': sorted(files)}
+        (conda_meta / f'{name}-{version}-0.json').write_text(json.dumps(data))
+
+    # old-style package with .egg-info file, which has no files list
+    add_package('foo', '1.0', {
+        f'{SITE_PACKAGES}/foo/__init__.py': '',
+        f'{SITE_PACKAGES}/foo-1.0-py3.8.egg-info': 'Metadata-Version: 1.1\nName: foo\nVersion: 1.0\n',
+        'bin/foo': '',
+    })
+    # package with RECORD, which doesn't list files added by conda
+    add_package('py-bar', '2.0', {
+        f'{SITE_PACKAGES}/bar/__init__.py': '',
+        f'{SITE_PACKAGES}/bar/_speedups.so': '',
+        f'{SITE_PACKAGES}/bar-2.0.dist-info/METADATA': 'Name: bar\nVersion: 2.0\n',
+        f'{SITE_PACKAGES}/bar-2.0.dist-info/RECORD': 'bar/__init__.py,,\nbar-2.0.dist-info/RECORD,,\n',
+    })
+    # non-python package
+    add_package('libbaz', '3.0', {'lib/libbaz.so': ''})
+
+    (conda_meta / 'history').write_text('')
+    (conda_meta / 'broken-1.0-0.json').write_text('{')
+
+    return tmp_path
+
+
+def test_read_conda_packages(conda_prefix: Path) -> None:
+    packages = read_conda_packages(str(conda_prefix))
+
+    assert [(p.name, p.version) for p in packages] == [('foo', '1.0'), ('libbaz', '3.0'), ('py-bar', '2.0')]
+    assert [get_package_metadata_path(p) for p in packages] == [
+        f'{SITE_PACKAGES}/foo-1.0-py3.8.egg-info',
+        None,
+        f'{SITE_PACKAGES}/bar-2.0.dist-info',
+    ]
+
+    assert read_conda_packages(str(conda_prefix / 'bin')) == []
+
+
+def test_merge_conda_packages(conda_prefix: Path) -> None:
+    site_packages = str(conda_prefix / SITE_PACKAGES)
+    distributions = read_raw_distributions([site_packages])
+    assert [(d.name, d.record is None) for d in distributions] == [('bar', False), ('foo', True)]
+
+    merged = merge_conda_packages(distributions, read_conda_packages(str(conda_prefix)), str(conda_prefix))
+
+    assert merged == [
+        RawDistribution(
+            path=os.path.join(site_packages, 'bar-2.0.dist-info'),
+            name='bar',
+            version='2.0',
+            record=(
+                'bar/__init__.py',
+                'bar-2.0.dist-info/RECORD',
+                'bar-2.0.dist-info/METADATA',
+                'bar/_speedups.so',
+            ),
+        ),
+        RawDistribution(
+            path=os.path.join(site_packages, 'foo-1.0-py3.8.egg-info'),
+            name='foo',
+            version='1.0',
+            record=(os.path.join('..', '..', '..', 'bin', 'foo'), 'foo-1.0-py3.8.egg-info', 'foo/__init__.py'),
+        ),
+    ]
+
+    files = {
+        raw.name: set(get_distribution_files(Distribution(None, raw)))  # type: ignore[arg-type]
+        for raw in merged
+    }
+    assert Path(site_packages, 'bar', '_speedups.so') in files['bar']
+    assert files['foo'] == {
+        conda_prefix / 'bin' / 'foo',
+        Path(site_packages, 'foo-1.0-py3.8.egg-info'),
+        Path(site_packages, 'foo', '__init__.py'),
+    }
+
+
+def test_merge_conda_packages_keeps_sys_path_distributions(tmp_path: Path) -> None:
+    distribution = RawDistribution(path=str(tmp_path / 'foo-2.0.dist-info'), name='Foo', version='2.0', record=())
+    egg_info = tmp_path / 'other' / 'foo.egg-info'
+    egg_info.parent.mkdir()
+    egg_info.write_text('Name: foo\nVersion: 1.0\n')
+    package = CondaPackage(path='', name='foo', version='1.0', files=('other/foo.egg-info',))
+
+    assert merge_conda_packages([distribution], [package], str(tmp_path)) == [distribution]
+
+
+def test_get_raw_distributions(conda_prefix: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sys, 'path', [str(conda_prefix / SITE_PACKAGES)])
+    monkeypatch.setattr(sys, 'prefix', str(conda_prefix))
+
+    assert [(d.name, d.record is None) for d in get_raw_distributions()] == [('bar', False), ('foo', True)]
+
+    # files list of .egg-info file distribution is taken from conda-meta
+    monkeypatch.setattr(envzy.utils, 'USE_CONDA_META', True)
+    assert [(d.name, d.record is None) for d in get_raw_distributions()] == [('bar', False), ('foo', False)]
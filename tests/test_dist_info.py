@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import importlib_metadata
+import pytest
+
+from envzy.dist_info import RawDistribution, read_raw_distribution, read_raw_distributions
+from envzy.utils import (
+    Distribution,
+    canonize_name,
+    check_distribution_is_meta_package,
+    get_names_to_distributions,
+    get_raw_distributions,
+    tmp_cwd,
+)
+
+
+def test_read_raw_distribution(tmp_path: Path) -> None:
+    dist_info = tmp_path / 'foo-1.0.dist-info'
+    dist_info.mkdir()
+    (dist_info / 'METADATA').write_text(
+        'Metadata-Version: 2.1\n'
+        'Name: Foo\n'
+        'Version: 1.0\n'
+        '\n'
+        'Name: not-a-header\n'
+    )
+    (dist_info / 'RECORD').write_text(
+        'foo/__init__.py,sha256=abc,10\n'
+        '"foo/with,comma.py",,\n'
+        'foo-1.0.dist-info/RECORD,,\n'
+    )
+
+    egg_info = tmp_path / 'bar.egg-info'
+    egg_info.mkdir()
+    (egg_info / 'PKG-INFO').write_text('Metadata-Version: 1.0\nName: bar\nVersion: 2.0\n')
+
+    (tmp_path / 'broken.dist-info').mkdir()
+    # distutils-style distribution, PKG-INFO itself
+    egg_info_file = tmp_path / 'baz-3.0-py3.8.egg-info'
+    egg_info_file.write_text('Metadata-Version: 1.0\nName: baz\nVersion: 3.0\n')
+
+    assert read_raw_distribution(str(dist_info)) == RawDistribution(
+        path=str(dist_info),
+        name='Foo',
+        version='1.0',
+        record=('foo/__init__.py', 'foo/with,comma.py', 'foo-1.0.dist-info/RECORD'),
+    )
+    assert read_raw_distributions([str(tmp_path)]) == [
+        RawDistribution(path=str(egg_info), name='bar', version='2.0', record=None),
+        RawDistribution(path=str(egg_info_file), name='baz', version='3.0', record=None),
+        read_raw_distribution(str(dist_info)),
+    ]
+
+
+def test_same_as_importlib_metadata() -> None:
+    def get_files(distribution) -> frozenset:
+        return frozenset(str(distribution.locate_file(path).resolve()) for path in distribution.files or ())
+
+    with tmp_cwd():
+        expected = {
+            canonize_name(d.name): (d.version, get_files(d))
+            for d in importlib_metadata.distributions()
+            if d.name
+        }
+        raw_distributions = read_raw_distributions()
+
+    result = {}
+    for raw in raw_distributions:
+        distribution = importlib_metadata.PathDistribution(Path(raw.path))
+        files = get_files(distribution) if raw.record is None else frozenset(
+            str((Path(raw.path).parent / path).resolve()) for path in raw.record
+        )
+        result[canonize_name(raw.name)] = (raw.version, files)
+
+    assert result == expected
+
+
+def test_egg_info_file_distribution(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / 'baz-3.0-py3.8.egg-info').write_text('Metadata-Version: 1.0\nName: baz\nVersion: 3.0\n')
+    monkeypatch.setattr(sys, 'path', [str(tmp_path)])
+
+    [raw] = get_raw_distributions()
+    assert (raw.name, raw.version, raw.record) == ('baz', '3.0', None)
+
+    # same as importlib_metadata finds
+    [expected] = importlib_metadata.distributions(path=[str(tmp_path)])
+    distribution = Distribution(importlib_metadata.PathDistribution(Path(raw.path)), raw)
+    assert (distribution.name, distribution.version) == (expected.name, expected.version)
+    assert distribution.base.version == '3.0'
+
+
+def test_check_distribution_is_meta_package() -> None:
+    distributions = get_names_to_distributions().values()
+    assert any(check_distribution_is_meta_package(d) for d in distributions)
+
+    for distribution in distributions:
+        # without raw RECORD files are resolved through importlib_metadata
+        assert check_distribution_is_meta_package(distribution) == check_distribution_is_meta_package(
+            Distribution(distribution.base)
+        ), distribution.name
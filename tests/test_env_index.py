@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import envzy.env_index
+from envzy.classify import ModuleClassifier
+from envzy.env_index import (
+    ENVIRONMENT_INDEX_NAMESPACE,
+    EnvironmentIndex,
+    build_environment_index,
+    get_environment_fingerprint,
+    get_environment_index,
+    get_environment_lookups,
+)
+from envzy.cache import get_cache_path
+
+
+def test_environment_index() -> None:
+    expected = get_environment_lookups()
+    index = EnvironmentIndex(build_environment_index())
+
+    assert len(index.files_to_distributions) == len(expected.files_to_distributions)
+    for path, distribution in expected.files_to_distributions.items():
+        assert index.files_to_distributions[path].name == distribution.name
+    assert '/absent/path.py' not in index.files_to_distributions
+
+    assert sorted(index.names_to_distributions) == sorted(expected.names_to_distributions)
+    for name, distribution in expected.names_to_distributions.items():
+        indexed = index.names_to_distributions[name]
+        assert (indexed.name, indexed.version) == (distribution.name, distribution.version)
+        assert indexed.requires == distribution.requires
+        assert index.distributions_profiles[indexed] == expected.distributions_profiles[distribution]
+        # the same object
+        assert index.files_to_distributions.get(next(iter(index.distributions_profiles[indexed].paths), '')) in (
+            None, indexed
+        )
+
+    assert {
+        name: [d.name for d in distributions]
+        for name, distributions in index.requirements_to_meta_packages.items()
+    } == {
+        name: [d.name for d in distributions]
+        for name, distributions in expected.requirements_to_meta_packages.items()
+    }
+
+
+def test_get_environment_index(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv('ENVZY_CACHE_DIR', str(tmp_path))
+    get_environment_index.cache_clear()
+
+    index = get_environment_index()
+    path = get_cache_path(ENVIRONMENT_INDEX_NAMESPACE, get_environment_fingerprint())
+    assert path.read_bytes() == build_environment_index()
+    assert 'sampleproject' in index.names_to_distributions
+
+    # next process just maps existing file
+    get_environment_index.cache_clear()
+    monkeypatch.setattr(envzy.env_index, 'build_environment_index', None)
+    assert 'sampleproject' in get_environment_index().names_to_distributions
+
+    get_environment_index.cache_clear()
+
+
+def test_classify_with_environment_index(tmp_path: Path, monkeypatch) -> None:
+    import lzy_test_project
+    import sample
+
+    monkeypatch.setenv('ENVZY_CACHE_DIR', str(tmp_path / 'cache'))
+    url = tmp_path.as_uri()
+
+    expected = ModuleClassifier(pypi_index_url=url, target_python=(3, 9)).classify([lzy_test_project, sample])
+
+    monkeypatch.setattr(envzy.env_index, 'USE_ENVIRONMENT_INDEX', True)
+    get_environment_index.cache_clear()
+    result = ModuleClassifier(pypi_index_url=url, target_python=(3, 9)).classify([lzy_test_project, sample])
+    get_environment_index.cache_clear()
+
+    assert result == expected
+
+
+def test_lazy_requirements_to_meta_packages(monkeypatch) -> None:
+    calls = []
+
+    def get_requirements_to_meta_packages():
+        calls.append(1)
+        return {'sampleproject': []}
+
+    monkeypatch.setattr(envzy.env_index, 'get_requirements_to_meta_packages', get_requirements_to_meta_packages)
+
+    classifier = ModuleClassifier(pypi_index_url='file:///absent', target_python=(3, 9))
+    assert not calls
+
+    assert classifier.requirements_to_meta_packages.get('sampleproject') == []
+    assert classifier.requirements_to_meta_packages.get('absent') is None
+    assert calls == [1]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import envzy.manifest
+from envzy.cache import CACHE_DIR_ENV, get_cache_path
+from envzy.hash_cache import HASH_CACHE_NAMESPACE, HashCache
+from envzy.manifest import build_manifest, get_paths_fingerprints, get_roots_files_hashes
+from envzy.packages import LocalPackage
+
+# far enough from now to be out of racy window
+OLD_MTIME = time.time() - 60
+
+
+@pytest.fixture
+def hashed_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    monkeypatch.setattr(envzy.manifest, 'USE_HASH_CACHE', True)
+
+    hashed: List[str] = []
+    hash_file = envzy.manifest.hash_file
+
+    def counting_hash_file(path: str) -> str:
+        hashed.append(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(envzy.manifest, 'hash_file', counting_hash_file)
+    return hashed
+
+
+def make_tree(root: Path, files: int) -> None:
+    for i in range(files):
+        path = root / f'sub{i % 10}' / f'module{i}.py'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f'x = {i}\n')
+        os.utime(path, (OLD_MTIME, OLD_MTIME))
+
+
+def test_hash_cache_reuses_unchanged_files(
+    tmp_path: Path,
+    hashed_files: List[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    root = tmp_path / 'foo'
+    make_tree(root, 100)
+
+    fingerprint = get_paths_fingerprints([str(root)])[str(root)]
+    assert len(hashed_files) == 100
+
+    hashed_files.clear()
+    assert get_paths_fingerprints([str(root)])[str(root)] == fingerprint
+    assert hashed_files == []
+
+    changed = root / 'sub3' / 'module3.py'
+    changed.write_text('x = 42\n')
+    os.utime(changed, (OLD_MTIME + 1, OLD_MTIME + 1))
+
+    new_fingerprint = get_paths_fingerprints([str(root)])[str(root)]
+    assert new_fingerprint != fingerprint
+    assert hashed_files == [str(changed)]
+
+    # unchanged path is answered by persisted merkle root without hash cache loading
+    loads: List[str] = []
+    load = HashCache.load
+
+    def counting_load(root: str) -> HashCache:
+        loads.append(root)
+        return load(root)
+
+    monkeypatch.setattr(HashCache, 'load', counting_load)
+    assert get_paths_fingerprints([str(root)])[str(root)] == new_fingerprint
+    assert loads == []
+
+    # manifest is the same as without cache
+    package = LocalPackage(name='foo', paths=frozenset({str(root)}), console_scripts=frozenset(), is_binary=False)
+    cached_manifest = build_manifest([package])
+    envzy.manifest.USE_HASH_CACHE = False  # restored by monkeypatch
+    assert build_manifest([package]) == cached_manifest
+
+
+def test_paths_fingerprints_with_same_basename(tmp_path: Path, hashed_files: List[str]) -> None:
+    make_tree(tmp_path / 'a' / 'foo', 3)
+    make_tree(tmp_path / 'b' / 'foo', 4)
+    paths = [str(tmp_path / 'a' / 'foo'), str(tmp_path / 'b' / 'foo')]
+
+    fingerprints = get_paths_fingerprints(paths)
+    for path in paths:
+        package = LocalPackage(name='foo', paths=frozenset({path}), console_scripts=frozenset(), is_binary=False)
+        assert fingerprints[path] == build_manifest([package]).packages[0].root
+
+
+def test_hash_cache_shared_file(tmp_path: Path, hashed_files: List[str]) -> None:
+    make_tree(tmp_path / 'foo', 1)
+    path = str(tmp_path / 'foo' / 'sub0' / 'module0.py')
+    # file is under both roots, like a script inside of a module dir
+    roots_files = {str(tmp_path / 'foo'): [path], str(tmp_path / 'foo' / 'sub0'): [path]}
+    stats = {path: os.stat(path)}
+
+    hashes = get_roots_files_hashes(roots_files, stats)
+    assert hashed_files == [path]
+
+    hashed_files.clear()
+    assert get_roots_files_hashes(roots_files, stats) == hashes
+    assert get_roots_files_hashes({str(tmp_path / 'foo' / 'sub0'): [path]}, stats) == hashes
+    assert hashed_files == []
+
+
+def test_hash_cache_skips_racy_files(tmp_path: Path, hashed_files: List[str]) -> None:
+    root = tmp_path / 'foo'
+    make_tree(root, 2)
+    # just modified file could be modified again without mtime change
+    (root / 'sub0' / 'module0.py').write_text('x = 1\n')
+
+    get_paths_fingerprints([str(root)])
+    hashed_files.clear()
+
+    get_paths_fingerprints([str(root)])
+    assert hashed_files == [str(root / 'sub0' / 'module0.py')]
+
+
+def test_hash_cache_load(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+
+    path = tmp_path / 'with space'
+    path.write_text('')
+    os.utime(path, (OLD_MTIME, OLD_MTIME))
+    stat_result = os.stat(path)
+
+    cache = HashCache('/root')
+    cache.put(str(path), stat_result, 'abc')
+    cache.save()
+
+    loaded = HashCache.load('/root')
+    assert loaded.get(str(path), stat_result) == 'abc'
+    os.utime(path, (OLD_MTIME + 1, OLD_MTIME + 1))
+    assert loaded.get(str(path), os.stat(path)) is None
+    assert loaded.get('/root/other', stat_result) is None
+    assert (loaded.hits, loaded.misses) == (1, 2)
+
+    # only used entries are kept
+    loaded = HashCache.load('/root')
+    loaded.get(str(path), stat_result)
+    loaded.save()
+    assert HashCache.load('/root').get(str(path), stat_result) == 'abc'
+    HashCache.load('/root').save()
+    assert HashCache.load('/root').get(str(path), stat_result) is None
+
+    get_cache_path(HASH_CACHE_NAMESPACE, '/root').write_bytes(b'broken')
+    assert HashCache.load('/root').get(str(path), stat_result) is None
+
+    # malformed entries are the same as absent ones
+    entry = [stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns, 'abc']
+    for broken in (None, 1, [], entry[:3], entry[:3] + [None], ['1'] + entry[1:]):
+        get_cache_path(HASH_CACHE_NAMESPACE, '/root').write_text(json.dumps({str(path): broken, '/root/ok': entry}))
+        loaded = HashCache.load('/root')
+        assert loaded.get(str(path), stat_result) is None
+        assert loaded.get('/root/ok', stat_result) == 'abc'
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from typing import Set
+
+import pytest
+
+# heavy dependencies which must be imported only at code paths which are using them
+DEFERRED_MODULES = (
+    'requests',
+    'pypi_simple',
+    'bs4',
+    'packaging.tags',
+    'packaging.requirements',
+    'importlib_metadata',
+    'stdlib_list',
+    # stdlib ones, urllib.request alone imports http.client and email
+    'urllib.request',
+    'http.client',
+    'email',
+)
+
+
+def get_imported_modules(statement: str) -> Set[str]:
+    """
+    Return names of all modules imported by statement in a fresh interpreter.
+    """
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+
+    return {
+        line.rsplit('|', 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and 'cumulative' not in line
+    }
+
+
+def test_heavy_dependencies_are_deferred() -> None:
+    modules = get_imported_modules('import envzy')
+
+    assert 'envzy' in modules
+    for module in DEFERRED_MODULES:
+        assert module not in modules, f'{module} is imported with envzy'
+
+
+@pytest.mark.parametrize('statement, module', [
+    ('from envzy.pypi import get_session; get_session()', 'requests'),
+    ('from envzy.pypi import get_pypi_client; get_pypi_client("file:///")', 'pypi_simple'),
+    ('from envzy.utils import get_names_to_distributions; get_names_to_distributions()', 'importlib_metadata'),
+    ('from envzy.local_index import get_local_index_path; get_local_index_path("file:///")', 'urllib.request'),
+])
+def test_deferred_dependencies_are_imported_on_use(statement: str, module: str) -> None:
+    assert module in get_imported_modules(statement)
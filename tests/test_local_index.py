@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import dataclasses
+import zipfile
+from pathlib import Path
+from typing import Any, List, Optional, cast
+
+import pytest
+
+from envzy.classify import ModuleClassifier
+from envzy.dist_info import RawDistribution
+from envzy.exceptions import BadPypiIndex
+from envzy.local_index import get_local_project_page, get_wheelhouse_index
+from envzy.packages import DistributionFile, PypiDistribution, Target
+from envzy.pypi import (
+    TARGET_PLATFORMS,
+    TARGET_PLATFORMS_AARCH64,
+    check_package_version_exists,
+    check_package_version_exists_on_target_platform,
+    check_package_version_has_compatible_wheel,
+    find_package_nearest_version_with_compatible_wheel,
+    get_best_wheel,
+    get_wheel_metadata,
+    validate_pypi_index_url,
+)
+from envzy.utils import Distribution
+
+SNAPSHOT_PAGE = """<!DOCTYPE html>
+<html>
+  <body>
+    <a href="https://files.example.com/baz-0.1-py3-none-any.whl#sha256=abc">baz-0.1-py3-none-any.whl</a>
+    <a href="https://files.example.com/baz-0.2-cp39-cp39-win_amd64.whl#sha256=def">baz-0.2-cp39-cp39-win_amd64.whl</a>
+  </body>
+</html>
+"""
+
+
+@pytest.fixture
+def local_index(tmp_path: Path) -> Path:
+    for filename in (
+        'foo_bar-1.0-py3-none-any.whl',
+        'foo_bar-1.1-cp39-cp39-win_amd64.whl',
+        'qux-2.0.tar.gz',
+        'README.txt',
+    ):
+        (tmp_path / filename).touch()
+
+    (tmp_path / 'baz').mkdir()
+    (tmp_path / 'baz' / 'index.html').write_text(SNAPSHOT_PAGE)
+
+    return tmp_path
+
+
+def test_wheelhouse_index(local_index: Path) -> None:
+    assert get_wheelhouse_index(local_index) == {
+        'foo-bar': (
+            ('foo_bar-1.0-py3-none-any.whl', '1.0', 'wheel'),
+            ('foo_bar-1.1-cp39-cp39-win_amd64.whl', '1.1', 'wheel'),
+        ),
+        'qux': (
+            ('qux-2.0.tar.gz', '2.0', 'sdist'),
+        ),
+    }
+
+    page = get_local_project_page(local_index.as_uri(), 'Foo.Bar')
+    assert page
+    assert [p.url for p in page.packages] == [
+        (local_index / 'foo_bar-1.0-py3-none-any.whl').as_uri(),
+        (local_index / 'foo_bar-1.1-cp39-cp39-win_amd64.whl').as_uri(),
+    ]
+
+    assert get_local_project_page(local_index.as_uri(), 'absent') is None
+
+
+def test_local_index_lookups(local_index: Path) -> None:
+    url = local_index.as_uri()
+
+    validate_pypi_index_url(url)
+    with pytest.raises(BadPypiIndex):
+        validate_pypi_index_url((local_index / 'absent').as_uri())
+
+    assert check_package_version_exists(pypi_index_url=url, name='foo-bar', version='1.1')
+    assert check_package_version_exists(pypi_index_url=url, name='baz', version='0.2')
+    assert not check_package_version_exists(pypi_index_url=url, name='baz', version='0.3')
+
+    assert check_package_version_exists_on_target_platform(
+        pypi_index_url=url, name='foo-bar', version='1.0', target_python=(3, 9)
+    )
+    assert not check_package_version_exists_on_target_platform(
+        pypi_index_url=url, name='foo-bar', version='1.1', target_python=(3, 9)
+    )
+    assert check_package_version_exists_on_target_platform(
+        pypi_index_url=url, name='qux', version='2.0', target_python=(3, 9)
+    )
+    assert check_package_version_exists_on_target_platform(
+        pypi_index_url=url, name='baz', version='0.1', target_python=(3, 9)
+    )
+
+
+def test_classify_with_local_index(local_index: Path) -> None:
+    url = local_index.as_uri()
+    classifier = ModuleClassifier(pypi_index_url=url, target_python=(3, 9))
+
+    @dataclasses.dataclass(frozen=True)
+    class MyDistribution:
+        name: str
+        version: str
+
+    assert classifier._classify_distributions({
+        MyDistribution('foo-bar', '1.1'),  # type: ignore
+        MyDistribution('baz', '0.1'),  # type: ignore
+    }, set()) == frozenset([
+        PypiDistribution(
+            name='foo-bar',
+            version='1.1',
+            pypi_index_url=url,
+            have_server_supported_tags=False,
+            nearest_wheel_version='1.0',
+        ),
+        PypiDistribution(
+            name='baz',
+            version='0.1',
+            pypi_index_url=url,
+            have_server_supported_tags=True,
+        ),
+    ])
+
+
+def test_classify_with_local_index_wheels(local_index: Path) -> None:
+    url = local_index.as_uri()
+    classifier = ModuleClassifier(pypi_index_url=url, target_python=(3, 9), resolve_wheels=True)
+
+    @dataclasses.dataclass(frozen=True)
+    class MyDistribution:
+        name: str
+        version: str
+
+    assert classifier._classify_distributions({
+        MyDistribution('foo-bar', '1.0'),  # type: ignore
+        MyDistribution('baz', '0.1'),  # type: ignore
+        MyDistribution('qux', '2.0'),  # type: ignore
+    }, set()) == frozenset([
+        PypiDistribution(
+            name='foo-bar',
+            version='1.0',
+            pypi_index_url=url,
+            have_server_supported_tags=True,
+            wheel=DistributionFile(
+                filename='foo_bar-1.0-py3-none-any.whl',
+                url=(local_index / 'foo_bar-1.0-py3-none-any.whl').as_uri(),
+                hashes=(),
+                size=None,
+            ),
+        ),
+        PypiDistribution(
+            name='baz',
+            version='0.1',
+            pypi_index_url=url,
+            have_server_supported_tags=True,
+            wheel=DistributionFile(
+                filename='baz-0.1-py3-none-any.whl',
+                url='https://files.example.com/baz-0.1-py3-none-any.whl',
+                hashes=(('sha256', 'abc'),),
+                size=None,
+            ),
+        ),
+        PypiDistribution(
+            name='qux',
+            version='2.0',
+            pypi_index_url=url,
+            have_server_supported_tags=True,
+            sdist_only=True,
+        ),
+    ])
+
+
+def test_nearest_version_with_compatible_wheel(tmp_path: Path) -> None:
+    for filename in (
+        'spam-1.0-py3-none-any.whl',
+        'spam-1.1.tar.gz',
+        'spam-1.2.tar.gz',
+        'spam-1.3-cp39-cp39-manylinux2014_x86_64.whl',
+        'spam-2.0rc1-py3-none-any.whl',
+        'spam-2.0.tar.gz',
+        'spam-2.1.tar.gz',
+    ):
+        (tmp_path / filename).touch()
+
+    url = tmp_path.as_uri()
+
+    def nearest(version: str) -> Optional[str]:
+        return find_package_nearest_version_with_compatible_wheel(
+            pypi_index_url=url, name='spam', version=version, target_python=(3, 9)
+        )
+
+    assert check_package_version_has_compatible_wheel(
+        pypi_index_url=url, name='spam', version='1.0', target_python=(3, 9)
+    )
+    assert not check_package_version_has_compatible_wheel(
+        pypi_index_url=url, name='spam', version='1.1', target_python=(3, 9)
+    )
+
+    assert nearest('1.1') == '1.0'
+    # tie is resolved in favour of newer version
+    assert nearest('1.2') == '1.3'
+    # pre-releases are not suggested for final releases, as well as other major versions
+    assert nearest('2.1') is None
+    # version which is absent at index
+    assert nearest('1.25') == '1.3'
+    assert nearest('2.0rc2') == '2.0rc1'
+
+
+def make_wheel(path: Path, name: str, version: str, requires: List[str]) -> Path:
+    wheel_path = path / f'{name}-{version}-py3-none-any.whl'
+    metadata = f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n'
+    metadata += ''.join(f'Requires-Dist: {r}\n' for r in requires)
+
+    with zipfile.ZipFile(wheel_path, 'w') as wheel:
+        wheel.writestr(f'{name}-{version}.dist-info/METADATA', metadata)
+
+    return wheel_path
+
+
+def test_inspect_meta_package(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv('ENVZY_CACHE_DIR', str(tmp_path / 'cache'))
+
+    index_path = tmp_path / 'index'
+    index_path.mkdir()
+    url = index_path.as_uri()
+
+    make_wheel(index_path, 'meta', '1.0', ['dep_a', 'dep_b; sys_platform == "win32"'])
+    make_wheel(index_path, 'meta', '2.0', ['dep_a', 'dep_c>=2'])
+    for filename in (
+        'dep_a-1.0-cp39-cp39-manylinux2014_x86_64.whl',
+        'dep_b-1.0-cp39-cp39-win_amd64.whl',
+        'dep_c-1.0-py3-none-any.whl',
+        'dep_c-2.0-cp39-cp39-win_amd64.whl',
+    ):
+        (index_path / filename).touch()
+
+    classifier = ModuleClassifier(pypi_index_url=url, target_python=(3, 9), inspect_meta_packages=True)
+
+    def make_package(version: str) -> PypiDistribution:
+        return PypiDistribution(name='meta', version=version, pypi_index_url=url, have_server_supported_tags=True)
+
+    def check(package: PypiDistribution) -> PypiDistribution:
+        return classifier._check_meta_package_target_requirements(package, (3, 9), TARGET_PLATFORMS)
+
+    assert check(make_package('1.0')) == make_package('1.0')
+    assert check(make_package('2.0')) == dataclasses.replace(make_package('2.0'), have_server_supported_tags=False)
+
+    # local wheel rebuilt under the same name is read again, not taken from cache
+    wheel = get_best_wheel(pypi_index_url=url, name='meta', version='1.0', target_python=(3, 9))
+    assert wheel
+    metadata = get_wheel_metadata(wheel)
+    assert metadata and 'Requires-Dist: dep_a' in metadata
+    make_wheel(index_path, 'meta', '1.0', ['dep_d'])
+    metadata = get_wheel_metadata(wheel)
+    assert metadata and 'Requires-Dist: dep_d' in metadata and 'dep_a' not in metadata
+
+
+def test_inspect_meta_package_targets(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv('ENVZY_CACHE_DIR', str(tmp_path / 'cache'))
+
+    index_path = tmp_path / 'index'
+    index_path.mkdir()
+    url = index_path.as_uri()
+
+    make_wheel(index_path, 'meta', '1.0', ['dep_a', 'dep_b; python_version >= "3.10"'])
+    (index_path / 'dep_a-1.0-py3-none-any.whl').touch()
+    (index_path / 'dep_b-1.0-cp310-cp310-manylinux2014_x86_64.whl').touch()
+
+    classifier = ModuleClassifier(pypi_index_url=url, target_python=(3, 9), inspect_meta_packages=True)
+    package = PypiDistribution(name='meta', version='1.0', pypi_index_url=url, have_server_supported_tags=True)
+    monkeypatch.setattr(classifier, 'classify', lambda modules: frozenset({package}))
+
+    # meta package is installed locally, it has nothing but metadata
+    raw = RawDistribution(path='', name='meta', version='1.0', record=('meta-1.0.dist-info/METADATA',))
+    monkeypatch.setattr(classifier, 'names_to_distributions', {'meta': Distribution(cast(Any, None), raw)})
+
+    targets = [
+        Target(python=(3, 9), platforms=TARGET_PLATFORMS),
+        Target(python=(3, 10), platforms=TARGET_PLATFORMS),
+        # dep_b has no wheel for aarch64
+        Target(python=(3, 10), platforms=TARGET_PLATFORMS_AARCH64),
+    ]
+    assert classifier.classify_targets([], targets) == {
+        targets[0]: frozenset({package}),
+        targets[1]: frozenset({package}),
+        targets[2]: frozenset({dataclasses.replace(package, have_server_supported_tags=False)}),
+    }
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+import envzy.lock
+from envzy import AutoExplorer
+from envzy.lock import (
+    LockedRequirement,
+    format_requirements_lock,
+    get_marker_environment,
+    get_release_hashes,
+    get_requirements_closure,
+    get_unhashed_requirements,
+)
+from envzy.packages import DistributionFile
+from envzy.pypi import TARGET_PLATFORMS_AARCH64
+
+
+def test_get_marker_environment() -> None:
+    environment = get_marker_environment((3, 9))
+
+    assert environment['python_version'] == '3.9'
+    assert environment['python_full_version'] == '3.9.0'
+    assert environment['sys_platform'] == 'linux'
+    assert environment['platform_machine'] == 'x86_64'
+
+    environment = get_marker_environment((3, 10, 4), TARGET_PLATFORMS_AARCH64)
+    assert environment['python_full_version'] == '3.10.4'
+    assert environment['platform_machine'] == 'aarch64'
+
+
+def test_get_requirements_closure() -> None:
+    environment = get_marker_environment((3, 9))
+
+    closure, missing = get_requirements_closure(['lzy-test-project-meta', 'absent-package'], environment)
+
+    # NB: sampleproject "test" and "dev" extras are not requested
+    assert [d.name for d in closure] == [
+        'lzy-test-project',
+        'lzy-test-project-meta',
+        'peppercorn',
+        'sampleproject',
+    ]
+    assert missing == ['absent-package']
+
+
+def test_format_requirements_lock() -> None:
+    assert format_requirements_lock(
+        [
+            LockedRequirement(name='foo', version='1.0', pypi_index_url='https://a/simple/', hashes=('sha256:1',)),
+            LockedRequirement(
+                name='Bar', version='2.0', pypi_index_url='https://b/simple/', hashes=('sha256:2', 'sha256:3')
+            ),
+        ],
+        pypi_index_url='https://a/simple/',
+        extra_index_urls=['https://b/simple/', 'https://c/simple/'],
+    ) == (
+        '--index-url https://a/simple/\n'
+        '--extra-index-url https://b/simple/\n'
+        'Bar==2.0 \\\n'
+        '    --hash=sha256:2 \\\n'
+        '    --hash=sha256:3\n'
+        'foo==1.0 \\\n'
+        '    --hash=sha256:1\n'
+    )
+
+
+def test_format_requirements_lock_local_indexes(tmp_path: Path) -> None:
+    wheelhouse = tmp_path / 'wheelhouse'
+    wheelhouse.mkdir()
+    (wheelhouse / 'foo-1.0-py3-none-any.whl').write_text('')
+    snapshot = tmp_path / 'snapshot'
+    (snapshot / 'bar').mkdir(parents=True)
+    (snapshot / 'bar' / 'index.html').write_text('')
+
+    requirements = [
+        LockedRequirement(name='foo', version='1.0', pypi_index_url=wheelhouse.as_uri(), hashes=()),
+        LockedRequirement(name='bar', version='2.0', pypi_index_url=snapshot.as_uri(), hashes=()),
+    ]
+
+    # snapshot of simple index is a real index for pip
+    assert format_requirements_lock(requirements, wheelhouse.as_uri(), [snapshot.as_uri()]) == (
+        f'--index-url {snapshot.as_uri()}\n'
+        f'--find-links {wheelhouse.as_uri()}\n'
+        'bar==2.0\n'
+        'foo==1.0\n'
+    )
+    assert format_requirements_lock(requirements[:1], 'https://a/simple/', [wheelhouse.as_uri()]) == (
+        '--index-url https://a/simple/\n'
+        f'--find-links {wheelhouse.as_uri()}\n'
+        'foo==1.0\n'
+    )
+
+
+def test_format_requirements_lock_unhashed() -> None:
+    requirements = [
+        LockedRequirement(name='foo', version='1.0', pypi_index_url='https://a/simple/', hashes=('sha256:1',)),
+        LockedRequirement(name='bar', version='2.0', pypi_index_url='https://a/simple/', hashes=()),
+    ]
+    assert get_unhashed_requirements(requirements) == ['bar']
+    assert get_unhashed_requirements(requirements[1:]) == []
+
+    # pip rejects partially hashed file in hash-checking mode
+    assert format_requirements_lock(requirements, pypi_index_url='https://a/simple/') == (
+        '--index-url https://a/simple/\n'
+        'bar==2.0\n'
+        'foo==1.0\n'
+    )
+
+
+def test_get_release_hashes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / 'foo-1.0.tar.gz').write_text('foo')
+    files = [
+        DistributionFile(filename='foo-1.0.whl', url='https://a/f.whl', hashes=(('sha256', '1'),), size=None),
+        DistributionFile(filename='foo-1.0.tar.gz', url=(tmp_path / 'foo-1.0.tar.gz').as_uri(), hashes=(), size=None),
+    ]
+    monkeypatch.setattr(envzy.lock, 'get_release_files', lambda **kwargs: tuple(files))
+
+    # local files are hashed in place
+    assert get_release_hashes(pypi_index_url='https://a/simple/', name='foo', version='1.0') == (
+        'sha256:1', f'sha256:{hashlib.sha256(b"foo").hexdigest()}'
+    )
+
+    # pip could choose a file without hash, so release is not hashed at all
+    files.append(DistributionFile(filename='foo-1.0.zip', url='https://a/f.zip', hashes=(), size=None))
+    assert get_release_hashes(pypi_index_url='https://a/simple/', name='foo', version='1.0') == ()
+
+
+def test_get_locked_requirements(tmp_path: Path) -> None:
+    import sample
+
+    for filename in ('sampleproject-3.0.0-py3-none-any.whl', 'peppercorn-0.6-py3-none-any.whl'):
+        (tmp_path / filename).write_text(filename)
+
+    def sha256(filename: str) -> str:
+        return hashlib.sha256(filename.encode()).hexdigest()
+
+    explorer = AutoExplorer(pypi_index_url=tmp_path.as_uri())
+
+    assert explorer.get_locked_requirements({'sample': sample}) == (
+        '--no-index\n'
+        f'--find-links {tmp_path.as_uri()}\n'
+        'peppercorn==0.6 \\\n'
+        f'    --hash=sha256:{sha256("peppercorn-0.6-py3-none-any.whl")}\n'
+        'sampleproject==3.0.0 \\\n'
+        f'    --hash=sha256:{sha256("sampleproject-3.0.0-py3-none-any.whl")}\n'
+    )
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from envzy.manifest import (
+    DEFAULT_EXCLUDE,
+    EXCLUDED_AS_CONFLICT,
+    EXCLUDED_AS_DUPLICATE,
+    EXCLUDED_BY_RULE,
+    EXCLUDED_BY_SIZE,
+    TESTS_EXCLUDE,
+    ExcludedPath,
+    ManifestEntry,
+    ManifestRules,
+    build_manifest,
+    get_merkle_root,
+)
+from envzy.packages import LocalPackage
+from envzy.spec import EnvironmentSpec
+
+
+@pytest.fixture
+def package(make_local_spec: Callable[..., EnvironmentSpec]) -> LocalPackage:
+    spec = make_local_spec(files={
+        'site/foo/__init__.py': b'import foo.sub\n',
+        'site/foo/sub/__init__.py': b'',
+        # duplicate content is stored once
+        'site/foo/sub/bar_copy.py': b'bar = 1\n',
+    })
+
+    return LocalPackage(
+        name='foo',
+        paths=frozenset(spec.local_module_paths),
+        console_scripts=frozenset(spec.console_scripts),
+        is_binary=False,
+    )
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_build_manifest(package: LocalPackage, tmp_path: Path) -> None:
+    manifest = build_manifest([package])
+
+    [package_manifest] = manifest.packages
+    assert package_manifest.name == 'foo'
+    assert [(e.path, e.size, e.sha256) for e in package_manifest.entries] == [
+        ('bar.py', 8, sha256(b'bar = 1\n')),
+        ('bin/foo-cli', 10, sha256(b'#!/bin/sh\n')),
+        ('foo/__init__.py', 15, sha256(b'import foo.sub\n')),
+        ('foo/sub/__init__.py', 0, sha256(b'')),
+        ('foo/sub/bar_copy.py', 8, sha256(b'bar = 1\n')),
+    ]
+    assert package_manifest.entries[1].mode == 0o755
+    assert package_manifest.root == get_merkle_root(package_manifest.entries)
+
+    assert manifest.total_bytes == 41
+    assert len(manifest.blobs) == 4
+    assert Path(manifest.blobs[sha256(b'bar = 1\n')]).read_bytes() == b'bar = 1\n'
+    assert manifest.get_missing_blobs([sha256(b''), sha256(b'bar = 1\n')]) == {
+        sha256(b'#!/bin/sh\n'): str(tmp_path / 'bin' / 'foo-cli'),
+        sha256(b'import foo.sub\n'): str(tmp_path / 'site' / 'foo' / '__init__.py'),
+    }
+
+
+def test_manifest_root_changes(package: LocalPackage, tmp_path: Path) -> None:
+    root = build_manifest([package]).packages[0].root
+
+    assert build_manifest([package]).packages[0].root == root
+
+    init = tmp_path / 'site' / 'foo' / 'sub' / '__init__.py'
+    init.write_bytes(b'changed')
+    changed_root = build_manifest([package]).packages[0].root
+    assert changed_root != root
+
+    os.chmod(init, 0o700)
+    assert build_manifest([package]).packages[0].root != changed_root
+
+
+def test_get_merkle_root() -> None:
+    entries = [ManifestEntry(path=f'{i}.py', size=i, mode=0o644, sha256=sha256(b'%d' % i)) for i in range(5)]
+
+    assert get_merkle_root([]) == sha256(b'')
+    assert get_merkle_root(entries) == get_merkle_root(reversed(entries))
+    assert len({get_merkle_root(entries[:i]) for i in range(1, 6)}) == 5
+
+
+def test_build_manifest_rules(package: LocalPackage, tmp_path: Path) -> None:
+    package_dir = tmp_path / 'site' / 'foo'
+    (package_dir / '__pycache__').mkdir()
+    (package_dir / '__pycache__' / '__init__.cpython-38.pyc').write_bytes(b'x' * 10)
+    (package_dir / '.git' / 'objects').mkdir(parents=True)
+    (package_dir / '.git' / 'objects' / 'a').write_bytes(b'x' * 20)
+    (package_dir / 'tests').mkdir()
+    (package_dir / 'tests' / 'test_foo.py').write_bytes(b'x' * 30)
+    (package_dir / 'sub' / 'weights.bin').write_bytes(b'x' * 1000)
+    (package_dir / 'sub' / 'config.bin').write_bytes(b'x' * 1000)
+
+    # without rules everything is shipped
+    [unpruned] = build_manifest([package]).packages
+    assert len(unpruned.entries) == 10
+
+    rules = ManifestRules(
+        exclude=DEFAULT_EXCLUDE + TESTS_EXCLUDE,
+        include=('foo/sub/config.*',),
+        max_file_size=100,
+    )
+    manifest = build_manifest([package], rules=rules)
+
+    [pruned] = manifest.packages
+    assert [e.path for e in pruned.entries] == [
+        'bar.py',
+        'bin/foo-cli',
+        'foo/__init__.py',
+        'foo/sub/__init__.py',
+        'foo/sub/bar_copy.py',
+        'foo/sub/config.bin',
+    ]
+    assert manifest.excluded == (
+        ExcludedPath(str(package_dir / '.git'), EXCLUDED_BY_RULE, 20),
+        ExcludedPath(str(package_dir / '__pycache__'), EXCLUDED_BY_RULE, 10),
+        ExcludedPath(str(package_dir / 'sub' / 'weights.bin'), EXCLUDED_BY_SIZE, 1000),
+        ExcludedPath(str(package_dir / 'tests'), EXCLUDED_BY_RULE, 30),
+    )
+    assert manifest.excluded_bytes == 1060
+    assert manifest.total_bytes == 1041
+
+    # local module paths themselves are never excluded
+    rules = ManifestRules(exclude=('foo', 'bar.py', '*.py', '.*', 'tests', '__pycache__'))
+    [pruned] = build_manifest([package], rules=rules).packages
+    assert [e.path for e in pruned.entries] == ['bar.py', 'bin/foo-cli', 'foo/sub/config.bin', 'foo/sub/weights.bin']
+
+
+def test_build_manifest_shared_paths(tmp_path: Path) -> None:
+    # namespace package dir is a top-level path of both distributions
+    namespace_dir = tmp_path / 'site' / 'ns'
+    (namespace_dir / 'a').mkdir(parents=True)
+    (namespace_dir / 'b').mkdir()
+    (namespace_dir / 'a' / '__init__.py').write_bytes(b'a = 1\n')
+    (namespace_dir / 'b' / '__init__.py').write_bytes(b'')
+    (namespace_dir / '__pycache__').mkdir()
+    (namespace_dir / '__pycache__' / 'x.pyc').write_bytes(b'x')
+
+    packages = [
+        LocalPackage(name=name, paths=frozenset({str(namespace_dir)}), console_scripts=frozenset(), is_binary=False)
+        for name in ('ns-b', 'ns-a')
+    ]
+    manifest = build_manifest(packages, rules=ManifestRules())
+
+    assert [(p.name, [e.path for e in p.entries]) for p in manifest.packages] == [
+        ('ns-a', ['ns/a/__init__.py', 'ns/b/__init__.py']),
+        ('ns-b', []),
+    ]
+    assert manifest.excluded == (
+        ExcludedPath(str(namespace_dir / '__pycache__'), EXCLUDED_BY_RULE, 1),
+        ExcludedPath(str(namespace_dir / 'a' / '__init__.py'), EXCLUDED_AS_DUPLICATE, 6),
+        ExcludedPath(str(namespace_dir / 'b' / '__init__.py'), EXCLUDED_AS_DUPLICATE, 0),
+    )
+    assert manifest.total_bytes == 6
+
+
+def test_build_manifest_conflicting_paths(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # same relative path with different content at two sys.path entries
+    first_site, second_site = tmp_path / 'first', tmp_path / 'second'
+    for site, data in ((first_site, b'x = 1\n'), (second_site, b'x = 2\n')):
+        (site / 'ns').mkdir(parents=True)
+        (site / 'ns' / 'same.py').write_bytes(b'same = 1\n')
+        (site / 'ns' / 'other.py').write_bytes(data)
+
+    packages = [
+        LocalPackage(name=name, paths=frozenset({str(site / 'ns')}), console_scripts=frozenset(), is_binary=False)
+        for name, site in (('ns-a', second_site), ('ns-b', first_site))
+    ]
+    monkeypatch.setattr(sys, 'path', [str(first_site), str(second_site)])
+    manifest = build_manifest(packages)
+
+    # the copy which is imported locally wins, not the first package by name
+    assert [(p.name, [e.path for e in p.entries]) for p in manifest.packages] == [
+        ('ns-a', []),
+        ('ns-b', ['ns/other.py', 'ns/same.py']),
+    ]
+    assert manifest.blobs[sha256(b'x = 1\n')] == str(first_site / 'ns' / 'other.py')
+    assert sha256(b'x = 2\n') not in manifest.blobs
+    assert manifest.excluded == (
+        ExcludedPath(str(second_site / 'ns' / 'other.py'), EXCLUDED_AS_CONFLICT, 6),
+        ExcludedPath(str(second_site / 'ns' / 'same.py'), EXCLUDED_AS_DUPLICATE, 9),
+    )
+
+    # without sys.path entries the first package by name wins
+    monkeypatch.setattr(sys, 'path', [])
+    manifest = build_manifest(packages)
+    assert [(p.name, [e.path for e in p.entries]) for p in manifest.packages] == [
+        ('ns-a', ['ns/other.py', 'ns/same.py']),
+        ('ns-b', []),
+    ]
+    assert [(e.path, e.reason) for e in manifest.excluded] == [
+        (str(first_site / 'ns' / 'other.py'), EXCLUDED_AS_CONFLICT),
+        (str(first_site / 'ns' / 'same.py'), EXCLUDED_AS_DUPLICATE),
+    ]
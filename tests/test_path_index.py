@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+
+from envzy.path_index import PathIndex
+
+
+def test_path_index() -> None:
+    a, b = object(), object()
+    items = {
+        '/usr/lib/site-packages/foo/__init__.py': a,
+        '/usr/lib/site-packages/foo/bar.py': a,
+        '/usr/lib/site-packages/foo-1.0.dist-info/RECORD': a,
+        '/usr/lib/site-packages/baz.py': b,
+        '/usr/lib/site-packages/foo.py': b,
+        '/usr/bin/foo': a,
+        '/root_file': b,
+    }
+
+    index = PathIndex.from_items([*items.items(), ('/usr/lib/site-packages/baz.py', a)])
+    items['/usr/lib/site-packages/baz.py'] = a
+
+    assert len(index) == len(items)
+    assert dict(index) == items
+    assert sorted(index) == sorted(items)
+
+    for path, value in items.items():
+        assert index[path] is value
+        assert path in index
+
+    for absent in (
+        '/usr/lib/site-packages/foo',
+        '/usr/lib/site-packages/foo/bar.pyc',
+        '/usr/lib/site-packages/foo/a.py',
+        '/usr/lib/site-packages/foo/zzz.py',
+        '/usr/lib/site-packages',
+        '/usr/bin/foo/',
+        '/absent/foo.py',
+        '/zzz',
+        '',
+    ):
+        assert absent not in index
+        assert index.get(absent) is None
+
+    with pytest.raises(KeyError):
+        index['/absent']
+
+    assert len(PathIndex.from_items([])) == 0
+    assert PathIndex.from_items([]).get('/foo') is None
+
+
+def test_path_index_tables() -> None:
+    tables = PathIndex.build_tables([
+        (('/usr/lib/python3/site-packages/foo', '__init__.py'), 0),
+        (('/usr/lib/python3/site-packages/foo', 'bar.py'), 0),
+        (('/usr/lib/python3/site-packages/foo/sub', '__init__.py'), 0),
+        (('/usr/lib/python3/site-packages', 'bar.py'), 1),
+        (('/usr/bin', 'foo'), 0),
+        (('', 'relative.py'), 1),
+    ])
+
+    # each directory component is stored once, children are sorted ranges
+    assert tables.directories == ['', '', 'usr', 'bin', 'lib', 'python3', 'site-packages', 'foo', 'sub']
+    assert list(tables.directory_parents) == [0, 0, 1, 2, 2, 4, 5, 6, 7]
+    assert list(tables.directory_children) == [1, 2, 3, 5, 5, 6, 7, 8, 9, 9]
+    # basenames are interned
+    assert tables.names == ['__init__.py', 'bar.py', 'foo', 'relative.py']
+    assert [tables.names[i] for i in tables.entry_names] == [
+        'relative.py', 'foo', 'bar.py', '__init__.py', 'bar.py', '__init__.py',
+    ]
+    assert list(tables.entry_values) == [1, 0, 1, 0, 0, 0]
+    assert list(tables.directory_starts) == [0, 1, 1, 1, 2, 2, 2, 3, 5, 6]
+
+
+def test_path_index_relative_paths() -> None:
+    items = {'foo.py': 1, 'foo/bar.py': 2, '/foo.py': 3, '/foo/bar.py': 4, '//foo.py': 5}
+    index = PathIndex.from_items(items.items())
+
+    assert dict(index.iter_items()) == items
+    for path, value in items.items():
+        assert index[path] == value
+
+    for absent in ('bar.py', 'foo', '/foo', '/bar/foo.py', 'foo/foo.py'):
+        assert absent not in index
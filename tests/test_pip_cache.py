@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+import envzy.pypi
+from envzy.pip_cache import get_pip_cache_dir, get_pip_cache_key, get_pip_cache_paths, get_pip_cached_project_page
+from envzy.pypi import get_project_page
+
+URL = 'https://pypi.org/simple/foo/'
+PAGE = {
+    'meta': {'api-version': '1.0'},
+    'name': 'foo',
+    'files': [{
+        'filename': 'foo-1.0-py3-none-any.whl',
+        'url': 'https://files.pythonhosted.org/packages/foo-1.0-py3-none-any.whl',
+        'hashes': {'sha256': 'abc'},
+    }],
+}
+
+
+@pytest.fixture(autouse=True)
+def pip_cache_dir(tmp_path: Path, monkeypatch) -> Iterator[Path]:
+    monkeypatch.setenv('PIP_CACHE_DIR', str(tmp_path))
+    get_pip_cache_dir.cache_clear()
+    yield tmp_path
+    get_pip_cache_dir.cache_clear()
+
+
+def write_modern_entry(url: str, body: bytes) -> Path:
+    path, _ = get_pip_cache_paths(url)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b'cc=4,')
+    body_path = path.with_name(path.name + '.body')
+    body_path.write_bytes(body)
+    return body_path
+
+
+def test_get_pip_cache_key() -> None:
+    assert get_pip_cache_key('HTTPS://PyPI.org/simple/foo/') == 'https://pypi.org/simple/foo/'
+    assert get_pip_cache_key('https://pypi.org') == 'https://pypi.org/'
+
+
+def test_modern_entry(pip_cache_dir: Path) -> None:
+    assert get_pip_cached_project_page(URL, 'foo', ttl=60) is None
+
+    body_path = write_modern_entry(URL, gzip.compress(json.dumps(PAGE).encode()))
+
+    page = get_pip_cached_project_page(URL, 'foo', ttl=60)
+    assert page
+    assert [p.filename for p in page.packages] == ['foo-1.0-py3-none-any.whl']
+
+    # stale entry
+    os.utime(body_path, (0, 0))
+    assert get_pip_cached_project_page(URL, 'foo', ttl=60) is None
+
+
+def test_legacy_entry() -> None:
+    msgpack = pytest.importorskip('pip._vendor.msgpack')
+
+    _, path = get_pip_cache_paths(URL)
+    path.parent.mkdir(parents=True)
+    html = b'<html><body><a href="foo-2.0.tar.gz">foo-2.0.tar.gz</a></body></html>'
+    path.write_bytes(b'cc=4,' + msgpack.dumps({'response': {'body': html}}))
+
+    page = get_pip_cached_project_page(URL, 'foo', ttl=60)
+    assert page
+    assert [(p.filename, p.version) for p in page.packages] == [('foo-2.0.tar.gz', '2.0')]
+
+
+def test_get_project_page_from_pip_cache(monkeypatch) -> None:
+    monkeypatch.setattr(envzy.pypi, 'USE_PIP_CACHE', True)
+    write_modern_entry(URL, json.dumps(PAGE).encode())
+
+    get_project_page.cache_clear()
+    page = get_project_page(pypi_index_url='https://pypi.org/simple/', name='Foo')
+    get_project_page.cache_clear()
+
+    assert page
+    assert page.packages[0].digests == {'sha256': 'abc'}
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, cast
+
+import pytest
+from pypi_simple import DistributionPackage, IndexPage, ProjectPage
+
+import envzy.pypi
+from envzy.packages import DistributionFile
+from envzy.pypi import (
+    ProjectIndex,
+    check_json_api_supported,
+    check_package_version_exists,
+    check_package_version_exists_on_target_platform,
+    check_project_may_exist,
+    check_version_exists,
+    check_version_exists_on_target_platform,
+    find_best_wheel,
+    get_best_wheel,
+    get_index_project_names,
+    get_json_api_url,
+    get_project_index,
+    get_project_page,
+    get_release_files,
+    get_wheel_metadata,
+    pack_project_names,
+    unpack_project_names,
+)
+from envzy.path_index import StringTable
+
+
+class FakeClient:
+    def __init__(self, projects: List[str]):
+        self.projects = projects
+        self.index_requests = 0
+        self.project_requests: List[str] = []
+
+    def get_index_page(self) -> IndexPage:
+        self.index_requests += 1
+        return IndexPage(projects=self.projects, repository_version=None, last_serial=None)
+
+    def get_project_page(self, name: str):
+        self.project_requests.append(name)
+        raise AssertionError('network must not be touched')
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('ENVZY_CACHE_DIR', str(tmp_path))
+
+    def clear():
+        for function in (
+            get_index_project_names,
+            get_project_page,
+            get_project_index,
+            get_release_files,
+            get_best_wheel,
+            check_json_api_supported,
+            check_package_version_exists,
+            check_package_version_exists_on_target_platform,
+        ):
+            function.cache_clear()
+
+    clear()
+    yield tmp_path
+    clear()
+
+
+@pytest.fixture
+def fake_client(monkeypatch) -> FakeClient:
+    client = FakeClient(['Foo_Bar', 'pip', 'requests'])
+    monkeypatch.setattr(envzy.pypi, 'get_pypi_client', lambda url: client)
+    return client
+
+
+def get_names(url: str) -> Optional[List[bytes]]:
+    names = get_index_project_names(url)
+    return None if names is None else [bytes(names[i]) for i in range(len(names))]
+
+
+def test_index_root_listing(fake_client: FakeClient, monkeypatch) -> None:
+    url = 'https://example.com/simple/'
+
+    assert get_names(url) == [b'foo-bar', b'pip', b'requests']
+    assert check_project_may_exist(pypi_index_url=url, name='foo.bar')
+    assert check_project_may_exist(pypi_index_url=url, name='PIP')
+    assert not check_project_may_exist(pypi_index_url=url, name='my-private-package')
+
+    # listing is persisted, so fresh process will not request it again
+    get_index_project_names.cache_clear()
+    assert get_names(url) == [b'foo-bar', b'pip', b'requests']
+    assert not check_project_may_exist(pypi_index_url=url, name='pipx')
+    assert fake_client.index_requests == 1
+
+    # ... until it expires
+    get_index_project_names.cache_clear()
+    monkeypatch.setattr(envzy.pypi, 'INDEX_ROOT_LISTING_TTL', -1)
+    get_index_project_names(url)
+    assert fake_client.index_requests == 2
+
+
+def test_unpack_project_names() -> None:
+    data = pack_project_names([b'a', b'bc'])
+    names = cast(StringTable, unpack_project_names(data))
+    assert [names[0], names[1]] == [b'a', b'bc']
+    assert names.find(b'bc') == 1 and names.find(b'b') == -1
+
+    # truncated or stale cache files are not trusted
+    assert unpack_project_names(b'') is None
+    assert unpack_project_names(data[:-1]) is None
+    assert unpack_project_names(b'foo\nbar\n') is None
+
+
+def test_get_project_page_with_root_listing(fake_client: FakeClient, monkeypatch) -> None:
+    monkeypatch.setattr(envzy.pypi, 'USE_INDEX_ROOT_LISTING', True)
+
+    assert get_project_page(pypi_index_url='https://example.com/simple/', name='my-private-package') is None
+    assert fake_client.project_requests == []
+
+
+class FakeResponse:
+    def __init__(self, data: Optional[Dict[str, Any]]):
+        self.data = data
+        self.status_code = 404 if data is None else 200
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Optional[Dict[str, Any]]:
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, releases: Dict[str, Dict[str, Any]]):
+        self.releases = releases
+        self.requested: List[str] = []
+
+    def get(self, url: str) -> FakeResponse:
+        self.requested.append(url)
+        return FakeResponse(self.releases.get(url))
+
+
+def test_get_json_api_url() -> None:
+    assert get_json_api_url('https://pypi.org/simple/') == 'https://pypi.org/pypi'
+    assert get_json_api_url('https://test.pypi.org/simple') == 'https://test.pypi.org/pypi'
+    assert get_json_api_url('https://download.pytorch.org/whl/cu118') is None
+    assert get_json_api_url('file:///wheelhouse/simple') is None
+
+
+def test_single_version_lookup(monkeypatch, fake_client: FakeClient) -> None:
+    monkeypatch.setattr(envzy.pypi, 'USE_PYPI_JSON_API', True)
+
+    release = {
+        'urls': [{
+            'filename': 'foo-1.0-py3-none-any.whl',
+            'url': 'https://files.example.com/foo-1.0-py3-none-any.whl',
+            'digests': {'sha256': 'abc', 'md5': 'def'},
+            'size': 100,
+        }]
+    }
+    session = FakeSession({
+        'https://example.com/pypi/pip/10.0.0/json': {'urls': []},
+        'https://example.com/pypi/foo/1.0/json': release,
+    })
+    monkeypatch.setattr(envzy.pypi, 'get_session', lambda: session)
+
+    url = 'https://example.com/simple/'
+    assert get_release_files(pypi_index_url=url, name='Foo', version='1.0') == (
+        DistributionFile(
+            filename='foo-1.0-py3-none-any.whl',
+            url='https://files.example.com/foo-1.0-py3-none-any.whl',
+            hashes=(('md5', 'def'), ('sha256', 'abc')),
+            size=100,
+        ),
+    )
+    assert check_package_version_exists(pypi_index_url=url, name='foo', version='1.0')
+    assert not check_package_version_exists(pypi_index_url=url, name='foo', version='2.0')
+    assert check_package_version_exists_on_target_platform(
+        pypi_index_url=url, name='foo', version='1.0', target_python=(3, 9)
+    )
+
+    # project page was never requested
+    assert fake_client.project_requests == []
+
+
+def test_project_index() -> None:
+    index = ProjectIndex.from_files([
+        (version, DistributionFile(filename=filename, url=f'https://a/{filename}', hashes=(), size=None))
+        for version, filename in (
+            ('1.0', 'foo-1.0.tar.gz'),
+            ('1.0', 'foo-1.0-cp39-cp39-manylinux2014_x86_64.whl'),
+            ('1.0', 'foo-1.0-cp39-cp39-win_amd64.whl'),
+            ('1.1', 'foo-1.1-cp39-cp39-manylinux2014_x86_64.whl'),
+            ('1.1', 'foo-1.1-cp39-cp39-win_amd64.whl'),
+            ('2.0', 'foo-2.0-cp39-cp39-win_amd64.whl'),
+            ('2.0', 'foo-2.0.exe'),
+        )
+    ])
+
+    assert index.versions == {'1.0', '1.1', '2.0'}
+    assert index.sdist_versions == {'1.0'}
+    # same tags sets are stored only once
+    assert index.wheel_tags['1.0'] is index.wheel_tags['1.1']
+
+    assert check_version_exists(index, '2.0')
+    assert not check_version_exists(index, '3.0')
+
+    assert check_version_exists_on_target_platform(index, '1.0', target_python=(3, 9))
+    assert check_version_exists_on_target_platform(index, '1.1', target_python=(3, 9))
+    assert not check_version_exists_on_target_platform(index, '1.1', target_python=(3, 10))
+    assert not check_version_exists_on_target_platform(index, '2.0', target_python=(3, 9))
+
+    # files are kept as compact records
+    assert [f.filename for f in index.get_files('2.0') or ()] == ['foo-2.0-cp39-cp39-win_amd64.whl', 'foo-2.0.exe']
+    assert index.get_files('3.0') is None
+    # it is hashable, but by identity, as it is immutable and its fields are big mappings
+    assert hash(index) == hash(index)
+    with pytest.raises(TypeError):
+        index.wheel_tags['3.0'] = frozenset()  # type: ignore
+
+
+class PagesClient:
+    def __init__(self, pages: Dict[str, ProjectPage]):
+        self.pages = pages
+        self.project_requests: List[str] = []
+
+    def get_project_page(self, name: str) -> ProjectPage:
+        self.project_requests.append(name)
+        return self.pages[name]
+
+
+def test_release_files_from_project_index(monkeypatch) -> None:
+    def make_page(name: str) -> ProjectPage:
+        return ProjectPage(
+            project=name,
+            packages=[
+                DistributionPackage(
+                    filename=f'{name}-{version}-py3-none-any.whl',
+                    url=f'https://files.example.com/{name}-{version}-py3-none-any.whl',
+                    project=name,
+                    version=version,
+                    package_type='wheel',
+                    digests={'sha256': f'{name}{version}', 'md5': 'x'},
+                    requires_python=None,
+                    has_sig=None,
+                    has_metadata=True,
+                )
+                for version in ('1.0', '2.0')
+            ],
+            repository_version=None,
+            last_serial=None,
+        )
+
+    client = PagesClient({name: make_page(name) for name in 'abc'})
+    monkeypatch.setattr(envzy.pypi, 'get_pypi_client', lambda url: client)
+
+    url = 'https://example.com/simple/'
+    for name in 'abcabc':
+        for version in ('1.0', '2.0'):
+            get_best_wheel.cache_clear()
+            wheel = get_best_wheel(pypi_index_url=url, name=name, version=version, target_python=(3, 9))
+            assert wheel == DistributionFile(
+                filename=f'{name}-{version}-py3-none-any.whl',
+                url=f'https://files.example.com/{name}-{version}-py3-none-any.whl',
+                hashes=(('sha256', f'{name}{version}'),),
+                size=None,
+                has_metadata=True,
+            )
+            get_release_files.cache_clear()
+
+    # each page is fetched only once, even though only the last one is cached
+    assert client.project_requests == ['a', 'b', 'c']
+    assert get_release_files(pypi_index_url=url, name='a', version='3.0') is None
+
+
+def test_find_best_wheel() -> None:
+    def make_file(filename: str) -> DistributionFile:
+        return DistributionFile(filename=filename, url=f'https://files.example.com/{filename}', hashes=(), size=None)
+
+    files = [
+        make_file('foo-1.0.tar.gz'),
+        make_file('foo-1.0-py3-none-any.whl'),
+        make_file('foo-1.0-cp39-cp39-manylinux2014_x86_64.whl'),
+        make_file('foo-1.0-cp39-cp39-manylinux_2_28_x86_64.whl'),
+        make_file('foo-1.0-cp39-abi3-manylinux_2_28_x86_64.whl'),
+        make_file('foo-1.0-cp39-cp39-win_amd64.whl'),
+    ]
+
+    assert find_best_wheel(files, target_python=(3, 9)) == files[3]
+    assert find_best_wheel(files[:3], target_python=(3, 9)) == files[2]
+    assert find_best_wheel(files, target_python=(3, 10)) == files[4]
+    assert find_best_wheel(files[:3], target_python=(3, 10)) == files[1]
+    assert find_best_wheel(files[:1], target_python=(3, 9)) is None
+
+
+class MetadataResponse:
+    def __init__(self, status_code: int, content: bytes = b''):
+        self.status_code = status_code
+        self.content = content
+        self.ok = status_code < 400
+        self.reason = 'reason'
+
+
+class MetadataSession:
+    def __init__(self, *responses: MetadataResponse):
+        self.responses = list(responses)
+        self.requests: List[str] = []
+
+    def get(self, url: str) -> MetadataResponse:
+        self.requests.append(url)
+        return self.responses.pop(0)
+
+
+def make_wheel_file(hashes: Dict[str, str]) -> DistributionFile:
+    return DistributionFile(
+        filename='foo-1.0-py3-none-any.whl',
+        url='https://a/files/foo-1.0-py3-none-any.whl',
+        hashes=tuple(hashes.items()),
+        size=None,
+    )
+
+
+def test_get_wheel_metadata_cache(monkeypatch) -> None:
+    session = MetadataSession(
+        MetadataResponse(200, b'Name: foo\n'),
+        MetadataResponse(200, b'Name: foo\nVersion: 1.0\n'),
+    )
+    monkeypatch.setattr(envzy.pypi, 'get_session', lambda: session)
+
+    # metadata is cached only by hash, as the same url could give another wheel
+    assert get_wheel_metadata(make_wheel_file({})) == 'Name: foo\n'
+    assert get_wheel_metadata(make_wheel_file({})) == 'Name: foo\nVersion: 1.0\n'
+
+    session.responses.append(MetadataResponse(200, b'Name: bar\n'))
+    assert get_wheel_metadata(make_wheel_file({'sha256': 'abc'})) == 'Name: bar\n'
+    assert get_wheel_metadata(make_wheel_file({'sha256': 'abc'})) == 'Name: bar\n'
+    assert len(session.requests) == 3
+    assert session.requests[0] == 'https://a/files/foo-1.0-py3-none-any.whl.metadata'
+
+
+@pytest.mark.parametrize('status_code', [404, 403, 503])
+def test_get_wheel_metadata_failure(monkeypatch, status_code: int) -> None:
+    session = MetadataSession(MetadataResponse(status_code))
+    monkeypatch.setattr(envzy.pypi, 'get_session', lambda: session)
+
+    assert get_wheel_metadata(make_wheel_file({'sha256': 'abc'})) is None
+    assert session.requests
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from envzy.realpath import RealpathResolver
+
+
+def test_realpath(tmp_path: Path, monkeypatch) -> None:
+    real = tmp_path / 'real'
+    (real / 'pkg' / 'sub').mkdir(parents=True)
+    (real / 'pkg' / 'sub' / 'mod.py').touch()
+    (real / 'other').mkdir()
+
+    (tmp_path / 'abs_link').symlink_to(real)
+    (tmp_path / 'rel_link').symlink_to('real/pkg')
+    (real / 'other' / 'up_link').symlink_to('../pkg/sub')
+    (real / 'chain').symlink_to(tmp_path / 'rel_link')
+    (tmp_path / 'loop_a').symlink_to('loop_b')
+    (tmp_path / 'loop_b').symlink_to('loop_a')
+    (real / 'file_link.py').symlink_to('pkg/sub/mod.py')
+
+    paths = [
+        'abs_link/pkg/sub/mod.py',
+        'rel_link/sub/mod.py',
+        'real/other/up_link/mod.py',
+        'real/other/up_link/../sub/mod.py',
+        'real/chain/sub/mod.py',
+        'real/chain/../pkg/./sub/',
+        'real/file_link.py',
+        'real/absent/../pkg',
+        'real/absent/file.py',
+        'loop_a/file.py',
+        'abs_link/pkg/sub/mod.py/',
+    ]
+
+    resolver = RealpathResolver()
+    for path in paths:
+        full_path = str(tmp_path / path)
+        assert resolver.realpath(full_path) == os.path.realpath(full_path), path
+
+    monkeypatch.chdir(tmp_path)
+    assert resolver.realpath('rel_link/sub') == os.path.realpath('rel_link/sub')
+
+
+def test_realpath_saves_syscalls(tmp_path: Path) -> None:
+    directory = tmp_path / 'a' / 'b' / 'c'
+    directory.mkdir(parents=True)
+
+    resolver = RealpathResolver()
+    for i in range(10):
+        assert resolver.realpath(directory / f'{i}.py') == str(directory / f'{i}.py')
+
+    # only first path is resolved component by component
+    assert resolver.lstat_calls == len(directory.parts) - 1 + 10
+    assert resolver.saved_syscalls == 9 * str(directory).count(os.sep)
+
+    resolver.clear()
+    assert resolver.lstat_calls == resolver.saved_syscalls == 0
@@ -40,6 +40,8 @@ def test_classify_deepspeed(
             name='deepspeed',
             version='0.12.6',
             pypi_index_url=pypi_index_url,
-            have_server_supported_tags=True
+            have_server_supported_tags=True,
+            # only sdist of 0.12.6 and dev wheels of 0.3.1 are published
+            sdist_only=True,
         )
     })
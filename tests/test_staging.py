@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import errno
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+import envzy.staging
+from envzy.manifest import ManifestRules
+from envzy.spec import EnvironmentSpec
+from envzy.staging import BYTECODE, COPY, HARDLINK, REFLINK, stage_environment, stage_files
+
+
+@pytest.fixture
+def spec(make_local_spec: Callable[..., EnvironmentSpec]) -> EnvironmentSpec:
+    return make_local_spec(
+        files={'site/foo/sub/__pycache__/__init__.cpython-38.pyc': b''},
+        # nested path is placed as a separate top-level module, as at the remote side
+        module_paths=('foo', 'foo/sub', 'bar.py'),
+    )
+
+
+def test_stage_environment(spec: EnvironmentSpec, tmp_path: Path) -> None:
+    staging_dir = tmp_path / 'staging'
+    staged = stage_environment(spec, str(staging_dir), rules=ManifestRules())
+
+    assert staged == {
+        'bar.py': HARDLINK,
+        'bin/foo-cli': HARDLINK,
+        'foo/__init__.py': HARDLINK,
+        'foo/sub/__init__.py': HARDLINK,
+        'sub/__init__.py': HARDLINK,
+    }
+    assert sorted(
+        path.relative_to(staging_dir).as_posix() for path in staging_dir.rglob('*') if path.is_file()
+    ) == sorted(staged)
+
+    site = Path(spec.local_module_paths[0]).parent
+    assert os.path.samefile(staging_dir / 'sub' / '__init__.py', site / 'foo' / 'sub' / '__init__.py')
+    assert os.access(staging_dir / 'bin' / 'foo-cli', os.X_OK)
+
+    # existing files are not overwritten
+    with pytest.raises(FileExistsError):
+        stage_environment(spec, str(staging_dir))
+
+
+def test_stage_environment_bytecode(spec: EnvironmentSpec, tmp_path: Path) -> None:
+    staging_dir = tmp_path / 'staging'
+    staged = stage_environment(spec, str(staging_dir), target_python=sys.version_info[:2])
+
+    tag = sys.implementation.cache_tag
+    assert staged['foo/sub/__pycache__/__init__.cpython-38.pyc'] == HARDLINK
+    assert staged[f'foo/sub/__pycache__/__init__.{tag}.pyc'] == BYTECODE
+    assert staged[f'__pycache__/bar.{tag}.pyc'] == BYTECODE
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'import foo; print(foo.data)'],
+        cwd=str(staging_dir),
+        universal_newlines=True,
+    )
+    assert output == '1\n'
+    # local package is untouched
+    site = Path(spec.local_module_paths[0]).parent
+    assert not (site / 'foo' / 'sub' / '__pycache__' / f'__init__.{tag}.pyc').exists()
+
+
+def test_stage_files_fallback(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    files = {}
+    for i in range(10):
+        path = tmp_path / 'site' / f'module{i}.py'
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f'x = {i}\n')
+        files[f'foo/module{i}.py'] = str(path)
+
+    links: List[str] = []
+
+    def cross_device_link(source: str, destination: str) -> None:
+        links.append(source)
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setitem(envzy.staging._METHODS, HARDLINK, cross_device_link)
+
+    staging_dir = tmp_path / 'staging'
+    staged = stage_files(files, str(staging_dir), max_workers=1)
+
+    # failed method is not tried anymore for the same device
+    assert len(links) == 1
+    assert set(staged.values()) <= {REFLINK, COPY}
+    for name, source in files.items():
+        assert (staging_dir / name).read_text() == Path(source).read_text()
+        assert not os.path.samefile(staging_dir / name, source)
+
+    staged = stage_files(files, str(tmp_path / 'copies'), methods=[COPY])
+    assert set(staged.values()) == {COPY}
+
+
+def test_stage_files_bad_methods(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        stage_files({}, str(tmp_path), methods=['symlink'])
+
+    with pytest.raises(ValueError):
+        stage_files({}, str(tmp_path), methods=[])